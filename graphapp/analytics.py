@@ -0,0 +1,285 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .graph_index import get_graph_index, graph_index_cache
+from .models import AnalyticsResult, GraphNode, GraphRelationship
+
+# Graph algorithms over the in-memory CSR index (see graph_index.py), run as
+# SciPy sparse-matrix operations rather than over networkx objects. Results
+# are stored in AnalyticsResult per graph version and parameter set, so a
+# repeated query is a single indexed row lookup until the graph changes.
+
+class AnalyticsError(ValueError):
+    pass
+
+# Sparse adjacency matrix of the edges of the given types (all when empty).
+# Parallel edges are summed, so they weigh more in PageRank.
+def adjacency(index, type_names=None):
+    sources, targets, _, _ = index.edges()
+    mask = index.type_mask(type_names)
+    n = index.num_nodes
+    data = np.ones(int(mask.sum()), dtype=np.float64)
+    return sparse.csr_matrix((data, (sources[mask], targets[mask])), shape=(n, n))
+
+# id/label/name of the nodes at the given index positions, in that order
+def describe_nodes(index, positions):
+    pks = [int(pk) for pk in index.node_ids[np.asarray(positions, dtype=np.int64)]]
+    nodes = GraphNode.objects.only('id', 'label', 'name').in_bulk(pks)
+    return [{'id': pk, 'label': nodes[pk].label, 'name': nodes[pk].name} if pk in nodes else {'id': pk}
+            for pk in pks]
+
+def pagerank(index, params):
+    A = adjacency(index, params['types'])
+    n = A.shape[0]
+    if not n:
+        return {'iterations': 0, 'converged': True, 'results': []}
+
+    damping = params['damping']
+    out_weight = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inverse = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    # Transposed, row-normalised adjacency: one sparse mat-vec per iteration
+    transition = (sparse.diags(inverse) @ A).T.tocsr()
+
+    tolerance = getattr(settings, 'GRAPH_ANALYTICS_PAGERANK_TOLERANCE', 1e-6)
+    max_iterations = getattr(settings, 'GRAPH_ANALYTICS_PAGERANK_MAX_ITERATIONS', 100)
+    scores = np.full(n, 1.0 / n)
+    converged = False
+    for iteration in range(1, max_iterations + 1):
+        # Rank held by dangling nodes is spread evenly, like the teleport term
+        updated = damping * (transition @ scores) + (damping * scores[dangling].sum() + 1 - damping) / n
+        delta = np.abs(updated - scores).sum()
+        scores = updated
+        if delta < n * tolerance:
+            converged = True
+            break
+
+    top = np.argsort(-scores, kind='stable')[:params['limit']]
+    return {
+        'iterations': iteration,
+        'converged': converged,
+        'results': [dict(node, score=float(scores[p])) for node, p in zip(describe_nodes(index, top), top)],
+    }
+
+def connected_components(index, params):
+    A = adjacency(index, params['types'])
+    if not A.shape[0]:
+        return {'count': 0, 'largest': [], 'size_distribution': []}
+
+    count, labels = csgraph.connected_components(A, directed=True, connection=params['mode'])
+    sizes = np.bincount(labels)
+    sample = getattr(settings, 'GRAPH_ANALYTICS_COMPONENT_SAMPLE', 10)
+    largest = []
+    for component in np.argsort(-sizes, kind='stable')[:params['limit']]:
+        members = np.flatnonzero(labels == component)[:sample]
+        largest.append({'size': int(sizes[component]), 'sample': describe_nodes(index, members)})
+    values, counts = np.unique(sizes, return_counts=True)
+    return {
+        'count': int(count),
+        'largest': largest,
+        # [component size, number of components of that size]
+        'size_distribution': [[int(v), int(c)] for v, c in zip(values, counts)],
+    }
+
+def degree_distribution(index, params):
+    sources, targets, _, _ = index.edges()
+    mask = index.type_mask(params['types'])
+    n = index.num_nodes
+    degrees = np.zeros(n, dtype=np.int64)
+    if params['direction'] in ('out', 'both'):
+        degrees += np.bincount(sources[mask], minlength=n)
+    if params['direction'] in ('in', 'both'):
+        degrees += np.bincount(targets[mask], minlength=n)
+    if not n:
+        return {'nodes': 0, 'histogram': [], 'top': []}
+
+    values, counts = np.unique(degrees, return_counts=True)
+    top = np.argsort(-degrees, kind='stable')[:params['limit']]
+    return {
+        'nodes': n,
+        'mean': float(degrees.mean()),
+        'median': float(np.median(degrees)),
+        'max': int(degrees.max()),
+        # [degree, number of nodes with that degree]
+        'histogram': [[int(v), int(c)] for v, c in zip(values, counts)],
+        'top': [dict(node, degree=int(degrees[p])) for node, p in zip(describe_nodes(index, top), top)],
+    }
+
+def shortest_path(index, params):
+    source, target = index.position(params['source']), index.position(params['target'])
+    if source is None or target is None:
+        raise AnalyticsError("Unknown source or target node")
+
+    # Unweighted: a breadth-first search from the source gives every hop count
+    A = adjacency(index, params['types'])
+    _, predecessors = csgraph.breadth_first_order(A, source, directed=params['directed'],
+                                                  return_predecessors=True)
+    if source != target and predecessors[target] < 0:
+        return {'length': None, 'path': []}
+    path = [target]
+    while path[-1] != source:
+        path.append(int(predecessors[path[-1]]))
+    path.reverse()
+    return {'length': len(path) - 1, 'path': describe_nodes(index, path)}
+
+# Request parameter parsing. Every algorithm also takes `types`, a comma
+# separated relationship type filter; the parsed dict is the cache key.
+def int_param(query, name, default, minimum=None, maximum=None):
+    try:
+        value = int(query.get(name, default))
+    except (TypeError, ValueError):
+        raise AnalyticsError(f"{name} must be an integer")
+    if minimum is not None and value < minimum:
+        raise AnalyticsError(f"{name} must be at least {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+def choice_param(query, name, choices):
+    value = query.get(name, choices[0])
+    if value not in choices:
+        raise AnalyticsError(f"{name} must be one of {', '.join(choices)}")
+    return value
+
+def limit_param(query):
+    return int_param(query, 'limit', 20, 1, getattr(settings, 'GRAPH_ANALYTICS_MAX_LIMIT', 1000))
+
+def pagerank_params(query):
+    try:
+        damping = float(query.get('damping', 0.85))
+    except ValueError:
+        raise AnalyticsError("damping must be a number")
+    if not 0 < damping < 1:
+        raise AnalyticsError("damping must be between 0 and 1")
+    return {'damping': damping, 'limit': limit_param(query)}
+
+def components_params(query):
+    return {'mode': choice_param(query, 'mode', ['weak', 'strong']), 'limit': limit_param(query)}
+
+def degrees_params(query):
+    return {'direction': choice_param(query, 'direction', ['both', 'out', 'in']), 'limit': limit_param(query)}
+
+def shortest_path_params(query):
+    if not query.get('source') or not query.get('target'):
+        raise AnalyticsError("source and target node ids are required")
+    return {
+        'source': int_param(query, 'source', None),
+        'target': int_param(query, 'target', None),
+        'directed': query.get('directed', '1') not in ('0', 'false'),
+    }
+
+ALGORITHMS = {
+    'pagerank': (pagerank, pagerank_params),
+    'components': (connected_components, components_params),
+    'degrees': (degree_distribution, degrees_params),
+    'shortest-path': (shortest_path, shortest_path_params),
+}
+
+def parse_params(algorithm, query):
+    params = ALGORITHMS[algorithm][1](query)
+    types = query.getlist('type') if hasattr(query, 'getlist') else []
+    types += [t for t in query.get('types', '').split(',')]
+    params['types'] = sorted({t.strip() for t in types if t.strip()})
+    return params
+
+def params_key(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+# The stored result for these parameters at this version, unless it failed
+def cached_result(algorithm, params, version):
+    entry = AnalyticsResult.objects.filter(
+        graph_version=version, algorithm=algorithm, params_key=params_key(params)
+    ).exclude(status=AnalyticsResult.FAILED).first()
+    if entry is not None and entry.status == AnalyticsResult.DONE:
+        AnalyticsResult.objects.filter(pk=entry.pk).update(last_used=timezone.now())
+    elif entry is not None and entry.status == AnalyticsResult.RUNNING and requeue_stale_jobs(entry.pk):
+        entry.status = AnalyticsResult.PENDING
+    return entry
+
+# Big graphs go to the worker instead of tying up a request
+def runs_in_background(query):
+    if query.get('background') in ('1', 'true'):
+        return True
+    index = graph_index_cache.index
+    edges = index.num_edges if index is not None else GraphRelationship.objects.count()
+    return edges > getattr(settings, 'GRAPH_ANALYTICS_BACKGROUND_EDGES', 1000000)
+
+def enqueue(algorithm, params, version):
+    entry, _ = AnalyticsResult.objects.update_or_create(
+        graph_version=version, algorithm=algorithm, params_key=params_key(params),
+        defaults={'params': params, 'status': AnalyticsResult.PENDING, 'result': None, 'error': ''}
+    )
+    return entry
+
+def store(algorithm, params, version, **fields):
+    entry, _ = AnalyticsResult.objects.update_or_create(
+        graph_version=version, algorithm=algorithm, params_key=params_key(params),
+        defaults=dict(fields, params=params, finished_at=timezone.now(), last_used=timezone.now())
+    )
+    evict_results()
+    return entry
+
+# Run an algorithm on the current graph and store the result under the
+# version the index was built from
+def compute(algorithm, params):
+    index = get_graph_index()
+    started = time.monotonic()
+    result = ALGORITHMS[algorithm][0](index, params)
+    return store(algorithm, params, index.version, status=AnalyticsResult.DONE, result=result,
+                 error='', duration=time.monotonic() - started)
+
+# Put jobs claimed longer than GRAPH_ANALYTICS_JOB_TIMEOUT ago back in the
+# queue; their worker is assumed to have died. Returns how many were reset.
+def requeue_stale_jobs(pk=None):
+    timeout = getattr(settings, 'GRAPH_ANALYTICS_JOB_TIMEOUT', 3600)
+    stale = AnalyticsResult.objects.filter(status=AnalyticsResult.RUNNING).filter(
+        Q(started_at__lt=timezone.now() - timedelta(seconds=timeout)) | Q(started_at__isnull=True))
+    if pk is not None:
+        stale = stale.filter(pk=pk)
+    return stale.update(status=AnalyticsResult.PENDING, started_at=None)
+
+# Claim and run one pending job. The graph may have changed since the job
+# was queued; it runs on the graph as it is now and the row is moved to
+# the version its result describes, so steady writes can't starve it.
+def run_job(entry):
+    claimed = AnalyticsResult.objects.filter(pk=entry.pk, status=AnalyticsResult.PENDING).update(
+        status=AnalyticsResult.RUNNING, started_at=timezone.now())
+    if not claimed:
+        return False
+
+    index = get_graph_index()
+    started = time.monotonic()
+    try:
+        fields = {'status': AnalyticsResult.DONE, 'error': '',
+                  'result': ALGORITHMS[entry.algorithm][0](index, entry.params)}
+    except Exception as e:
+        fields = {'status': AnalyticsResult.FAILED, 'error': str(e)}
+    fields.update(graph_version=index.version, duration=time.monotonic() - started,
+                  finished_at=timezone.now(), last_used=timezone.now())
+    with transaction.atomic():
+        # This job becomes the entry for the new version, replacing any other
+        AnalyticsResult.objects.filter(
+            graph_version=index.version, algorithm=entry.algorithm, params_key=entry.params_key
+        ).exclude(pk=entry.pk).delete()
+        AnalyticsResult.objects.filter(pk=entry.pk).update(**fields)
+    evict_results()
+    return True
+
+def run_pending_jobs(limit=None):
+    requeue_stale_jobs()
+    jobs = AnalyticsResult.objects.filter(status=AnalyticsResult.PENDING).order_by('created_at')
+    return sum(run_job(job) for job in jobs[:limit] if job.algorithm in ALGORITHMS)
+
+# Keep the most recently used finished results, like the layout cache
+def evict_results():
+    max_entries = getattr(settings, 'GRAPH_ANALYTICS_CACHE_SIZE', 200)
+    finished = AnalyticsResult.objects.filter(status__in=[AnalyticsResult.DONE, AnalyticsResult.FAILED])
+    stale = list(finished.order_by('-last_used').values_list('pk', flat=True)[max_entries:])
+    if stale:
+        AnalyticsResult.objects.filter(pk__in=stale).delete()
@@ -0,0 +1,316 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from .models import (AsyncNeo4jConnection, GraphNode, GraphRelationship, GraphVersion, Neo4jOutbox,
+                     KEY_PROPERTY, NODE_KEY_LABEL)
+from .outbox import (delete_node_payload, delete_node_statement, delete_relationship_payload,
+                     delete_relationship_statement, node_statement, relationship_statement)
+from .summary import property_text
+from .views import get_neo4j_credentials
+
+# JSON API views. They are async so that, under ASGI, a request waiting on
+# Neo4j doesn't hold a worker thread. SQLite writes and the Neo4j mirror run
+# concurrently; the outbox entry written with the row is only dropped once
+# the direct Neo4j write has succeeded, so the worker still covers failures.
+# (The HTML views stay synchronous: sessions and messages are sync-only.)
+
+# Fields the read API can return, mapped to model field names
+NODE_API_FIELDS = {
+    'id': 'id',
+    'uuid': 'uuid',
+    'label': 'label',
+    'name': 'name',
+    'properties': 'properties',
+    'node_id': 'node_id',
+}
+RELATIONSHIP_API_FIELDS = {
+    'id': 'id',
+    'uuid': 'uuid',
+    'source': 'source_id',
+    'target': 'target_id',
+    'type': 'type',
+    'properties': 'properties',
+    'relationship_id': 'relationship_id',
+}
+
+def get_async_connection():
+    return AsyncNeo4jConnection(*get_neo4j_credentials())
+
+def api_row(fields, row):
+    return {field: str(value) if field == 'uuid' else value for field, value in zip(fields, row)}
+
+# One keyset query per chunk, so no cursor is held open between chunks
+def ndjson_chunk(queryset, fields, after, chunk_size):
+    rows = list(queryset.filter(id__gt=after)[:chunk_size])
+    lines = [json.dumps(api_row(fields, row[1:])) + '\n' for row in rows]
+    return lines, (rows[-1][0] if len(rows) == chunk_size else None)
+
+# StreamingHttpResponse reads a whole iterator into memory when it is of the
+# wrong kind for the handler, so WSGI gets a sync generator and ASGI an async one
+def ndjson_lines(queryset, fields, after, chunk_size):
+    while after is not None:
+        lines, after = ndjson_chunk(queryset, fields, after, chunk_size)
+        yield from lines
+
+async def ndjson_stream(queryset, fields, after, chunk_size):
+    while after is not None:
+        lines, after = await sync_to_async(ndjson_chunk)(queryset, fields, after, chunk_size)
+        for line in lines:
+            yield line
+
+# Shared implementation of the read API: keyset pagination on id, field
+# selection, and either a cursor-paged JSON page or a streamed NDJSON body
+async def graph_api_response(request, queryset, api_fields):
+    requested = [f.strip() for f in request.GET.get('fields', '').split(',') if f.strip()]
+    unknown = [f for f in requested if f not in api_fields]
+    if unknown:
+        return JsonResponse({'error': f"Unknown fields: {', '.join(unknown)}"}, status=400)
+    fields = requested or list(api_fields)
+
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        max_limit = getattr(settings, 'GRAPH_API_MAX_PAGE_SIZE', 1000)
+        limit = min(int(request.GET.get('limit', max_limit)), max_limit)
+    except ValueError:
+        return JsonResponse({'error': "cursor and limit must be integers"}, status=400)
+    if cursor < 0 or limit < 1:
+        return JsonResponse({'error': "cursor must not be negative and limit must be at least 1"}, status=400)
+
+    # Always fetch the id so the next cursor is known, even if it isn't returned
+    columns = [api_fields[f] for f in fields]
+    queryset = queryset.filter(id__gt=cursor).order_by('id').values_list('id', *columns)
+
+    if request.GET.get('format') == 'ndjson':
+        chunk_size = getattr(settings, 'GRAPH_API_CHUNK_SIZE', 2000)
+        stream = ndjson_stream if isinstance(request, ASGIRequest) else ndjson_lines
+        return StreamingHttpResponse(stream(queryset, fields, cursor, chunk_size),
+                                     content_type='application/x-ndjson')
+
+    rows = [row async for row in queryset[:limit + 1]]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return JsonResponse({
+        'results': [api_row(fields, row[1:]) for row in rows],
+        'next_cursor': rows[-1][0] if has_more else None,
+    })
+
+# Parse a JSON request body, returning None when it isn't a JSON object
+def json_body(request):
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+# Neo4j can only store scalars and lists of scalars as property values
+NEO4J_SCALARS = (str, int, float, bool)
+
+def is_neo4j_value(value):
+    if isinstance(value, list):
+        return all(isinstance(item, NEO4J_SCALARS) for item in value)
+    return isinstance(value, NEO4J_SCALARS)
+
+# The properties of a create request, or None when Neo4j couldn't store them
+def body_properties(body):
+    properties = body.get('properties')
+    if properties is None:
+        return {}
+    if not isinstance(properties, dict) or not all(is_neo4j_value(v) for v in properties.values()):
+        return None
+    return properties
+
+def has_strings(body, *names):
+    return all(isinstance(body.get(name), str) and body[name] for name in names)
+
+# Save (or delete) a row together with its outbox entry and a version bump
+@sync_to_async
+def save_with_outbox(obj, operation, **payload):
+    with transaction.atomic():
+        if operation in (Neo4jOutbox.DELETE_NODE, Neo4jOutbox.DELETE_RELATIONSHIP):
+            entry = Neo4jOutbox.enqueue(operation, obj, **payload)
+            obj.delete()
+        else:
+            obj.save()
+            entry = Neo4jOutbox.enqueue(operation, obj)
+        GraphVersion.bump()
+    return entry
+
+# The direct write went through: store the Neo4j id and drop the outbox entry
+@sync_to_async
+def complete_entry(entry, obj=None, id_field=None, records=None):
+    with transaction.atomic():
+        if obj is not None and records:
+            setattr(obj, id_field, str(records[0]['id']))
+            obj.save(update_fields=[id_field])
+        Neo4jOutbox.objects.filter(id=entry.id).delete()
+
+# Run one statement against Neo4j. Returns its records, or None if Neo4j
+# is unavailable and the outbox has to take over.
+async def mirror(conn, statement):
+    if not conn.connected or statement is None:
+        return None
+    try:
+        results = await conn.run_transaction([statement])
+        return results[0]
+    except Exception as e:
+        print(f"Warning: Neo4j write failed, leaving it to the outbox: {e}")
+        return None
+
+# Write both stores at once. A failed SQLite write is undone in Neo4j.
+async def write_both(conn, obj, operation, statement, undo=None, payload=None):
+    entry, records = await asyncio.gather(
+        save_with_outbox(obj, operation, **(payload or {})),
+        mirror(conn, statement),
+        return_exceptions=True,
+    )
+    if isinstance(records, BaseException):
+        records = None
+    if isinstance(entry, BaseException):
+        if records is not None and undo is not None:
+            await mirror(conn, undo)
+        raise entry
+    return entry, records
+
+def node_json(node):
+    return {'id': node.id, 'uuid': str(node.uuid), 'label': node.label, 'name': node.name,
+            'properties': node.properties, 'node_id': node.node_id}
+
+def relationship_json(rel):
+    return {'id': rel.id, 'uuid': str(rel.uuid), 'source': rel.source_id, 'target': rel.target_id,
+            'type': rel.type, 'properties': rel.properties, 'relationship_id': rel.relationship_id}
+
+async def create_node(request):
+    body = json_body(request)
+    if body is None or not has_strings(body, 'label', 'name'):
+        return JsonResponse({'error': "Expected a JSON object with label and name strings"}, status=400)
+    properties = body_properties(body)
+    if properties is None:
+        return JsonResponse({'error': "properties must map names to scalars or lists of scalars"}, status=400)
+
+    # The key is assigned up front, so Neo4j can be written before SQLite has an id
+    node = GraphNode(label=body['label'], name=body['name'], properties=properties)
+    conn = get_async_connection()
+    undo = delete_node_statement({'key': str(node.uuid)})
+    entry, records = await write_both(conn, node, Neo4jOutbox.CREATE_NODE, node_statement(node), undo)
+    if records:
+        await complete_entry(entry, node, 'node_id', records)
+    return JsonResponse(node_json(node), status=201)
+
+async def create_relationship(request):
+    body = json_body(request)
+    if body is None or not has_strings(body, 'type') or not body.get('source') or not body.get('target'):
+        return JsonResponse({'error': "Expected a JSON object with source, target and a type string"}, status=400)
+    properties = body_properties(body)
+    if properties is None:
+        return JsonResponse({'error': "properties must map names to scalars or lists of scalars"}, status=400)
+
+    try:
+        source, target = await asyncio.gather(
+            GraphNode.objects.aget(id=body['source']),
+            GraphNode.objects.aget(id=body['target']),
+        )
+    except (GraphNode.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({'error': "Unknown source or target node"}, status=404)
+
+    rel = GraphRelationship(source=source, target=target, type=body['type'], properties=properties)
+    conn = get_async_connection()
+    undo = delete_relationship_statement({'key': str(rel.uuid), 'type': rel.type, 'source_key': str(source.uuid)})
+    entry, records = await write_both(conn, rel, Neo4jOutbox.CREATE_RELATIONSHIP, relationship_statement(rel), undo)
+    # No record means an endpoint isn't mirrored yet; the outbox retries later
+    if records:
+        await complete_entry(entry, rel, 'relationship_id', records)
+    return JsonResponse(relationship_json(rel), status=201)
+
+async def api_nodes(request):
+    if request.method == 'POST':
+        return await create_node(request)
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET', 'POST'])
+
+    nodes = GraphNode.objects.all()
+    if request.GET.get('label'):
+        nodes = nodes.filter(label=request.GET['label'])
+    if request.GET.get('property'):
+        nodes = nodes.annotate(property_value=property_text(f"properties__{request.GET['property']}")).filter(
+            property_value=request.GET.get('value', ''))
+    return await graph_api_response(request, nodes, NODE_API_FIELDS)
+
+async def api_relationships(request):
+    if request.method == 'POST':
+        return await create_relationship(request)
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET', 'POST'])
+
+    relationships = GraphRelationship.objects.all()
+    if request.GET.get('type'):
+        relationships = relationships.filter(type=request.GET['type'])
+    return await graph_api_response(request, relationships, RELATIONSHIP_API_FIELDS)
+
+# Neo4j's view of one node, or None when Neo4j can't be asked right now
+async def neo4j_node_state(conn, key):
+    if not conn.connected:
+        return None
+    query = (
+        f"MATCH (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $key}}) "
+        f"RETURN id(n) AS id, labels(n) AS labels, size([(n)--() | 1]) AS degree"
+    )
+    try:
+        records = await conn.run_query(query, {'key': str(key)})
+    except Exception as e:
+        print(f"Warning: Could not read node {key} from Neo4j: {e}")
+        return None
+    if not records:
+        return {'mirrored': False}
+    return {'mirrored': True, 'id': records[0]['id'], 'labels': records[0]['labels'],
+            'degree': records[0]['degree']}
+
+async def api_node_detail(request, key):
+    if request.method == 'DELETE':
+        try:
+            node = await GraphNode.objects.aget(uuid=key)
+        except GraphNode.DoesNotExist:
+            return JsonResponse({'error': "Node not found"}, status=404)
+
+        payload = delete_node_payload(node)
+        conn = get_async_connection()
+        entry, records = await write_both(conn, node, Neo4jOutbox.DELETE_NODE,
+                                          delete_node_statement(payload), payload=payload)
+        if records is not None:
+            await complete_entry(entry)
+        return JsonResponse({'deleted': str(key)})
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET', 'DELETE'])
+
+    # Both stores are keyed by uuid, so they can be read at the same time
+    conn = get_async_connection()
+    node, outgoing, incoming, neo4j = await asyncio.gather(
+        GraphNode.objects.filter(uuid=key).afirst(),
+        GraphRelationship.objects.filter(source__uuid=key).acount(),
+        GraphRelationship.objects.filter(target__uuid=key).acount(),
+        neo4j_node_state(conn, key),
+    )
+    if node is None:
+        return JsonResponse({'error': "Node not found"}, status=404)
+    return JsonResponse(dict(node_json(node), degree=outgoing + incoming, neo4j=neo4j))
+
+async def api_relationship_detail(request, key):
+    if request.method not in ('GET', 'DELETE'):
+        return HttpResponseNotAllowed(['GET', 'DELETE'])
+
+    rel = await GraphRelationship.objects.select_related('source').filter(uuid=key).afirst()
+    if rel is None:
+        return JsonResponse({'error': "Relationship not found"}, status=404)
+    if request.method == 'GET':
+        return JsonResponse(relationship_json(rel))
+
+    payload = delete_relationship_payload(rel)
+    conn = get_async_connection()
+    entry, records = await write_both(conn, rel, Neo4jOutbox.DELETE_RELATIONSHIP,
+                                      delete_relationship_statement(payload), payload=payload)
+    if records is not None:
+        await complete_entry(entry)
+    return JsonResponse({'deleted': str(key)})
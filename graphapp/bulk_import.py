@@ -0,0 +1,214 @@
+import csv
+import io
+import json
+import time
+import uuid
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from .models import GraphNode, GraphRelationship, GraphVersion, Neo4jOutbox, KEY_PROPERTY
+
+NODE_FIELDS = ('label', 'name')
+RELATIONSHIP_FIELDS = ('source', 'target', 'type')
+
+def get_batch_size(batch_size=None):
+    if batch_size in (None, ''):
+        batch_size = getattr(settings, 'GRAPH_IMPORT_BATCH_SIZE', 1000)
+    try:
+        batch_size = int(batch_size)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid batch size: {batch_size}")
+    if batch_size < 1:
+        raise ValueError(f"The batch size must be at least 1, not {batch_size}")
+    return batch_size
+
+# Guess the file format from its name when it isn't given explicitly
+def detect_format(filename, file_format=None):
+    if file_format:
+        return file_format.lower()
+    if filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+def csv_records(text):
+    reader = csv.DictReader(text)
+    try:
+        yield from reader
+    except csv.Error as e:
+        raise ValueError(f"Malformed CSV on line {reader.line_num}: {e}")
+
+# Yield one dict per row without reading the whole file into memory
+def iter_rows(stream, file_format, required_fields):
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+    if file_format == 'jsonl':
+        records = (json.loads(line) for line in text if line.strip())
+    elif file_format == 'csv':
+        records = csv_records(text)
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            raise ValueError(f"Record {number} is not a JSON object")
+        properties = record.pop('properties', None) or {}
+        if isinstance(properties, str):
+            properties = json.loads(properties)
+        if not isinstance(properties, dict):
+            raise ValueError(f"The properties of record {number} are not a JSON object")
+        properties = dict(properties)
+        # Any extra column or key becomes a property; empty CSV cells are skipped
+        for key, value in record.items():
+            if key not in required_fields and key and value not in (None, ''):
+                properties[key] = value
+        row = {field: record.get(field) for field in required_fields}
+        row['properties'] = properties
+        yield row
+
+def iter_chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+class ImportStats:
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.mirrored = 0
+        self.started = time.monotonic()
+
+    @property
+    def seconds(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.imported / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.imported} rows imported, {self.skipped} skipped, "
+                f"{self.mirrored} mirrored to Neo4j in {self.seconds:.2f}s "
+                f"({self.rows_per_sec:.0f} rows/sec)")
+
+# Group rows by a key while keeping their positions so results can be matched back
+def group_positions(rows, key):
+    groups = {}
+    for position, row in enumerate(rows):
+        groups.setdefault(row[key], []).append(position)
+    return groups
+
+# Insert one chunk's model instances and their outbox entries in a single
+# transaction, so every imported row reaches Neo4j sooner or later and a
+# failed chunk leaves nothing behind in either store
+def insert_chunk(model, objects, operation):
+    with transaction.atomic():
+        objects = model.objects.bulk_create(objects)
+        entries = Neo4jOutbox.objects.bulk_create(
+            [Neo4jOutbox(operation=operation, object_id=obj.pk) for obj in objects])
+        GraphVersion.bump()
+    return objects, entries
+
+# Store the Neo4j ids of the objects at `positions` and drop their outbox
+# entries; the rest stay queued for `manage.py process_outbox`
+def complete_entries(model, field, objects, entries, positions):
+    if positions:
+        with transaction.atomic():
+            model.objects.bulk_update([objects[p] for p in positions], [field])
+            Neo4jOutbox.objects.filter(id__in=[entries[p].id for p in positions]).delete()
+    return len(positions)
+
+def import_nodes(stream, file_format, conn=None, batch_size=None, progress=None):
+    stats = ImportStats()
+    mirror = conn is not None and conn.connected
+    for chunk in iter_chunks(iter_rows(stream, file_format, NODE_FIELDS), get_batch_size(batch_size)):
+        rows = [row for row in chunk if row['label'] and row['name']]
+        stats.skipped += len(chunk) - len(rows)
+        nodes, entries = insert_chunk(GraphNode, [
+            GraphNode(label=row['label'], name=row['name'], properties=row['properties'], uuid=uuid.uuid4())
+            for row in rows
+        ], Neo4jOutbox.CREATE_NODE)
+        stats.imported += len(nodes)
+
+        # Then mirror the chunk straight away, a single UNWIND query per label
+        if mirror:
+            mirrored = []
+            try:
+                for label, positions in group_positions(rows, 'label').items():
+                    batch = [dict(rows[p]['properties'], name=rows[p]['name'], **{KEY_PROPERTY: str(nodes[p].uuid)})
+                             for p in positions]
+                    for index, node_id in conn.create_nodes_batch(label, batch).items():
+                        nodes[positions[index]].node_id = str(node_id)
+                        mirrored.append(positions[index])
+            except Exception as e:
+                print(f"Warning: Could not mirror imported nodes to Neo4j, they stay queued on the outbox: {e}")
+                mirror = False
+            stats.mirrored += complete_entries(GraphNode, 'node_id', nodes, entries, mirrored)
+        if progress:
+            progress(stats)
+    return stats
+
+# Look up the endpoints referenced by one chunk, either by primary key or by name
+def resolve_nodes(keys, match_on):
+    if match_on == 'name':
+        matches = {}
+        rows = GraphNode.objects.filter(name__in=keys).values_list('name', 'id', 'uuid', 'node_id').order_by('id')
+        for name, pk, key, node_id in rows:
+            matches.setdefault(name, (pk, key, node_id))
+        return matches
+    if match_on == 'id':
+        pks = [int(key) for key in keys if str(key).isdigit()]
+        rows = GraphNode.objects.filter(id__in=pks).values_list('id', 'uuid', 'node_id')
+        return {str(pk): (pk, key, node_id) for pk, key, node_id in rows}
+    raise ValueError(f"Unsupported match field: {match_on}")
+
+def import_relationships(stream, file_format, conn=None, batch_size=None, match_on='id', progress=None):
+    stats = ImportStats()
+    mirror = conn is not None and conn.connected
+    for chunk in iter_chunks(iter_rows(stream, file_format, RELATIONSHIP_FIELDS), get_batch_size(batch_size)):
+        keys = {str(row[field]) for row in chunk for field in ('source', 'target')}
+        nodes = resolve_nodes(keys, match_on)
+
+        resolved = []
+        for row in chunk:
+            source = nodes.get(str(row['source']))
+            target = nodes.get(str(row['target']))
+            if source is None or target is None or not row['type']:
+                stats.skipped += 1
+                continue
+            resolved.append(dict(row, source=source, target=target))
+        relationships, entries = insert_chunk(GraphRelationship, [
+            GraphRelationship(source_id=row['source'][0], target_id=row['target'][0], type=row['type'],
+                              properties=row['properties'], uuid=uuid.uuid4())
+            for row in resolved
+        ], Neo4jOutbox.CREATE_RELATIONSHIP)
+        stats.imported += len(relationships)
+
+        if mirror:
+            mirrored = []
+            try:
+                for rel_type, positions in group_positions(resolved, 'type').items():
+                    # Only relationships whose endpoints already exist in Neo4j can be mirrored
+                    positions = [p for p in positions if resolved[p]['source'][2] and resolved[p]['target'][2]]
+                    rows = [{
+                        'start_key': str(resolved[p]['source'][1]),
+                        'end_key': str(resolved[p]['target'][1]),
+                        'props': dict(resolved[p]['properties'], **{KEY_PROPERTY: str(relationships[p].uuid)}),
+                    } for p in positions]
+                    ids = conn.create_relationships_batch(rel_type, rows) if rows else {}
+                    for index, rel_id in ids.items():
+                        relationships[positions[index]].relationship_id = str(rel_id)
+                        mirrored.append(positions[index])
+            except Exception as e:
+                print(f"Warning: Could not mirror imported relationships to Neo4j, "
+                      f"they stay queued on the outbox: {e}")
+                mirror = False
+            stats.mirrored += complete_entries(GraphRelationship, 'relationship_id', relationships, entries, mirrored)
+        if progress:
+            progress(stats)
+    return stats
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import zlib
+from xml.sax.saxutils import escape
+from django.conf import settings
+from .models import GraphNode, GraphRelationship
+
+EXPORT_FORMATS = ('jsonl', 'csv', 'graphml')
+EXPORT_KINDS = ('all', 'nodes', 'relationships')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'graphml': 'application/graphml+xml',
+}
+
+NODE_COLUMNS = ('id', 'label', 'name', 'properties', 'node_id')
+RELATIONSHIP_COLUMNS = ('id', 'source_id', 'target_id', 'type', 'properties', 'relationship_id')
+
+def get_chunk_size():
+    return getattr(settings, 'GRAPH_EXPORT_CHUNK_SIZE', 2000)
+
+# Rows are read with iterator() so only one chunk is ever held in memory
+def iter_nodes():
+    return GraphNode.objects.order_by('id').values_list(*NODE_COLUMNS).iterator(chunk_size=get_chunk_size())
+
+def iter_relationships():
+    return GraphRelationship.objects.order_by('id').values_list(*RELATIONSHIP_COLUMNS).iterator(chunk_size=get_chunk_size())
+
+def export_jsonl(kind):
+    if kind in ('all', 'nodes'):
+        for row in iter_nodes():
+            yield json.dumps(dict(zip(NODE_COLUMNS, row), kind='node')) + '\n'
+    if kind in ('all', 'relationships'):
+        for row in iter_relationships():
+            yield json.dumps(dict(zip(RELATIONSHIP_COLUMNS, row), kind='relationship')) + '\n'
+
+# CSV holds one table per file, so kind is 'nodes' or 'relationships'
+def export_csv(kind):
+    columns, rows = (NODE_COLUMNS, iter_nodes()) if kind == 'nodes' else (RELATIONSHIP_COLUMNS, iter_relationships())
+    properties_index = columns.index('properties')
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        row = list(row)
+        row[properties_index] = json.dumps(row[properties_index])
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def graphml_data(key, value):
+    return f'<data key="{key}">{escape(str(value))}</data>'
+
+def export_graphml(kind):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+           '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+           '  <key id="name" for="node" attr.name="name" attr.type="string"/>\n'
+           '  <key id="node_properties" for="node" attr.name="properties" attr.type="string"/>\n'
+           '  <key id="type" for="edge" attr.name="type" attr.type="string"/>\n'
+           '  <key id="edge_properties" for="edge" attr.name="properties" attr.type="string"/>\n'
+           '  <graph id="G" edgedefault="directed">\n')
+    if kind in ('all', 'nodes'):
+        for pk, label, name, properties, _ in iter_nodes():
+            yield (f'    <node id="n{pk}">{graphml_data("label", label)}{graphml_data("name", name)}'
+                   f'{graphml_data("node_properties", json.dumps(properties))}</node>\n')
+    if kind in ('all', 'relationships'):
+        for pk, source_id, target_id, rel_type, properties, _ in iter_relationships():
+            yield (f'    <edge id="e{pk}" source="n{source_id}" target="n{target_id}">{graphml_data("type", rel_type)}'
+                   f'{graphml_data("edge_properties", json.dumps(properties))}</edge>\n')
+    yield '  </graph>\n</graphml>\n'
+
+EXPORTERS = {
+    'jsonl': export_jsonl,
+    'csv': export_csv,
+    'graphml': export_graphml,
+}
+
+# Encode the text pieces, gather them into blocks of about `block_size` bytes
+# and optionally gzip them as they go
+def encode_stream(pieces, compress=False, block_size=64 * 1024):
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    block = []
+    size = 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        block.append(data)
+        size += len(data)
+        if size >= block_size:
+            data = b''.join(block)
+            block, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    data = b''.join(block)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+def export_graph(file_format, kind='all', compress=False):
+    if file_format not in EXPORTERS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unsupported export kind: {kind}")
+    # Checked up front: generators only raise once the response is already streaming
+    if file_format == 'csv' and kind == 'all':
+        raise ValueError("CSV export needs kind 'nodes' or 'relationships'")
+    return encode_stream(EXPORTERS[file_format](kind), compress)
+
+def export_filename(file_format, kind, compress=False):
+    extension = 'jsonl' if file_format == 'jsonl' else file_format
+    name = f"mrgraphy-{kind}.{extension}"
+    return f"{name}.gz" if compress else name
@@ -0,0 +1,333 @@
+import hashlib
+import json
+import re
+from django.db import connection, models
+from django.db.models import F, Func, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.fields.json import KeyTransform
+from .models import quote_identifier
+
+# Property predicates for node and relationship filters, e.g.
+#
+#   age >= 30; occupation = "Software Engineer"; level in (Expert, Advanced); since exists
+#
+# Predicates are separated by ';' or 'and' and all have to hold. Operators
+# are = != > >= < <=, `in (...)`, `exists` and `missing`; nested keys are
+# written a.b. Values are numbers, true/false/null, quoted strings or bare
+# words. The parsed predicates compile to JSONField lookups (JSON1 in
+# SQLite), to indexed generated columns where `manage.py index_properties`
+# created one, and to a parameterised Cypher WHERE clause for Neo4j.
+
+class FilterError(ValueError):
+    pass
+
+TOKEN = re.compile(r"""\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<symbol>>=|<=|!=|=|>|<|\(|\)|,|;)
+  | (?P<word>[^\s=!<>(),;"']+)
+)""", re.VERBOSE)
+KEY = re.compile(r'^[\w\-]+$')
+COMPARISONS = ('=', '!=', '>', '>=', '<', '<=')
+
+class Predicate:
+    def __init__(self, path, op, value=None):
+        self.path = path
+        self.op = op
+        self.value = value
+
+    def __str__(self):
+        path = '.'.join(self.path)
+        if self.op in ('exists', 'missing'):
+            return f"{path} {self.op}"
+        if self.op == 'in':
+            return f"{path} in ({', '.join(json.dumps(v) for v in self.value)})"
+        return f"{path} {self.op} {json.dumps(self.value)}"
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise FilterError(f"Can't read the filter near: {text[position:position + 20]}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+def literal(kind, text):
+    if kind == 'string':
+        if text[0] == "'":
+            text = '"' + text[1:-1].replace('\\\'', '\'').replace('"', '\\"') + '"'
+        try:
+            return json.loads(text)
+        except ValueError:
+            raise FilterError(f"Invalid string: {text}")
+    if kind != 'word':
+        raise FilterError(f"Expected a value, found '{text}'")
+    lowered = text.lower()
+    if lowered in ('true', 'false', 'null'):
+        return {'true': True, 'false': False, 'null': None}[lowered]
+    for number in (int, float):
+        try:
+            return number(text)
+        except ValueError:
+            pass
+    return text
+
+def parse_filter(text):
+    tokens = tokenize(text or '')
+    predicates = []
+    position = 0
+
+    def take():
+        nonlocal position
+        if position >= len(tokens):
+            raise FilterError("The filter ends in the middle of a predicate")
+        position += 1
+        return tokens[position - 1]
+
+    # A value; unquoted words run together up to the next symbol or 'and'
+    def value_token():
+        nonlocal position
+        kind, text = take()
+        if kind != 'word':
+            return literal(kind, text)
+        while (position < len(tokens) and tokens[position][0] == 'word'
+               and tokens[position][1].lower() != 'and'):
+            text += ' ' + take()[1]
+        return literal('word', text)
+
+    while position < len(tokens):
+        kind, path = take()
+        if kind != 'word' or not all(KEY.match(key) for key in path.split('.')):
+            raise FilterError(f"Expected a property name, found '{path}'")
+        path = parse_path(path)
+        kind, op = take()
+        op = op.lower() if kind == 'word' else op
+        if op in ('exists', 'missing'):
+            predicates.append(Predicate(path, op))
+        elif op == 'in':
+            if take() != ('symbol', '('):
+                raise FilterError("Expected '(' after in")
+            values = []
+            while True:
+                values.append(value_token())
+                separator = take()
+                if separator == ('symbol', ')'):
+                    break
+                if separator != ('symbol', ','):
+                    raise FilterError("Expected ',' or ')' in the value list")
+            predicates.append(Predicate(path, 'in', values))
+        elif kind == 'symbol' and op in COMPARISONS:
+            value = value_token()
+            if value is None and op != '=':
+                raise FilterError("null can only be compared with =")
+            predicates.append(Predicate(path, op, value))
+        else:
+            raise FilterError(f"Unknown operator '{op}'")
+
+        if position < len(tokens):
+            kind, separator = take()
+            if separator != ';' and separator.lower() != 'and':
+                raise FilterError(f"Expected ';' or 'and' between predicates, found '{separator}'")
+    return predicates
+
+# Stable text for a predicate list, e.g. for cache keys (hashed when long)
+def filter_key(predicates, max_length=255):
+    key = '; '.join(str(predicate) for predicate in predicates)
+    if max_length is not None and len(key) > max_length:
+        return 'sha1:' + hashlib.sha1(key.encode()).hexdigest()
+    return key
+
+# Generated columns created by index_properties are named after the path.
+# Keys can't contain '.', so joining them with it can't make two paths collide.
+COLUMN_PREFIX = 'prop:'
+
+def indexed_column(path):
+    return COLUMN_PREFIX + '.'.join(path)
+
+def json_path(path):
+    return '$' + ''.join('.' + json.dumps(key, ensure_ascii=False) for key in path)
+
+def parse_path(text):
+    keys = tuple(text.split('.'))
+    check_path(keys)
+    return keys
+
+def check_path(path):
+    if not path or not all(isinstance(key, str) and KEY.match(key) for key in path):
+        raise FilterError(f"Invalid property path: {'.'.join(map(str, path))}")
+
+def generated_columns(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA table_xinfo("{table}")')
+        # hidden is 2 or 3 for generated columns
+        return {row[1] for row in cursor.fetchall() if row[1].startswith(COLUMN_PREFIX) and row[6] in (2, 3)}
+
+# Property values come from forms and CSV files as strings, so "30" has to
+# compare like 30. A text value counts as a number when it is a plain
+# decimal: one optional sign, digits and at most one point. Only built-in
+# SQLite functions are used, so the same SQL can back a generated column.
+def numeric_text(sql):
+    digits = f"ltrim({sql}, '+-')"
+    return (f"({sql} <> '' AND length({sql}) - length({digits}) <= 1 AND {digits} GLOB '*[0-9]*' "
+            f"AND {digits} NOT GLOB '*[^0-9.]*' AND {digits} NOT GLOB '*.*.*')")
+
+# `sql` as a number: numbers as they are, numeric text cast, anything else NULL
+def number(sql):
+    return (f"CASE WHEN typeof({sql}) IN ('integer', 'real') THEN {sql} "
+            f"WHEN typeof({sql}) = 'text' AND {numeric_text(sql)} THEN CAST({sql} AS REAL) END")
+
+# `sql` with numeric text cast to a number and everything else unchanged
+def normalized(sql):
+    return f"CASE WHEN typeof({sql}) = 'text' AND {numeric_text(sql)} THEN CAST({sql} AS REAL) ELSE {sql} END"
+
+# The property the way Django's key transforms read it: true, false and null
+# as those words, other scalars as SQL values, objects and arrays as JSON
+def json_value(field, path):
+    path = "'" + json_path(path).replace("'", "''") + "'"
+    return (f"CASE WHEN json_type(\"{field}\", {path}) IN ('null', 'true', 'false') "
+            f"THEN json_type(\"{field}\", {path}) ELSE json_extract(\"{field}\", {path}) END")
+
+class Number(Func):
+    output_field = models.FloatField()
+
+    def as_sql(self, compiler, connection):
+        sql, params = compiler.compile(self.source_expressions[0])
+        template = number('{0}')
+        # Every copy of the inner expression needs its own parameters
+        return template.format(sql), tuple(params) * template.count('{0}')
+
+# Indexed VIRTUAL generated column holding one property, with numeric text
+# stored as a number, so filters on it are index lookups instead of a
+# json_extract() per row. Columns that aren't in the models are dropped
+# whenever a migration rebuilds the table.
+def add_property_index(model, path, field='properties'):
+    check_path(path)
+    table = model._meta.db_table
+    column = indexed_column(path)
+    if column in generated_columns(table):
+        return False
+    expression = normalized(f"({json_value(field, path)})")
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" GENERATED ALWAYS AS ({expression}) VIRTUAL')
+        cursor.execute(f'CREATE INDEX "{table}_{column}_idx" ON "{table}" ("{column}")')
+    return True
+
+def drop_property_index(model, path):
+    check_path(path)
+    table = model._meta.db_table
+    column = indexed_column(path)
+    if column not in generated_columns(table):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP INDEX IF EXISTS "{table}_{column}_idx"')
+        cursor.execute(f'ALTER TABLE "{table}" DROP COLUMN "{column}"')
+    return True
+
+LOOKUPS = {'=': 'exact', '>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte', 'in': 'in'}
+NUMBER_TYPES = ('integer', 'real')
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# Each path is aliased as an expression first, so property keys that happen
+# to be lookup names ("in", "contains", ...) can't be mistaken for lookups
+def key_expression(field, path):
+    expression = F(field)
+    for key in path:
+        expression = KeyTransform(key, expression)
+    return expression
+
+# Generated columns hold true/false/null as words, like json_value()
+def column_value(value):
+    return {True: 'true', False: 'false', None: 'null'}.get(value, value) if not is_number(value) else value
+
+def lookup(alias, op, value):
+    return Q(**{f"{alias}__{LOOKUPS[op]}": value})
+
+# Condition for one predicate. `value_alias` is the property as stored,
+# `number_alias` the property as a number (NULL when it isn't one) and
+# `type_alias`, for generated columns, the SQLite type of the column.
+def condition(predicate, value_alias, number_alias, type_alias=None, column=False):
+    if predicate.op in ('exists', 'missing'):
+        return Q(**{f"{value_alias}__isnull": predicate.op == 'missing'})
+
+    op = '=' if predicate.op == '!=' else predicate.op
+    values = predicate.value if op == 'in' else [predicate.value]
+    numbers = [v for v in values if is_number(v)]
+    others = [column_value(v) if column else v for v in values if not is_number(v)]
+    # A generated column already holds numeric text as numbers, so numeric
+    # comparisons stay on its index and only need a type check
+    number_guard = Q(**{f"{type_alias}__in": NUMBER_TYPES}) if column else Q(**{f"{number_alias}__isnull": False})
+
+    result = Q()
+    if numbers:
+        result |= lookup(number_alias, op, numbers if op == 'in' else numbers[0]) & number_guard
+    if others:
+        result |= lookup(value_alias, op, others if op == 'in' else others[0])
+    if predicate.op == '!=':
+        # "is present, and differs", whatever the property's type
+        return ~result & Q(**{f"{value_alias}__isnull": False})
+    return result
+
+# Narrow a queryset with predicates on its model's `properties` JSONField.
+# Paths with a generated column (see index_properties) compare the column
+# so SQLite can use its index; the rest go through JSON1 json_extract().
+# Numbers compare numerically with numbers and with numeric text.
+def apply_filter(queryset, predicates, field='properties'):
+    if not predicates:
+        return queryset
+    table = queryset.model._meta.db_table
+    columns = generated_columns(table)
+    aliases = {}
+    conditions = Q()
+    for i, predicate in enumerate(predicates):
+        value_alias, number_alias, type_alias = f"_filter{i}", f"_filter{i}_number", f"_filter{i}_type"
+        column = indexed_column(predicate.path)
+        if column in columns:
+            aliases[value_alias] = RawSQL(f'"{table}"."{column}"', [], output_field=models.Field())
+            aliases[type_alias] = RawSQL(f'typeof("{table}"."{column}")', [], output_field=models.CharField())
+            number_alias = value_alias
+        else:
+            aliases[value_alias] = key_expression(field, predicate.path)
+            aliases[number_alias] = Number(key_expression(field, predicate.path))
+        conditions &= condition(predicate, value_alias, number_alias, type_alias, column in columns)
+    return queryset.alias(**aliases).filter(conditions)
+
+CYPHER_OPERATORS = {'=': '=', '!=': '<>', '>': '>', '>=': '>=', '<': '<', '<=': '<=', 'in': 'IN'}
+
+# Parameterised Cypher condition on the properties of `var`. Returns
+# (clause, parameters); the clause is 'true' when there are no predicates.
+# Numbers are compared through toFloatOrNull(), so numeric strings match.
+def cypher_where(predicates, var, param_prefix='filter'):
+    clauses = []
+    parameters = {}
+    for i, predicate in enumerate(predicates):
+        # Neo4j properties can't hold maps, so nested paths have nothing to match
+        if len(predicate.path) > 1:
+            raise FilterError("Nested property paths can't be matched in Neo4j")
+        ref = f"{var}.{quote_identifier(predicate.path[0])}"
+        if predicate.op == 'exists' or predicate.op == 'missing':
+            clauses.append(f"{ref} IS {'NOT ' if predicate.op == 'exists' else ''}NULL")
+            continue
+        if predicate.value is None:
+            clauses.append(f"{ref} IS NULL")
+            continue
+
+        op = '=' if predicate.op == '!=' else predicate.op
+        values = predicate.value if op == 'in' else [predicate.value]
+        parts = []
+        for suffix, subject, matching in (('n', f"toFloatOrNull({ref})", [v for v in values if is_number(v)]),
+                                          ('', ref, [v for v in values if not is_number(v)])):
+            if matching:
+                name = f"{param_prefix}{i}{suffix}"
+                parameters[name] = matching if op == 'in' else matching[0]
+                parts.append(f"{subject} {CYPHER_OPERATORS[op]} ${name}")
+        clause = ' OR '.join(parts)
+        if predicate.op == '!=':
+            clause = f"{ref} IS NOT NULL AND NOT coalesce({clause}, false)"
+        clauses.append(f"({clause})")
+    return ' AND '.join(clauses) or 'true', parameters
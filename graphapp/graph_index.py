@@ -0,0 +1,262 @@
+import copy
+import threading
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from .models import GraphChange, GraphNode, GraphRelationship, GraphVersion
+
+# Compact in-process adjacency index of the whole graph. Nodes are numbered
+# 0..n-1 in primary key order; edges are stored twice in CSR form (grouped by
+# source, and by target for reverse lookups) as flat NumPy arrays, so a
+# million edges take tens of megabytes instead of a networkx dict per edge.
+# Indexes are immutable: a refresh builds a new one and swaps it in, so a
+# request keeps a consistent view for as long as it holds its reference.
+
+# Ids per SQLite IN (...) query, below the default variable limit
+LOOKUP_CHUNK_SIZE = 900
+
+def chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def type_dtype(count):
+    return np.uint16 if count <= np.iinfo(np.uint16).max else np.uint32
+
+# Offsets array for CSR rows: row i spans indptr[i]:indptr[i + 1]
+def csr_indptr(rows, n):
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr
+
+class GraphIndex:
+    def __init__(self, version, change_position, node_ids, edge_ids, sources, targets, edge_types, types):
+        # node_ids is sorted; the other arrays are parallel, one entry per edge,
+        # with endpoints given as node primary keys
+        self.version = version
+        self.change_position = change_position
+        self.node_ids = node_ids
+        self.types = list(types)
+        self.type_codes = {name: code for code, name in enumerate(self.types)}
+
+        n = len(node_ids)
+        src = np.searchsorted(node_ids, sources).astype(np.int32)
+        dst = np.searchsorted(node_ids, targets).astype(np.int32)
+        edge_types = edge_types.astype(type_dtype(len(self.types)))
+
+        # Stable sorts keep each row's edges in primary key order
+        order = np.argsort(src, kind='stable')
+        self.out_indptr = csr_indptr(src, n)
+        self.out_indices = dst[order]
+        self.out_types = edge_types[order]
+        self.out_edges = edge_ids[order]
+
+        order = np.argsort(dst, kind='stable')
+        self.in_indptr = csr_indptr(dst, n)
+        self.in_indices = src[order]
+        self.in_types = edge_types[order]
+        self.in_edges = edge_ids[order]
+
+    # Same arrays under a new version, for version bumps that left no log rows
+    def with_version(self, version):
+        if version == self.version:
+            return self
+        index = copy.copy(self)
+        index.version = version
+        return index
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.out_indices)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.node_ids, self.out_indptr, self.out_indices, self.out_types, self.out_edges,
+            self.in_indptr, self.in_indices, self.in_types, self.in_edges))
+
+    # Edge arrays in (source, target, type, id) form, ordered by source
+    def edges(self):
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.out_indptr))
+        return sources, self.out_indices, self.out_types, self.out_edges
+
+    # Position of node primary keys in the index; -1 for unknown nodes
+    def positions(self, pks):
+        pks = np.asarray(pks, dtype=np.int64)
+        if not self.num_nodes:
+            return np.full(len(pks), -1, dtype=np.int64)
+        found = np.searchsorted(self.node_ids, pks).clip(max=self.num_nodes - 1)
+        return np.where(self.node_ids[found] == pks, found, -1)
+
+    def position(self, pk):
+        found = self.positions([pk])[0]
+        return None if found < 0 else int(found)
+
+    # Type codes for relationship type names; unknown names are dropped
+    def codes(self, type_names):
+        return np.array([self.type_codes[name] for name in type_names if name in self.type_codes],
+                        dtype=self.out_types.dtype)
+
+    # Boolean mask over the forward edge arrays selecting the given types
+    # (all edges when type_names is empty or None)
+    def type_mask(self, type_names=None, types=None):
+        types = self.out_types if types is None else types
+        if not type_names:
+            return np.ones(len(types), dtype=bool)
+        return np.isin(types, self.codes(type_names))
+
+    def _neighbors(self, indptr, indices, edge_types, positions, type_names):
+        positions = np.atleast_1d(np.asarray(positions, dtype=np.int64))
+        starts, ends = indptr[positions], indptr[positions + 1]
+        # Gather every [start, end) slice at once instead of looping in Python
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        found = indices[offsets]
+        if type_names:
+            found = found[np.isin(edge_types[offsets], self.codes(type_names))]
+        return found
+
+    # Positions reachable over one outgoing/incoming edge from the given positions
+    def successors(self, positions, type_names=None):
+        return self._neighbors(self.out_indptr, self.out_indices, self.out_types, positions, type_names)
+
+    def predecessors(self, positions, type_names=None):
+        return self._neighbors(self.in_indptr, self.in_indices, self.in_types, positions, type_names)
+
+    def neighbors(self, positions, type_names=None, direction='both'):
+        if direction == 'out':
+            return np.unique(self.successors(positions, type_names))
+        if direction == 'in':
+            return np.unique(self.predecessors(positions, type_names))
+        return np.unique(np.concatenate([self.successors(positions, type_names),
+                                         self.predecessors(positions, type_names)]))
+
+    def out_degrees(self):
+        return np.diff(self.out_indptr)
+
+    def in_degrees(self):
+        return np.diff(self.in_indptr)
+
+    def __repr__(self):
+        return (f"<GraphIndex v{self.version}: {self.num_nodes} nodes, {self.num_edges} edges, "
+                f"{self.nbytes / 1e6:.1f} MB>")
+
+def relationship_arrays(rows, types):
+    # rows: iterable of (id, source_id, target_id, type); types: name -> code, extended in place
+    edge_ids, sources, targets, codes = [], [], [], []
+    for rel_id, source_id, target_id, rel_type in rows:
+        edge_ids.append(rel_id)
+        sources.append(source_id)
+        targets.append(target_id)
+        codes.append(types.setdefault(rel_type, len(types)))
+    return (np.array(edge_ids, dtype=np.int64), np.array(sources, dtype=np.int64),
+            np.array(targets, dtype=np.int64), np.array(codes, dtype=np.int64))
+
+# Read the whole graph from SQLite. The change log position is taken in the
+# same transaction, so later refreshes replay exactly what came after it.
+def build_index():
+    chunk_size = getattr(settings, 'GRAPH_INDEX_CHUNK_SIZE', 10000)
+    with transaction.atomic():
+        version = GraphVersion.current()
+        position = GraphChange.objects.aggregate(position=Max('id'))['position'] or 0
+        node_ids = np.fromiter(
+            GraphNode.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=chunk_size),
+            dtype=np.int64)
+        types = {}
+        rows = GraphRelationship.objects.order_by('id').values_list(
+            'id', 'source_id', 'target_id', 'type').iterator(chunk_size=chunk_size)
+        edge_ids, sources, targets, codes = relationship_arrays(rows, types)
+    return GraphIndex(version, position, node_ids, edge_ids, sources, targets, codes, types)
+
+# Apply the change log since index.change_position. Only the changed rows
+# are read back from SQLite; the CSR arrays are then rebuilt from the
+# patched edge list with vectorised sorts. Returns None when a full rebuild
+# is needed instead (log pruned, too many changes, or no row ids logged).
+def refresh_index(index):
+    max_ratio = getattr(settings, 'GRAPH_INDEX_MAX_CHANGE_RATIO', 0.25)
+    with transaction.atomic():
+        version = GraphVersion.current()
+        changes = GraphChange.objects.filter(id__gt=index.change_position)
+        count = changes.count()
+        if count > max(max_ratio * (index.num_nodes + index.num_edges), 1000):
+            return None
+        changes = list(changes.order_by('id').values_list('id', 'kind', 'object_id'))
+        if not changes:
+            return index.with_version(version)
+        # AUTOINCREMENT ids have no gaps, so a gap means rows were pruned
+        if changes[0][0] != index.change_position + 1 or any(object_id is None for _, _, object_id in changes):
+            return None
+
+        changed_nodes = {object_id for _, kind, object_id in changes if kind == GraphChange.NODE}
+        changed_edges = {object_id for _, kind, object_id in changes if kind == GraphChange.RELATIONSHIP}
+        existing_nodes = set()
+        for chunk in chunks(changed_nodes):
+            existing_nodes.update(GraphNode.objects.filter(id__in=chunk).values_list('id', flat=True))
+        edge_rows = []
+        for chunk in chunks(changed_edges):
+            edge_rows.extend(GraphRelationship.objects.filter(id__in=chunk).values_list(
+                'id', 'source_id', 'target_id', 'type'))
+
+    # Current state wins: drop everything that changed, then add back what still exists
+    node_ids = index.node_ids
+    if changed_nodes:
+        node_ids = node_ids[~np.isin(node_ids, np.fromiter(changed_nodes, dtype=np.int64))]
+        node_ids = np.union1d(node_ids, np.fromiter(existing_nodes, dtype=np.int64))
+
+    edge_ids, sources, targets, codes = reversed_edges(index)
+    if changed_edges:
+        keep = ~np.isin(edge_ids, np.fromiter(changed_edges, dtype=np.int64))
+        types = dict(index.type_codes)
+        new_ids, new_sources, new_targets, new_codes = relationship_arrays(edge_rows, types)
+        edge_ids = np.concatenate([edge_ids[keep], new_ids])
+        sources = np.concatenate([sources[keep], new_sources])
+        targets = np.concatenate([targets[keep], new_targets])
+        codes = np.concatenate([codes[keep].astype(np.int64), new_codes])
+        order = np.argsort(edge_ids, kind='stable')
+        edge_ids, sources, targets, codes = edge_ids[order], sources[order], targets[order], codes[order]
+    else:
+        types = index.type_codes
+    return GraphIndex(version, changes[-1][0], node_ids, edge_ids, sources, targets, codes, types)
+
+# The index's edges as (id, source pk, target pk, type code) arrays
+def reversed_edges(index):
+    sources, targets, codes, edge_ids = index.edges()
+    return edge_ids, index.node_ids[sources], index.node_ids[targets], codes
+
+class GraphIndexCache:
+    """
+    Per-process holder of the current GraphIndex. The first caller builds
+    it; later callers get it back after a single version check, refreshing
+    it from the change log when the graph has moved on.
+    """
+    def __init__(self):
+        self.index = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        index = self.index
+        if index is not None and GraphVersion.current() == index.version:
+            return index
+
+        # One thread refreshes while the others wait for its result
+        with self.lock:
+            index = self.index
+            if index is not None and GraphVersion.current() == index.version:
+                return index
+            refreshed = refresh_index(index) if index is not None else None
+            self.index = refreshed if refreshed is not None else build_index()
+            return self.index
+
+    def clear(self):
+        with self.lock:
+            self.index = None
+
+graph_index_cache = GraphIndexCache()
+
+def get_graph_index():
+    return graph_index_cache.get()
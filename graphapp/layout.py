@@ -0,0 +1,121 @@
+import networkx as nx
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from .models import GraphLayout
+
+def compute_layout(G, layout_type):
+    # Choose layout based on parameter
+    if layout_type == 'spring':
+        return nx.spring_layout(G, k=0.5, iterations=50)
+    if layout_type == 'circular':
+        return nx.circular_layout(G)
+    # Default to kamada_kawai
+    try:
+        return nx.kamada_kawai_layout(G)
+    except:
+        # Fallback to spring layout if kamada_kawai fails
+        return nx.spring_layout(G, k=0.5, iterations=50)
+
+def get_cached_layout(G, version, node_type, relationship, layout_type, filter_key=''):
+    entry = GraphLayout.objects.filter(
+        graph_version=version, node_type=node_type, relationship=relationship,
+        filter_key=filter_key, layout=layout_type
+    ).first()
+    if entry is None:
+        return None
+    
+    # JSON object keys are strings, node ids are ints
+    pos = {int(node_id): tuple(xy) for node_id, xy in entry.positions.items()}
+    if set(pos) != set(G.nodes()):
+        return None
+    
+    GraphLayout.objects.filter(pk=entry.pk).update(last_used=timezone.now())
+    return pos
+
+def store_layout(pos, version, node_type, relationship, layout_type, filter_key=''):
+    GraphLayout.objects.update_or_create(
+        graph_version=version, node_type=node_type, relationship=relationship,
+        filter_key=filter_key, layout=layout_type,
+        defaults={
+            'positions': {str(node_id): [float(x), float(y)] for node_id, (x, y) in pos.items()},
+            'last_used': timezone.now(),
+        }
+    )
+    
+    # Evict the least recently used entries beyond the configured size
+    max_entries = getattr(settings, 'GRAPH_LAYOUT_CACHE_SIZE', 50)
+    stale = GraphLayout.objects.order_by('-last_used').values_list('pk', flat=True)[max_entries:]
+    stale = list(stale)
+    if stale:
+        GraphLayout.objects.filter(pk__in=stale).delete()
+
+# Most recent stored layout for the same filters, from any graph version
+def get_previous_layout(node_type, relationship, layout_type, filter_key=''):
+    entry = GraphLayout.objects.filter(
+        node_type=node_type, relationship=relationship, filter_key=filter_key, layout=layout_type
+    ).order_by('-graph_version').first()
+    if entry is None:
+        return None
+    return {int(node_id): tuple(xy) for node_id, xy in entry.positions.items()}
+
+# Warm-start from a previous layout: existing nodes keep their positions, new
+# nodes start next to their neighbours and only the neighbourhood of the new
+# nodes is refined. Returns None when too much changed for this to look right.
+def incremental_layout(G, previous):
+    pos = {node: np.asarray(previous[node]) for node in G.nodes() if node in previous}
+    new_nodes = [node for node in G.nodes() if node not in pos]
+    if not new_nodes:
+        return pos
+    max_change = getattr(settings, 'GRAPH_LAYOUT_INCREMENTAL_MAX_CHANGE', 0.2)
+    if not pos or len(new_nodes) > max_change * len(G):
+        return None
+    
+    # Seed new nodes at the centre of their placed neighbours; a few passes
+    # let chains of new nodes pick up positions from each other
+    rng = np.random.default_rng()
+    pending = new_nodes
+    for _ in range(3):
+        remaining = []
+        for node in pending:
+            placed = [pos[other] for other in nx.all_neighbors(G, node) if other in pos]
+            if placed:
+                pos[node] = np.mean(placed, axis=0) + rng.normal(scale=0.05, size=2)
+            else:
+                remaining.append(node)
+        pending = remaining
+    for node in pending:
+        pos[node] = rng.uniform(-1, 1, size=2)
+    
+    # Refine new nodes against their neighbours, which stay fixed
+    region = set(new_nodes)
+    for node in new_nodes:
+        region.update(nx.all_neighbors(G, node))
+    fixed = [node for node in region if node in previous]
+    if fixed:
+        refined = nx.spring_layout(
+            G.subgraph(region),
+            pos={node: pos[node] for node in region},
+            fixed=fixed,
+            k=1 / np.sqrt(len(G)),
+            iterations=getattr(settings, 'GRAPH_LAYOUT_INCREMENTAL_ITERATIONS', 15)
+        )
+        pos.update(refined)
+    return pos
+
+# Return positions for G, reusing a stored layout when the graph hasn't changed
+# and warm-starting from the last one when it has. refresh forces a full layout.
+def get_layout(G, version, node_type, relationship, layout_type, refresh=False, filter_key=''):
+    pos = None if refresh else get_cached_layout(G, version, node_type, relationship, layout_type, filter_key)
+    if pos is not None:
+        return pos
+    
+    # Circular layout is cheap and has no state worth keeping between versions
+    if not refresh and layout_type != 'circular' and getattr(settings, 'GRAPH_LAYOUT_INCREMENTAL', True):
+        previous = get_previous_layout(node_type, relationship, layout_type, filter_key)
+        if previous:
+            pos = incremental_layout(G, previous)
+    if pos is None:
+        pos = compute_layout(G, layout_type)
+    store_layout(pos, version, node_type, relationship, layout_type, filter_key)
+    return pos
@@ -0,0 +1,49 @@
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from graphapp.models import GraphNode, GraphRelationship, KEY_PROPERTY, NODE_KEY_LABEL
+from graphapp.views import get_db_connection
+
+class Command(BaseCommand):
+    help = "Create the Neo4j constraints and indexes behind the stable node/relationship keys"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help="Copy the keys onto entities mirrored before they existed (matched by Neo4j id)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        conn = get_db_connection()
+        try:
+            if not conn.connected:
+                raise CommandError("Neo4j is not connected")
+
+            rel_types = list(GraphRelationship.objects.order_by().values_list('type', flat=True).distinct())
+            conn.ensure_schema(rel_types)
+            self.stdout.write(f"Key constraint and {len(rel_types)} relationship key indexes in place")
+
+            if options['backfill']:
+                nodes = GraphNode.objects.filter(node_id__isnull=False).values_list('node_id', 'uuid')
+                count = self.backfill(conn, nodes.iterator(chunk_size=options['batch_size']), options['batch_size'], (
+                    f"UNWIND $rows AS row MATCH (n) WHERE id(n) = row.id "
+                    f"SET n:{NODE_KEY_LABEL}, n.{KEY_PROPERTY} = row.key"
+                ))
+                self.stdout.write(f"Backfilled {count} node keys")
+
+                rels = GraphRelationship.objects.filter(relationship_id__isnull=False).values_list('relationship_id', 'uuid')
+                count = self.backfill(conn, rels.iterator(chunk_size=options['batch_size']), options['batch_size'], (
+                    f"UNWIND $rows AS row MATCH ()-[r]->() WHERE id(r) = row.id "
+                    f"SET r.{KEY_PROPERTY} = row.key"
+                ))
+                self.stdout.write(f"Backfilled {count} relationship keys")
+        finally:
+            conn.close()
+
+    # One-off id()-based pass; everything after it matches on the key
+    def backfill(self, conn, pairs, batch_size, query):
+        count = 0
+        while True:
+            rows = [{'id': int(neo4j_id), 'key': str(key)} for neo4j_id, key in islice(pairs, batch_size)]
+            if not rows:
+                return count
+            conn.run_transaction([(query, {'rows': rows})])
+            count += len(rows)
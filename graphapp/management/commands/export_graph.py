@@ -0,0 +1,27 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from graphapp.export import EXPORT_FORMATS, EXPORT_KINDS, export_graph
+
+class Command(BaseCommand):
+    help = "Stream the stored graph to JSONL, CSV or GraphML"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='file_format', choices=EXPORT_FORMATS, default='jsonl')
+        parser.add_argument('--kind', choices=EXPORT_KINDS, default='all',
+                            help="What to export (CSV needs 'nodes' or 'relationships')")
+        parser.add_argument('--output', '-o', help="File to write (default: standard output)")
+        parser.add_argument('--gzip', action='store_true', help="Gzip the output while writing it")
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export_graph(options['file_format'], options['kind'], options['gzip'])
+            if options['output']:
+                with open(options['output'], 'wb') as output:
+                    for chunk in chunks:
+                        output.write(chunk)
+            else:
+                for chunk in chunks:
+                    sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Export failed: {e}")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from graphapp.models import GraphSnapshot
+from graphapp.snapshots import restore_snapshot, save_snapshot
+from graphapp.views import get_db_connection
+
+class Command(BaseCommand):
+    help = "Save, restore, list or delete named snapshots of the whole graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['save', 'restore', 'list', 'delete'])
+        parser.add_argument('name', nargs='?')
+        parser.add_argument('--batch-size', type=int,
+                            help="Rows per insert and per Neo4j statement (default: GRAPH_IMPORT_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        action, name = options['action'], options['name']
+        if action == 'list':
+            for snapshot in GraphSnapshot.objects.order_by('created_at'):
+                self.stdout.write(f"{snapshot} saved {snapshot.created_at:%Y-%m-%d %H:%M}")
+            return
+        if not name:
+            raise CommandError(f"'{action}' needs a snapshot name")
+
+        if action == 'save':
+            self.stdout.write(f"Saved {save_snapshot(name)}")
+            return
+
+        snapshot = GraphSnapshot.objects.filter(name=name).first()
+        if snapshot is None:
+            raise CommandError(f"No snapshot named '{name}'")
+        if action == 'delete':
+            snapshot.delete()
+            self.stdout.write(f"Deleted {snapshot}")
+            return
+
+        conn = get_db_connection()
+        try:
+            mirrored = restore_snapshot(snapshot, conn, options['batch_size'])
+        finally:
+            conn.close()
+        self.stdout.write(f"Restored {snapshot}" + ("" if mirrored else " (Neo4j changes queued on the outbox)"))
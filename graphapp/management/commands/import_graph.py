@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from graphapp.bulk_import import detect_format, import_nodes, import_relationships
+from graphapp.views import get_db_connection
+
+class Command(BaseCommand):
+    help = "Stream nodes or relationships from a CSV/JSONL file into SQLite and Neo4j"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file to import")
+        parser.add_argument('--kind', choices=['nodes', 'relationships'], required=True,
+                            help="Whether the file holds nodes (label, name) or relationships (source, target, type)")
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'jsonl'],
+                            help="File format (default: guessed from the file extension)")
+        parser.add_argument('--batch-size', type=int,
+                            help="Rows per SQLite bulk insert and Neo4j UNWIND batch (default: GRAPH_IMPORT_BATCH_SIZE)")
+        parser.add_argument('--match-on', choices=['id', 'name'], default='id',
+                            help="Resolve relationship source/target by node primary key or by node name")
+        parser.add_argument('--skip-neo4j', action='store_true', help="Only write to SQLite now; the rows are still queued for `process_outbox`")
+
+    def handle(self, *args, **options):
+        file_format = detect_format(options['path'], options['file_format'])
+        conn = None if options['skip_neo4j'] else get_db_connection()
+        if conn is not None and not conn.connected:
+            self.stderr.write(self.style.WARNING("Neo4j is not available, importing into SQLite only"))
+
+        verbosity = options['verbosity']
+
+        def progress(stats):
+            if verbosity > 1:
+                self.stdout.write(str(stats))
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                if options['kind'] == 'nodes':
+                    stats = import_nodes(stream, file_format, conn, options['batch_size'], progress)
+                else:
+                    stats = import_relationships(stream, file_format, conn, options['batch_size'],
+                                                 options['match_on'], progress)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Import failed: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+        self.stdout.write(self.style.SUCCESS(str(stats)))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from graphapp.filters import (COLUMN_PREFIX, FilterError, add_property_index, drop_property_index,
+                              generated_columns, parse_path)
+from graphapp.models import GraphNode, GraphRelationship
+
+class Command(BaseCommand):
+    help = ("Add (or drop) indexed generated columns for properties that are filtered on often, "
+            "e.g. `index_properties --nodes age occupation`")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="Property paths, nested keys written a.b")
+        parser.add_argument('--nodes', action='store_true', help="Index node properties")
+        parser.add_argument('--relationships', action='store_true', help="Index relationship properties")
+        parser.add_argument('--drop', action='store_true', help="Drop the columns instead of adding them")
+        parser.add_argument('--list', action='store_true', help="List the indexed properties")
+
+    def handle(self, *args, **options):
+        models = [model for model, wanted in ((GraphNode, options['nodes']),
+                                              (GraphRelationship, options['relationships'])) if wanted]
+        if not models:
+            models = [GraphNode, GraphRelationship]
+
+        if options['list'] or not options['paths']:
+            for model in models:
+                columns = sorted(generated_columns(model._meta.db_table))
+                paths = [column[len(COLUMN_PREFIX):] for column in columns]
+                self.stdout.write(f"{model.__name__}: {', '.join(paths) or '(none)'}")
+            return
+
+        try:
+            paths = [parse_path(path) for path in options['paths']]
+        except FilterError as e:
+            raise CommandError(str(e))
+        for model in models:
+            for path in paths:
+                if options['drop']:
+                    done = drop_property_index(model, path)
+                    action = "Dropped" if done else "No index on"
+                else:
+                    done = add_property_index(model, path)
+                    action = "Indexed" if done else "Already indexed:"
+                self.stdout.write(f"{action} {model.__name__} {'.'.join(path)}")
@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from graphapp.outbox import backlog_stats, process_batch
+from graphapp.views import get_db_connection
+
+class Command(BaseCommand):
+    help = "Mirror queued node/relationship changes from the outbox to Neo4j"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the current backlog and exit")
+        parser.add_argument('--batch-size', type=int,
+                            help="Entries per Neo4j transaction (default: NEO4J_OUTBOX_BATCH_SIZE)")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when the outbox is empty or Neo4j is down")
+        parser.add_argument('--stats', action='store_true', help="Print the backlog size and exit")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = backlog_stats()
+            self.stdout.write(f"{stats['pending']} pending, {stats['failed']} failed")
+            return
+
+        schema_ready = False
+        while True:
+            applied = 0
+            conn = get_db_connection()
+            try:
+                if conn.connected:
+                    # Without the key constraint every MERGE below would be a label scan
+                    if not schema_ready:
+                        schema_ready = conn.ensure_schema()
+                    applied = process_batch(conn, options['batch_size'])
+                    if applied and options['verbosity'] > 1:
+                        self.stdout.write(f"Mirrored {applied} changes to Neo4j")
+            except Exception as e:
+                # Neo4j went away mid-batch; leave the backlog for the next round
+                self.stderr.write(self.style.WARNING(f"Neo4j unavailable, backlog kept: {e}"))
+            finally:
+                conn.close()
+
+            if options['once'] and (not applied or not conn.connected):
+                stats = backlog_stats()
+                self.stdout.write(f"{stats['pending']} pending, {stats['failed']} failed")
+                return
+            if not applied:
+                time.sleep(options['interval'])
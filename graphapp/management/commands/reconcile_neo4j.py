@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from graphapp.reconcile import full_diff, prune_changes, replay_changes, unkeyed_counts
+from graphapp.views import get_db_connection
+
+class Command(BaseCommand):
+    help = "Bring Neo4j in line with SQLite by replaying the change log, or with a full diff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Diff every node and relationship instead of replaying the change log")
+        parser.add_argument('--batch-size', type=int,
+                            help="Changes per Neo4j transaction (default: NEO4J_RECONCILE_BATCH_SIZE)")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be repaired without writing")
+        parser.add_argument('--from-start', action='store_true', help="Reset the checkpoint and replay the whole log")
+        parser.add_argument('--prune', action='store_true',
+                            help="Delete change log rows the checkpoint has already passed")
+
+    def handle(self, *args, **options):
+        conn = get_db_connection()
+        try:
+            if not conn.connected:
+                raise CommandError("Neo4j is not reachable; nothing was reconciled")
+
+            if options['full']:
+                stats = full_diff(conn, options['batch_size'], options['dry_run'])
+                nodes, rels = unkeyed_counts(conn)
+                if nodes or rels:
+                    self.stdout.write(self.style.WARNING(
+                        f"{nodes} nodes and {rels} relationships in Neo4j have no key and were not compared "
+                        f"(see `manage.py bootstrap_neo4j --backfill`)"))
+            else:
+                progress = (lambda s: self.stdout.write(str(s))) if options['verbosity'] > 1 else None
+                stats = replay_changes(conn, options['batch_size'], options['dry_run'], progress,
+                                       options['from_start'])
+        finally:
+            conn.close()
+
+        prefix = "Would repair: " if options['dry_run'] else ""
+        self.stdout.write(prefix + str(stats))
+        if options['prune'] and not options['dry_run']:
+            self.stdout.write(f"Pruned {prune_changes()} change log rows")
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from graphapp.analytics import run_pending_jobs
+from graphapp.models import AnalyticsResult
+
+class Command(BaseCommand):
+    help = "Run queued analytics jobs (PageRank, components, ...) against the in-memory graph index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the jobs queued now and exit")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when no job is waiting")
+
+    def handle(self, *args, **options):
+        # The graph index stays warm in this process between jobs
+        while True:
+            ran = run_pending_jobs()
+            if ran and options['verbosity'] > 1:
+                self.stdout.write(f"Ran {ran} analytics jobs")
+            if options['once']:
+                pending = AnalyticsResult.objects.filter(status=AnalyticsResult.PENDING).count()
+                self.stdout.write(f"Ran {ran} jobs, {pending} pending")
+                return
+            if not ran:
+                time.sleep(options['interval'])
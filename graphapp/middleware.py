@@ -1,60 +1,35 @@
-import json
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# Cookie telling neo4j-logger.js that operations are waiting at the poll endpoint
+NEO4J_LOG_COOKIE = 'neo4j_log_pending'
 
 class Neo4jLoggerMiddleware:
+    """
+    Flags responses when a Neo4j operation was logged during the request.
+
+    The log itself stays in the session and is fetched by neo4j-logger.js from
+    the neo4j_log endpoint, so response bodies are never rewritten (streamed
+    ones included) and requests that logged nothing never load the session.
+    Works in both sync and async chains, so async views aren't adapted.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # Process the request
-        response = self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.flag_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.flag_response(request, await self.get_response(request))
 
-        # Check if there are any Neo4j logs in the session
-        if 'neo4j_log' in request.session:
-            try:
-                log_data = json.loads(request.session['neo4j_log'])
-                
-                # Add the script to the response
-                if 'text/html' in response.get('Content-Type', ''):
-                    script = f"""
-                    <script>
-                    (function() {{
-                        console.log("Neo4j Operation: {log_data['operation']} completed [{log_data['timestamp']}]");
-                        
-                        // Dispatch event for the logger
-                        if (document.readyState === 'complete' || document.readyState === 'interactive') {{
-                            const neo4jEvent = new CustomEvent('neo4j-operation', {{
-                                detail: {{
-                                    operation: "{log_data['operation']}",
-                                    timestamp: "{log_data['timestamp']}"
-                                }}
-                            }});
-                            document.dispatchEvent(neo4jEvent);
-                        }} else {{
-                            document.addEventListener('DOMContentLoaded', function() {{
-                                const neo4jEvent = new CustomEvent('neo4j-operation', {{
-                                    detail: {{
-                                        operation: "{log_data['operation']}",
-                                        timestamp: "{log_data['timestamp']}"
-                                    }}
-                                }});
-                                document.dispatchEvent(neo4jEvent);
-                            }});
-                        }}
-                    }})();
-                    </script>
-                    """
-                    
-                    response_content = response.content.decode('utf-8')
-                    body_pos = response_content.find('</body>')
-                    
-                    if body_pos > 0:
-                        new_content = response_content[:body_pos] + script + response_content[body_pos:]
-                        response.content = new_content.encode('utf-8')
-                
-                # Remove the log from the session so it's only logged once
-                del request.session['neo4j_log']
-                request.session.modified = True
-            except Exception as e:
-                print(f"Error in Neo4jLoggerMiddleware: {e}")
-            
-        return response 
\ No newline at end of file
+    # Set by Neo4jConnection.log_operation, which has already loaded the session
+    def flag_response(self, request, response):
+        if getattr(request, 'neo4j_log_pending', False):
+            response.set_cookie(NEO4J_LOG_COOKIE, '1', samesite='Lax')
+        return response
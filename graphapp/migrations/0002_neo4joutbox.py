@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Neo4jOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('create_node', 'Create node'), ('delete_node', 'Delete node'), ('create_relationship', 'Create relationship'), ('delete_relationship', 'Delete relationship')], max_length=32)),
+                ('object_id', models.BigIntegerField()),
+                ('payload', models.JSONField(default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('failed', models.BooleanField(default=False)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['failed', 'next_attempt_at'], name='graphapp_ne_failed_f4de08_idx')],
+            },
+        ),
+    ]
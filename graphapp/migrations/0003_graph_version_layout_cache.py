@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0002_neo4joutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GraphLayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('graph_version', models.BigIntegerField()),
+                ('node_type', models.CharField(max_length=100)),
+                ('relationship', models.CharField(max_length=100)),
+                ('layout', models.CharField(max_length=32)),
+                ('positions', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used'], name='graphapp_gr_last_us_ad88ff_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='graphlayout',
+            constraint=models.UniqueConstraint(fields=('graph_version', 'node_type', 'relationship', 'layout'), name='unique_graph_layout'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0003_graph_version_layout_cache'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='graphlayout',
+            name='unique_graph_layout',
+        ),
+        migrations.AddField(
+            model_name='graphlayout',
+            name='filter_key',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='graphlayout',
+            constraint=models.UniqueConstraint(fields=('graph_version', 'node_type', 'relationship', 'filter_key', 'layout'), name='unique_graph_layout_filters'),
+        ),
+    ]
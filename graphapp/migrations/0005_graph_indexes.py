@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0004_graphlayout_filter_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='graphrelationship',
+            name='source',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_relationships', to='graphapp.graphnode'),
+        ),
+        migrations.AlterField(
+            model_name='graphrelationship',
+            name='target',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='incoming_relationships', to='graphapp.graphnode'),
+        ),
+        migrations.AddIndex(
+            model_name='graphnode',
+            index=models.Index(fields=['label'], name='graphnode_label_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graphnode',
+            index=models.Index(fields=['name'], name='graphnode_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graphnode',
+            index=models.Index(fields=['node_id'], name='graphnode_node_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graphrelationship',
+            index=models.Index(fields=['type'], name='graphrel_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graphrelationship',
+            index=models.Index(fields=['relationship_id'], name='graphrel_relationship_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graphrelationship',
+            index=models.Index(fields=['source', 'type'], name='graphrel_source_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graphrelationship',
+            index=models.Index(fields=['target', 'type'], name='graphrel_target_type_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+import uuid
+
+
+# Existing rows need distinct keys before the unique constraint can be added
+def populate_keys(apps, schema_editor):
+    for model_name in ('GraphNode', 'GraphRelationship'):
+        model = apps.get_model('graphapp', model_name)
+        rows = list(model.objects.only('id'))
+        for row in rows:
+            row.uuid = uuid.uuid4()
+        model.objects.bulk_update(rows, ['uuid'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0005_graph_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='graphnode',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='graphrelationship',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='graphnode',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='graphrelationship',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:22
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Log every row change into graphapp_graphchange. Updates that only touch the
+# Neo4j id columns are skipped: they record mirroring, not graph changes.
+NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+LOG = "INSERT INTO graphapp_graphchange (kind, operation, key, source_key, created_at)"
+TRIGGERS = {
+    'graphchange_node_insert': f"""
+        AFTER INSERT ON graphapp_graphnode BEGIN
+            {LOG} VALUES ('node', 'upsert', NEW.uuid, NULL, {NOW});
+        END""",
+    'graphchange_node_update': f"""
+        AFTER UPDATE OF uuid, label, name, properties ON graphapp_graphnode BEGIN
+            {LOG} SELECT 'node', 'delete', OLD.uuid, NULL, {NOW} WHERE OLD.uuid <> NEW.uuid;
+            {LOG} VALUES ('node', 'upsert', NEW.uuid, NULL, {NOW});
+        END""",
+    'graphchange_node_delete': f"""
+        AFTER DELETE ON graphapp_graphnode BEGIN
+            {LOG} VALUES ('node', 'delete', OLD.uuid, NULL, {NOW});
+        END""",
+    'graphchange_relationship_insert': f"""
+        AFTER INSERT ON graphapp_graphrelationship BEGIN
+            {LOG} VALUES ('relationship', 'upsert', NEW.uuid, NULL, {NOW});
+        END""",
+    'graphchange_relationship_update': f"""
+        AFTER UPDATE OF uuid, source_id, target_id, type, properties ON graphapp_graphrelationship BEGIN
+            {LOG} SELECT 'relationship', 'delete', OLD.uuid,
+                   (SELECT uuid FROM graphapp_graphnode WHERE id = OLD.source_id), {NOW}
+                WHERE OLD.uuid <> NEW.uuid;
+            {LOG} VALUES ('relationship', 'upsert', NEW.uuid, NULL, {NOW});
+        END""",
+    'graphchange_relationship_delete': f"""
+        AFTER DELETE ON graphapp_graphrelationship BEGIN
+            {LOG} VALUES ('relationship', 'delete', OLD.uuid,
+                   (SELECT uuid FROM graphapp_graphnode WHERE id = OLD.source_id), {NOW});
+        END""",
+}
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0007_graph_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('node', 'Node'), ('relationship', 'Relationship')], max_length=16)),
+                ('operation', models.CharField(choices=[('upsert', 'Insert or update'), ('delete', 'Delete')], max_length=16)),
+                ('key', models.UUIDField()),
+                ('source_key', models.UUIDField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ] + [
+        migrations.RunSQL(f"CREATE TRIGGER {name} {body};", f"DROP TRIGGER IF EXISTS {name};")
+        for name, body in TRIGGERS.items()
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations, models
+
+
+# Same triggers as 0008, now also recording the row's primary key so
+# in-process indexes keyed by id can follow the log without a key lookup
+NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+OLD_LOG = "INSERT INTO graphapp_graphchange (kind, operation, key, source_key, created_at)"
+LOG = "INSERT INTO graphapp_graphchange (kind, operation, key, source_key, object_id, created_at)"
+SOURCE_KEY = "(SELECT uuid FROM graphapp_graphnode WHERE id = OLD.source_id)"
+
+def triggers(log, with_id):
+    new_id, old_id = ("NEW.id, ", "OLD.id, ") if with_id else ("", "")
+    return {
+        'graphchange_node_insert': f"""
+            AFTER INSERT ON graphapp_graphnode BEGIN
+                {log} VALUES ('node', 'upsert', NEW.uuid, NULL, {new_id}{NOW});
+            END""",
+        'graphchange_node_update': f"""
+            AFTER UPDATE OF uuid, label, name, properties ON graphapp_graphnode BEGIN
+                {log} SELECT 'node', 'delete', OLD.uuid, NULL, {old_id}{NOW} WHERE OLD.uuid <> NEW.uuid;
+                {log} VALUES ('node', 'upsert', NEW.uuid, NULL, {new_id}{NOW});
+            END""",
+        'graphchange_node_delete': f"""
+            AFTER DELETE ON graphapp_graphnode BEGIN
+                {log} VALUES ('node', 'delete', OLD.uuid, NULL, {old_id}{NOW});
+            END""",
+        'graphchange_relationship_insert': f"""
+            AFTER INSERT ON graphapp_graphrelationship BEGIN
+                {log} VALUES ('relationship', 'upsert', NEW.uuid, NULL, {new_id}{NOW});
+            END""",
+        'graphchange_relationship_update': f"""
+            AFTER UPDATE OF uuid, source_id, target_id, type, properties ON graphapp_graphrelationship BEGIN
+                {log} SELECT 'relationship', 'delete', OLD.uuid, {SOURCE_KEY}, {old_id}{NOW}
+                    WHERE OLD.uuid <> NEW.uuid;
+                {log} VALUES ('relationship', 'upsert', NEW.uuid, NULL, {new_id}{NOW});
+            END""",
+        'graphchange_relationship_delete': f"""
+            AFTER DELETE ON graphapp_graphrelationship BEGIN
+                {log} VALUES ('relationship', 'delete', OLD.uuid, {SOURCE_KEY}, {old_id}{NOW});
+            END""",
+    }
+
+OLD_TRIGGERS = triggers(OLD_LOG, with_id=False)
+TRIGGERS = triggers(LOG, with_id=True)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0008_graph_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='graphchange',
+            name='object_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ] + [
+        migrations.RunSQL(
+            [f"DROP TRIGGER IF EXISTS {name};", f"CREATE TRIGGER {name} {TRIGGERS[name]};"],
+            [f"DROP TRIGGER IF EXISTS {name};", f"CREATE TRIGGER {name} {OLD_TRIGGERS[name]};"],
+        )
+        for name in TRIGGERS
+    ]
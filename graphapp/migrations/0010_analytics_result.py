@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:27
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0009_graphchange_object_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('graph_version', models.BigIntegerField()),
+                ('algorithm', models.CharField(max_length=32)),
+                ('params_key', models.CharField(max_length=40)),
+                ('params', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_used', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='graphapp_an_status_41f461_idx'), models.Index(fields=['last_used'], name='graphapp_an_last_us_5f98ca_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='analyticsresult',
+            constraint=models.UniqueConstraint(fields=('graph_version', 'algorithm', 'params_key'), name='unique_analytics_result'),
+        ),
+    ]
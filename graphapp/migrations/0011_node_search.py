@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+# FTS5 index over node names, labels and flattened "key value" property
+# pairs, keyed by node id (rowid) and kept current by triggers. The prefix
+# option adds 2- and 3-character prefix indexes for autocomplete.
+TABLE = 'graphapp_nodesearch'
+FLATTEN = "(SELECT group_concat(key || ' ' || coalesce(value, ''), ' ') FROM json_each({row}.properties))"
+INDEX_ROW = f"INSERT INTO {TABLE} (rowid, name, label, properties) VALUES (NEW.id, NEW.name, NEW.label, {FLATTEN.format(row='NEW')})"
+
+CREATE = [
+    f"""CREATE VIRTUAL TABLE {TABLE} USING fts5(
+        name, label, properties, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    );""",
+    f"""INSERT INTO {TABLE} (rowid, name, label, properties)
+        SELECT n.id, n.name, n.label, {FLATTEN.format(row='n')} FROM graphapp_graphnode n;""",
+    f"""CREATE TRIGGER nodesearch_insert AFTER INSERT ON graphapp_graphnode BEGIN
+        {INDEX_ROW};
+    END;""",
+    f"""CREATE TRIGGER nodesearch_update AFTER UPDATE OF name, label, properties ON graphapp_graphnode BEGIN
+        DELETE FROM {TABLE} WHERE rowid = OLD.id;
+        {INDEX_ROW};
+    END;""",
+    f"""CREATE TRIGGER nodesearch_delete AFTER DELETE ON graphapp_graphnode BEGIN
+        DELETE FROM {TABLE} WHERE rowid = OLD.id;
+    END;""",
+]
+DROP = [
+    "DROP TRIGGER IF EXISTS nodesearch_insert;",
+    "DROP TRIGGER IF EXISTS nodesearch_update;",
+    "DROP TRIGGER IF EXISTS nodesearch_delete;",
+    f"DROP TABLE IF EXISTS {TABLE};",
+]
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0010_analytics_result'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, DROP),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0011_node_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='neo4joutbox',
+            name='operation',
+            field=models.CharField(choices=[('create_node', 'Create node'), ('delete_node', 'Delete node'), ('create_relationship', 'Create relationship'), ('delete_relationship', 'Delete relationship'), ('clear_graph', 'Clear graph')], max_length=32),
+        ),
+    ]
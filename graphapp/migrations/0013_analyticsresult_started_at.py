@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphapp', '0012_neo4joutbox_clear_graph'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsresult',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,24 +1,241 @@
 from django.db import models
-from neo4j import GraphDatabase
+from django.db.models import F
+from django.conf import settings
+from django.utils import timezone
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
+import asyncio
+import atexit
 import json
+import os
+import threading
+import time
+import uuid
 from django.http import JsonResponse
 from datetime import datetime
 
+# Pool options come from Django settings so they can be tuned per deployment
+def driver_options():
+    return {
+        'max_connection_pool_size': getattr(settings, 'NEO4J_MAX_CONNECTION_POOL_SIZE', 50),
+        'connection_acquisition_timeout': getattr(settings, 'NEO4J_CONNECTION_ACQUISITION_TIMEOUT', 60.0),
+        'max_connection_lifetime': getattr(settings, 'NEO4J_MAX_CONNECTION_LIFETIME', 3600),
+        'connection_timeout': getattr(settings, 'NEO4J_CONNECTION_TIMEOUT', 30.0),
+    }
+
+class Neo4jDriverRegistry:
+    """
+    Process-wide registry of pooled Neo4j drivers.
+
+    A driver owns a thread-safe Bolt connection pool, so one driver per set of
+    credentials is shared by every request handled in this worker process.
+    Sessions borrowed from it are cheap and are handed back on close().
+    Drivers are created without touching the network; Neo4jHealthMonitor is
+    the only place that verifies connectivity.
+    """
+    def __init__(self):
+        self._drivers = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _driver_options(self):
+        return driver_options()
+
+    def get_driver(self, uri, user, password):
+        # Drivers inherited from a parent process (e.g. a pre-forking server)
+        # share sockets with it, so start over with a fresh registry after fork
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._drivers = {}
+                    self._pid = os.getpid()
+
+        key = (uri, user, password)
+        driver = self._drivers.get(key)
+        if driver is not None:
+            return driver
+
+        # Creating a driver does no I/O, so holding the lock here never waits on
+        # the network. Connectivity is only checked by the health monitor thread.
+        with self._lock:
+            driver = self._drivers.get(key)
+            if driver is None:
+                driver = GraphDatabase.driver(uri, auth=(user, password), **self._driver_options())
+                self._drivers[key] = driver
+            return driver
+
+    def discard(self, uri, user, password):
+        with self._lock:
+            driver = self._drivers.pop((uri, user, password), None)
+        if driver is not None:
+            driver.close()
+
+    def close_all(self):
+        with self._lock:
+            drivers = list(self._drivers.values())
+            self._drivers = {}
+        for driver in drivers:
+            try:
+                driver.close()
+            except Exception as e:
+                print(f"Warning: Error closing Neo4j driver: {e}")
+
+# Escape a label or relationship type for use in a Cypher query
+def quote_identifier(name):
+    return "`" + str(name).replace("`", "``") + "`"
+
+# Every mirrored node also carries this label so a single uniqueness
+# constraint on its key property turns lookups into index seeks,
+# whatever the node's own label is
+NODE_KEY_LABEL = 'GraphNode'
+KEY_PROPERTY = 'uuid'
+
+# Add a fresh key to a property dict unless the caller already supplied one
+def with_key(properties):
+    properties = dict(properties or {})
+    properties.setdefault(KEY_PROPERTY, str(uuid.uuid4()))
+    return properties
+
+driver_registry = Neo4jDriverRegistry()
+atexit.register(driver_registry.close_all)
+
+class Neo4jHealthMonitor:
+    """
+    Process-wide Neo4j health state, refreshed by a background prober thread.
+
+    Requests only ever read the cached state. After a run of consecutive
+    failures the circuit opens and Neo4j work fails fast; once the reset
+    timeout has passed the prober moves the circuit to half-open and a single
+    successful probe closes it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._credentials = None
+        self.state = self.CLOSED
+        self.healthy = None
+        self.consecutive_failures = 0
+        self.last_checked = None
+        self.opened_at = None
+        self.last_error = None
+
+    def _interval(self):
+        return getattr(settings, 'NEO4J_HEALTH_CHECK_INTERVAL', 10.0)
+
+    def _failure_threshold(self):
+        return getattr(settings, 'NEO4J_CIRCUIT_FAILURE_THRESHOLD', 3)
+
+    def _reset_timeout(self):
+        return getattr(settings, 'NEO4J_CIRCUIT_RESET_TIMEOUT', 30.0)
+
+    # Start the prober once per process; safe to call on every request
+    def start(self, uri, user, password):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._credentials = (uri, user, password)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='neo4j-health-monitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            if self.state != self.OPEN or time.monotonic() - self.opened_at >= self._reset_timeout():
+                self.probe()
+            self._wakeup.wait(self._interval())
+            self._wakeup.clear()
+
+    def probe(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                self.state = self.HALF_OPEN
+        # Runs on the monitor thread without holding any lock across the round trip
+        try:
+            driver = driver_registry.get_driver(*self._credentials)
+            driver.verify_connectivity()
+        except Exception as e:
+            self.record_failure(e)
+            return False
+        self.record_success()
+        return True
+
+    # Ask the prober for an immediate check, skipping the open-circuit wait
+    def request_probe(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                self.opened_at = time.monotonic() - self._reset_timeout()
+        self._wakeup.set()
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.healthy = True
+            self.consecutive_failures = 0
+            self.last_checked = time.monotonic()
+            self.opened_at = None
+            self.last_error = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.healthy = False
+            self.consecutive_failures += 1
+            self.last_checked = time.monotonic()
+            self.last_error = str(error) if error else None
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self._failure_threshold():
+                if self.state != self.OPEN:
+                    print(f"Warning: Neo4j circuit opened after {self.consecutive_failures} failure(s): {self.last_error}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    # Cached status: True/False, or None until the first probe has finished
+    def status(self):
+        if self.last_checked is not None and time.monotonic() - self.last_checked > self._interval():
+            self._wakeup.set()
+        return self.healthy
+
+    # Whether Neo4j work should be attempted at all right now
+    def allow_request(self):
+        return self.state == self.CLOSED
+
+health_monitor = Neo4jHealthMonitor()
+
 class Neo4jConnection:
     def __init__(self, uri, user, password):
+        self._session = None
+        health_monitor.start(uri, user, password)
+        if not health_monitor.allow_request():
+            # Circuit is open: fail fast instead of waiting on the connect timeout
+            self.connected = False
+            return
         try:
-            self.driver = GraphDatabase.driver(uri, auth=(user, password))
-            # Test the connection - this will raise an exception if connection fails
-            with self.driver.session() as session:
-                session.run("RETURN 1")
+            self.driver = driver_registry.get_driver(uri, user, password)
             self.connected = True
         except Exception as e:
             print(f"Warning: Could not connect to Neo4j: {e}")
+            health_monitor.record_failure(e)
             self.connected = False
 
+    # Reuse one pooled session for all queries made through this connection
+    def session(self):
+        if self._session is None or self._session.closed():
+            self._session = self.driver.session()
+        return self._session
+
+    # Release the session back to the pool; the shared driver stays open
     def close(self):
-        if hasattr(self, 'driver') and self.connected:
-            self.driver.close()
+        if self._session is not None:
+            try:
+                self._session.close()
+            finally:
+                self._session = None
 
     # Helper method to log successful Neo4j operations
     def log_operation(self, request, operation):
@@ -28,12 +245,17 @@ class Neo4jConnection:
                 'operation': operation,
                 'timestamp': timestamp
             }
-            request.session['neo4j_log'] = json.dumps(log_data)
+            # Queued for the browser to fetch; Neo4jLoggerMiddleware flags it with a cookie
+            log = request.session.get('neo4j_log')
+            log = log if isinstance(log, list) else []
+            request.session['neo4j_log'] = (log + [log_data])[-50:]
+            request.neo4j_log_pending = True
             return True
         return False
         
     # Helper method to track Neo4j operation failures
-    def track_failure(self, request, operation, details=None):
+    @staticmethod
+    def track_failure(request, operation, details=None):
         if request:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             failure_data = {
@@ -53,16 +275,93 @@ class Neo4jConnection:
                 self.track_failure(request, "Query failed", "Neo4j database not connected")
             return []
         
-        with self.driver.session() as session:
-            result = session.run(query, parameters or {})
+        try:
+            result = self.session().run(query, parameters or {})
             data = [record for record in result]
+        except (ServiceUnavailable, SessionExpired) as e:
+            health_monitor.record_failure(e)
+            raise
+        
+        # Log successful operation if request is provided
+        if request and data:
+            self.log_operation(request, "Query executed")
+            request.session['neo4j_connected'] = True
             
-            # Log successful operation if request is provided
-            if request and data:
-                self.log_operation(request, "Query executed")
-                request.session['neo4j_connected'] = True
-                
-            return data
+        return data
+
+    # Lazily yield records using a dedicated session that is only open while the
+    # caller iterates. The driver pulls fetch_size records per round trip, so
+    # memory use depends on the batch size rather than on the result size.
+    def stream_query(self, query, parameters=None, fetch_size=None):
+        if not self.connected:
+            print(f"Warning: Neo4j not connected, ignoring query: {query}")
+            return
+        
+        fetch_size = fetch_size or getattr(settings, 'NEO4J_FETCH_SIZE', 1000)
+        session = self.driver.session(fetch_size=fetch_size)
+        try:
+            for record in session.run(query, parameters or {}):
+                yield record
+        except (ServiceUnavailable, SessionExpired) as e:
+            health_monitor.record_failure(e)
+            raise
+        finally:
+            session.close()
+
+    # Stream (id, label, *values) tuples for nodes, optionally of one label,
+    # returning only the requested properties instead of whole Node objects
+    def stream_node_properties(self, keys=('name',), label=None, fetch_size=None):
+        match = f"MATCH (n:{quote_identifier(label)})" if label else "MATCH (n)"
+        query = f"{match} RETURN id(n) AS id, head(labels(n)) AS label, [key IN $keys | n[key]] AS values"
+        for record in self.stream_query(query, {"keys": list(keys)}, fetch_size):
+            yield (record["id"], record["label"], *record["values"])
+
+    # Stream (id, start id, end id, type, *values) tuples for relationships,
+    # optionally of one type, with only the requested properties
+    def stream_relationship_properties(self, keys=(), rel_type=None, fetch_size=None):
+        pattern = f"[r:{quote_identifier(rel_type)}]" if rel_type else "[r]"
+        query = (
+            f"MATCH (a)-{pattern}->(b) "
+            f"RETURN id(r) AS id, id(a) AS start_id, id(b) AS end_id, type(r) AS type, "
+            f"[key IN $keys | r[key]] AS values"
+        )
+        for record in self.stream_query(query, {"keys": list(keys)}, fetch_size):
+            yield (record["id"], record["start_id"], record["end_id"], record["type"], *record["values"])
+
+    # Run several (query, parameters) statements in one managed write transaction.
+    # The driver retries transient failures; returns one record list per statement.
+    def run_transaction(self, statements):
+        if not self.connected:
+            print(f"Warning: Neo4j not connected, ignoring transaction of {len(statements)} statements")
+            return None
+        
+        def work(tx):
+            return [list(tx.run(query, parameters or {})) for query, parameters in statements]
+        
+        try:
+            return self.session().execute_write(work)
+        except (ServiceUnavailable, SessionExpired) as e:
+            health_monitor.record_failure(e)
+            raise
+
+    # Create the uniqueness constraint behind every node key lookup, plus a
+    # property index on the key for each given relationship type. Schema
+    # statements are idempotent and can't share a transaction with writes.
+    def ensure_schema(self, rel_types=()):
+        if not self.connected:
+            print("Warning: Neo4j not connected, skipping schema bootstrap")
+            return False
+            
+        self.run_query(
+            f"CREATE CONSTRAINT graphnode_key_unique IF NOT EXISTS "
+            f"FOR (n:{NODE_KEY_LABEL}) REQUIRE n.{KEY_PROPERTY} IS UNIQUE"
+        )
+        for rel_type in rel_types:
+            self.run_query(
+                f"CREATE INDEX IF NOT EXISTS "
+                f"FOR ()-[r:{quote_identifier(rel_type)}]-() ON (r.{KEY_PROPERTY})"
+            )
+        return True
 
     def create_node(self, label, properties, request=None):
         if not self.connected:
@@ -73,8 +372,8 @@ class Neo4jConnection:
                                   "Neo4j database not connected")
             return [{"n": None}]
             
-        query = f"CREATE (n:{label} $props) RETURN n"
-        result = self.run_query(query, {"props": properties})
+        query = f"CREATE (n:{quote_identifier(label)}:{NODE_KEY_LABEL} $props) RETURN n"
+        result = self.run_query(query, {"props": with_key(properties)})
         
         # Log successful operation if request is provided
         if request:
@@ -89,7 +388,8 @@ class Neo4jConnection:
             
         return result
 
-    def create_relationship(self, start_node_id, end_node_id, rel_type, properties=None, request=None):
+    # Endpoints are given by their stable keys, not by Neo4j's internal ids
+    def create_relationship(self, start_key, end_key, rel_type, properties=None, request=None):
         if not self.connected:
             print(f"Warning: Neo4j not connected, ignoring relationship creation")
             if request:
@@ -98,15 +398,14 @@ class Neo4jConnection:
             return [{"r": None}]
             
         query = (
-            f"MATCH (a), (b) "
-            f"WHERE id(a) = $start_id AND id(b) = $end_id "
-            f"CREATE (a)-[r:{rel_type} $props]->(b) "
+            f"MATCH (a:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $start_key}}), (b:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $end_key}}) "
+            f"CREATE (a)-[r:{quote_identifier(rel_type)} $props]->(b) "
             f"RETURN r"
         )
         params = {
-            "start_id": start_node_id,
-            "end_id": end_node_id,
-            "props": properties or {}
+            "start_key": str(start_key),
+            "end_key": str(end_key),
+            "props": with_key(properties)
         }
         result = self.run_query(query, params)
         
@@ -121,19 +420,74 @@ class Neo4jConnection:
             
         return result
 
-    def delete_node(self, node_id, request=None):
+    # (query, params) for the batch creates below, so callers can also run
+    # several batches inside one transaction with run_transaction. They MERGE
+    # on the key, like the outbox, so racing the outbox worker can't duplicate.
+    @staticmethod
+    def nodes_batch_statement(label, rows):
+        query = (
+            f"UNWIND range(0, size($rows) - 1) AS i "
+            f"WITH i, $rows[i] AS props "
+            f"MERGE (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: props.{KEY_PROPERTY}}}) "
+            f"ON CREATE SET n:{quote_identifier(label)}, n += props "
+            f"RETURN i, id(n) AS id"
+        )
+        return query, {"rows": rows}
+
+    @staticmethod
+    def relationships_batch_statement(rel_type, rows):
+        query = (
+            f"UNWIND range(0, size($rows) - 1) AS i "
+            f"WITH i, $rows[i] AS row "
+            f"MATCH (a:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: row.start_key}}), (b:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: row.end_key}}) "
+            f"MERGE (a)-[r:{quote_identifier(rel_type)} {{{KEY_PROPERTY}: row.props.{KEY_PROPERTY}}}]->(b) "
+            f"ON CREATE SET r += row.props "
+            f"RETURN i, id(r) AS id"
+        )
+        return query, {"rows": rows}
+
+    # Create many nodes with one label in a single UNWIND query. Each row is a
+    # property dict including its key; returns {row index: Neo4j id}.
+    def create_nodes_batch(self, label, rows, request=None):
         if not self.connected:
-            print(f"Warning: Neo4j not connected, ignoring node deletion: {node_id}")
+            print(f"Warning: Neo4j not connected, ignoring batch of {len(rows)} {label} nodes")
+            return {}
+            
+        result = self.run_query(*self.nodes_batch_statement(label, rows))
+        
+        if request and result:
+            self.log_operation(request, f"Created {len(result)} {label} nodes")
+            
+        return {record["i"]: record["id"] for record in result}
+
+    # Create many relationships of one type in a single UNWIND query. Each row
+    # carries start_key, end_key and props (including the relationship's own
+    # key); returns {row index: Neo4j id}.
+    def create_relationships_batch(self, rel_type, rows, request=None):
+        if not self.connected:
+            print(f"Warning: Neo4j not connected, ignoring batch of {len(rows)} {rel_type} relationships")
+            return {}
+            
+        result = self.run_query(*self.relationships_batch_statement(rel_type, rows))
+        
+        if request and result:
+            self.log_operation(request, f"Created {len(result)} {rel_type} relationships")
+            
+        return {record["i"]: record["id"] for record in result}
+
+    def delete_node(self, node_key, request=None):
+        if not self.connected:
+            print(f"Warning: Neo4j not connected, ignoring node deletion: {node_key}")
             if request:
-                self.track_failure(request, f"Node deletion failed: ID {node_id}", 
+                self.track_failure(request, f"Node deletion failed: key {node_key}", 
                                   "Neo4j database not connected")
             return []
             
         # Get node info before deletion
         node_info = "unknown"
         if self.connected:
-            query = "MATCH (n) WHERE id(n) = $node_id RETURN n.name, labels(n) as labels"
-            info_result = self.run_query(query, {"node_id": node_id})
+            query = f"MATCH (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $node_key}}) RETURN n.name, labels(n) as labels"
+            info_result = self.run_query(query, {"node_key": str(node_key)})
             if info_result and len(info_result) > 0:
                 node_name = info_result[0].get("n.name", "Unknown")
                 node_labels = info_result[0].get("labels", [])
@@ -144,11 +498,10 @@ class Neo4jConnection:
             
         # Delete the node and its relationships
         query = (
-            "MATCH (n) "
-            "WHERE id(n) = $node_id "
+            f"MATCH (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $node_key}}) "
             "DETACH DELETE n"
         )
-        result = self.run_query(query, {"node_id": node_id})
+        result = self.run_query(query, {"node_key": str(node_key)})
         
         # Log successful operation if request is provided
         if request:
@@ -161,29 +514,35 @@ class Neo4jConnection:
             
         return result
         
-    def delete_relationship(self, relationship_id, request=None):
+    # The relationship is reached from its (indexed) source node, so this is a
+    # seek plus one expansion rather than a scan over all relationships
+    def delete_relationship(self, relationship_key, source_key, request=None):
         if not self.connected:
-            print(f"Warning: Neo4j not connected, ignoring relationship deletion: {relationship_id}")
+            print(f"Warning: Neo4j not connected, ignoring relationship deletion: {relationship_key}")
             if request:
-                self.track_failure(request, f"Relationship deletion failed: ID {relationship_id}", 
+                self.track_failure(request, f"Relationship deletion failed: key {relationship_key}", 
                                   "Neo4j database not connected")
             return []
             
+        params = {"source_key": str(source_key), "rel_key": str(relationship_key)}
+        
         # Get relationship info before deletion
         rel_info = "unknown"
         if self.connected:
-            query = "MATCH ()-[r]->() WHERE id(r) = $rel_id RETURN type(r) as type"
-            info_result = self.run_query(query, {"rel_id": relationship_id})
+            query = (
+                f"MATCH (:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $source_key}})-[r {{{KEY_PROPERTY}: $rel_key}}]->() "
+                "RETURN type(r) as type"
+            )
+            info_result = self.run_query(query, params)
             if info_result and len(info_result) > 0:
                 rel_info = info_result[0].get("type", "unknown")
             
         # Delete just the relationship
         query = (
-            "MATCH ()-[r]->() "
-            "WHERE id(r) = $rel_id "
+            f"MATCH (:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $source_key}})-[r {{{KEY_PROPERTY}: $rel_key}}]->() "
             "DELETE r"
         )
-        result = self.run_query(query, {"rel_id": relationship_id})
+        result = self.run_query(query, params)
         
         # Log successful operation if request is provided
         if request:
@@ -261,67 +620,338 @@ class Neo4jConnection:
             return result
         else:
             return self.get_all_relationships(request)
-            
-    def get_demo_data(self, request=None):
+
+class AsyncNeo4jDriverRegistry:
+    """
+    Pooled asyncio Neo4j drivers for async views.
+
+    An async driver is bound to the event loop it was created on, and under
+    WSGI (runserver, setup.sh) every async view runs on a fresh loop. So the
+    drivers live on one long-lived loop in a daemon thread and callers on any
+    loop hand their Neo4j coroutines to it with run(): one pool per process,
+    whatever the server.
+    """
+    def __init__(self):
+        self._drivers = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = os.getpid()
+
+    def _get_loop(self):
+        with self._lock:
+            # The loop thread doesn't survive a fork; start over in the child
+            if self._loop is None or self._pid != os.getpid():
+                self._drivers = {}
+                self._pid = os.getpid()
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='neo4j-async', daemon=True).start()
+            return self._loop
+
+    def get_driver(self, uri, user, password):
+        loop = self._get_loop()
+        key = (uri, user, password)
+        with self._lock:
+            driver = self._drivers.get(key)
+            if driver is None:
+                # Creating the driver does no I/O; the health monitor covers connectivity.
+                # Requests give up quickly on retries since the outbox retries for them.
+                async def create():
+                    return AsyncGraphDatabase.driver(
+                        uri, auth=(user, password),
+                        max_transaction_retry_time=getattr(settings, 'NEO4J_ASYNC_TRANSACTION_RETRY_TIME', 1.0),
+                        **driver_options()
+                    )
+                driver = asyncio.run_coroutine_threadsafe(create(), loop).result()
+                self._drivers[key] = driver
+            return driver
+
+    # Await a coroutine using the drivers on their own loop
+    async def run(self, coroutine):
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()))
+
+    def close_all(self):
+        with self._lock:
+            drivers = list(self._drivers.values())
+            self._drivers = {}
+            loop = self._loop if self._pid == os.getpid() else None
+        for driver in drivers if loop is not None else ():
+            try:
+                asyncio.run_coroutine_threadsafe(driver.close(), loop).result(timeout=5)
+            except Exception as e:
+                print(f"Warning: Error closing async Neo4j driver: {e}")
+
+async_driver_registry = AsyncNeo4jDriverRegistry()
+atexit.register(async_driver_registry.close_all)
+
+class AsyncNeo4jConnection:
+    """
+    Asyncio counterpart of Neo4jConnection. It shares the circuit breaker with
+    the blocking driver, so an open circuit fails fast here as well.
+    """
+    def __init__(self, uri, user, password):
+        health_monitor.start(uri, user, password)
+        self.connected = health_monitor.allow_request()
+        if self.connected:
+            self.driver = async_driver_registry.get_driver(uri, user, password)
+
+    async def run_query(self, query, parameters=None):
         if not self.connected:
-            print("Warning: Neo4j not connected, skipping demo data creation")
-            return "Demo data could not be created in Neo4j, connection failed"
+            print(f"Warning: Neo4j not connected, ignoring query: {query}")
+            return []
         
-        # Clear existing data
-        self.run_query("MATCH (n) DETACH DELETE n")
+        async def work():
+            async with self.driver.session() as session:
+                result = await session.run(query, parameters or {})
+                return [record async for record in result]
         
-        # Create demo nodes
-        queries = [
-            "CREATE (p:Person {name: 'Alice', age: 32, occupation: 'Software Engineer'})",
-            "CREATE (p:Person {name: 'Bob', age: 28, occupation: 'Data Scientist'})",
-            "CREATE (p:Person {name: 'Charlie', age: 35, occupation: 'Project Manager'})",
-            "CREATE (c:Company {name: 'TechCorp', industry: 'Technology', founded: 2010})",
-            "CREATE (c:Company {name: 'DataInc', industry: 'Data Analytics', founded: 2015})",
-            "CREATE (s:Skill {name: 'Python', category: 'Programming Language', difficulty: 'Intermediate'})",
-            "CREATE (s:Skill {name: 'Machine Learning', category: 'AI', difficulty: 'Advanced'})",
-            "CREATE (s:Skill {name: 'Management', category: 'Soft Skill', difficulty: 'Advanced'})"
-        ]
+        try:
+            return await async_driver_registry.run(work())
+        except (ServiceUnavailable, SessionExpired) as e:
+            health_monitor.record_failure(e)
+            raise
+
+    # Run several (query, parameters) statements in one managed write transaction
+    async def run_transaction(self, statements):
+        if not self.connected:
+            print(f"Warning: Neo4j not connected, ignoring transaction of {len(statements)} statements")
+            return None
         
-        for query in queries:
-            self.run_query(query)
-            
-        # Create relationships
-        rel_queries = [
-            "MATCH (a:Person {name: 'Alice'}), (c:Company {name: 'TechCorp'}) CREATE (a)-[:WORKS_AT {position: 'Senior Developer', since: 2018}]->(c)",
-            "MATCH (b:Person {name: 'Bob'}), (c:Company {name: 'DataInc'}) CREATE (b)-[:WORKS_AT {position: 'Data Analyst', since: 2019}]->(c)",
-            "MATCH (c:Person {name: 'Charlie'}), (co:Company {name: 'TechCorp'}) CREATE (c)-[:WORKS_AT {position: 'Team Lead', since: 2015}]->(co)",
-            "MATCH (a:Person {name: 'Alice'}), (s:Skill {name: 'Python'}) CREATE (a)-[:HAS_SKILL {level: 'Expert', years: 5}]->(s)",
-            "MATCH (b:Person {name: 'Bob'}), (s:Skill {name: 'Python'}) CREATE (b)-[:HAS_SKILL {level: 'Proficient', years: 3}]->(s)",
-            "MATCH (b:Person {name: 'Bob'}), (s:Skill {name: 'Machine Learning'}) CREATE (b)-[:HAS_SKILL {level: 'Advanced', years: 2}]->(s)",
-            "MATCH (c:Person {name: 'Charlie'}), (s:Skill {name: 'Management'}) CREATE (c)-[:HAS_SKILL {level: 'Expert', years: 8}]->(s)",
-            "MATCH (a:Person {name: 'Alice'}), (b:Person {name: 'Bob'}) CREATE (a)-[:KNOWS {since: 2017, relationship: 'Colleague'}]->(b)",
-            "MATCH (b:Person {name: 'Bob'}), (c:Person {name: 'Charlie'}) CREATE (b)-[:KNOWS {since: 2019, relationship: 'Manager'}]->(c)"
-        ]
+        async def work(tx):
+            results = []
+            for query, parameters in statements:
+                result = await tx.run(query, parameters or {})
+                results.append([record async for record in result])
+            return results
         
-        for query in rel_queries:
-            self.run_query(query)
-            
-        # Log successful operation if request is provided
-        if request:
-            self.log_operation(request, "Created complete demo dataset (8 nodes, 9 relationships)")
-            
-        return "Demo data created successfully"
+        async def write():
+            async with self.driver.session() as session:
+                return await session.execute_write(work)
+        
+        try:
+            return await async_driver_registry.run(write())
+        except (ServiceUnavailable, SessionExpired) as e:
+            health_monitor.record_failure(e)
+            raise
 
 class GraphNode(models.Model):
     label = models.CharField(max_length=100)
     name = models.CharField(max_length=200)
     properties = models.JSONField(default=dict)
     node_id = models.CharField(max_length=100, null=True, blank=True)
+    # Stable key shared with Neo4j; internal Neo4j ids are reused after deletes
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['label'], name='graphnode_label_idx'),
+            models.Index(fields=['name'], name='graphnode_name_idx'),
+            models.Index(fields=['node_id'], name='graphnode_node_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.label}: {self.name}"
 
 class GraphRelationship(models.Model):
-    source = models.ForeignKey(GraphNode, related_name='outgoing_relationships', on_delete=models.CASCADE)
-    target = models.ForeignKey(GraphNode, related_name='incoming_relationships', on_delete=models.CASCADE)
+    # source/target are covered by the (source, type) and (target, type) indexes
+    source = models.ForeignKey(GraphNode, related_name='outgoing_relationships', on_delete=models.CASCADE, db_index=False)
+    target = models.ForeignKey(GraphNode, related_name='incoming_relationships', on_delete=models.CASCADE, db_index=False)
     type = models.CharField(max_length=100)
     properties = models.JSONField(default=dict)
     relationship_id = models.CharField(max_length=100, null=True, blank=True)
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['type'], name='graphrel_type_idx'),
+            models.Index(fields=['relationship_id'], name='graphrel_relationship_id_idx'),
+            models.Index(fields=['source', 'type'], name='graphrel_source_type_idx'),
+            models.Index(fields=['target', 'type'], name='graphrel_target_type_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.source.name} --[{self.type}]--> {self.target.name}" 
\ No newline at end of file
+        return f"{self.source.name} --[{self.type}]--> {self.target.name}"
+
+class Neo4jOutbox(models.Model):
+    """
+    Pending Neo4j mirror operations, written in the same transaction as the
+    GraphNode/GraphRelationship change and drained by `manage.py process_outbox`.
+    """
+    CREATE_NODE = 'create_node'
+    DELETE_NODE = 'delete_node'
+    CREATE_RELATIONSHIP = 'create_relationship'
+    DELETE_RELATIONSHIP = 'delete_relationship'
+    # Empty Neo4j before a whole graph is loaded (object_id is unused)
+    CLEAR_GRAPH = 'clear_graph'
+    OPERATION_CHOICES = [
+        (CREATE_NODE, 'Create node'),
+        (DELETE_NODE, 'Delete node'),
+        (CREATE_RELATIONSHIP, 'Create relationship'),
+        (DELETE_RELATIONSHIP, 'Delete relationship'),
+        (CLEAR_GRAPH, 'Clear graph'),
+    ]
+
+    operation = models.CharField(max_length=32, choices=OPERATION_CHOICES)
+    object_id = models.BigIntegerField()
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    failed = models.BooleanField(default=False)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['failed', 'next_attempt_at'])]
+
+    @classmethod
+    def enqueue(cls, operation, obj, **payload):
+        return cls.objects.create(operation=operation, object_id=obj.pk, payload=payload)
+
+    def __str__(self):
+        return f"{self.operation} #{self.object_id}"
+
+class GraphVersion(models.Model):
+    """
+    Single-row counter bumped on every change to the graph content, so caches
+    can be keyed by version instead of being invalidated one by one.
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    # The counter row itself, e.g. for its updated_at
+    @classmethod
+    def state(cls):
+        return cls.objects.get_or_create(pk=1)[0]
+
+    @classmethod
+    def current(cls):
+        return cls.state().version
+
+    @classmethod
+    def bump(cls):
+        updated = cls.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    def __str__(self):
+        return f"Graph version {self.version}"
+
+class GraphLayout(models.Model):
+    # Node positions computed by visualize_graph for one graph version and filter set
+    graph_version = models.BigIntegerField()
+    node_type = models.CharField(max_length=100)
+    relationship = models.CharField(max_length=100)
+    # Any further node/relationship filters, serialised; '' when there are none
+    filter_key = models.CharField(max_length=255, default='', blank=True)
+    layout = models.CharField(max_length=32)
+    positions = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['graph_version', 'node_type', 'relationship', 'filter_key', 'layout'],
+                                    name='unique_graph_layout_filters'),
+        ]
+        indexes = [models.Index(fields=['last_used'])]
+
+    def __str__(self):
+        return f"{self.layout} layout for version {self.graph_version}"
+
+class GraphSnapshot(models.Model):
+    """
+    A named copy of the whole graph, e.g. the user's data while demo mode is on.
+    Rows are stored as compact lists keyed by uuid so they can be restored
+    with bulk inserts regardless of the primary keys at restore time.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    # [uuid, label, name, properties]
+    nodes = models.JSONField(default=list)
+    # [uuid, source uuid, target uuid, type, properties]
+    relationships = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Snapshot {self.name} ({len(self.nodes)} nodes, {len(self.relationships)} relationships)"
+
+class GraphChange(models.Model):
+    """
+    Append-only log of node/relationship mutations, used by the Neo4j
+    reconciler to replay only what changed since its last checkpoint.
+
+    Rows are written by SQLite triggers (see migration 0008), so bulk
+    inserts, bulk deletes and cascades are logged like single-row changes.
+    """
+    NODE = 'node'
+    RELATIONSHIP = 'relationship'
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    kind = models.CharField(max_length=16, choices=[(NODE, 'Node'), (RELATIONSHIP, 'Relationship')])
+    operation = models.CharField(max_length=16, choices=[(UPSERT, 'Insert or update'), (DELETE, 'Delete')])
+    key = models.UUIDField()
+    # Key of a deleted relationship's source node, to find it in Neo4j by index
+    source_key = models.UUIDField(null=True, blank=True)
+    # Primary key of the changed row (migration 0009 onwards)
+    object_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"#{self.id} {self.operation} {self.kind} {self.key}"
+
+class SyncCheckpoint(models.Model):
+    # Last GraphChange id a sync job has fully applied, or another named counter
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def get(cls, name):
+        return cls.objects.get_or_create(name=name)[0]
+
+    def __str__(self):
+        return f"{self.name} at change #{self.position}"
+
+class AnalyticsResult(models.Model):
+    """
+    Output of one analytics run for a graph version and parameter set. The
+    row doubles as the background job record: it is created pending and
+    filled in by `manage.py run_analytics` when the run is too big to do
+    inside a request.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    graph_version = models.BigIntegerField()
+    algorithm = models.CharField(max_length=32)
+    # SHA1 of the canonical JSON of params, which include the relationship type filter
+    params_key = models.CharField(max_length=40)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    # Seconds spent computing the result
+    duration = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When a worker claimed the job, to spot jobs left running by a crash
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_used = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['graph_version', 'algorithm', 'params_key'],
+                                    name='unique_analytics_result'),
+        ]
+        indexes = [models.Index(fields=['status', 'created_at']), models.Index(fields=['last_used'])]
+
+    def __str__(self):
+        return f"{self.algorithm} for version {self.graph_version} ({self.status})"
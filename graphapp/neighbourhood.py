@@ -0,0 +1,146 @@
+from django.conf import settings
+from .filters import apply_filter, cypher_where
+from .graph_index import chunks
+from .models import GraphNode, GraphRelationship, KEY_PROPERTY, NODE_KEY_LABEL, quote_identifier
+
+# k-hop neighbourhoods ("ego graphs") around one node, for exploring graphs
+# too big to draw whole. Only the neighbourhood is ever read: SQLite is
+# walked one hop at a time through the source/target indexes, or Neo4j
+# finds the node keys with a bounded variable-length match. Either way the
+# node count is capped, nearest hops first. Property filters (see
+# filters.py) restrict the walk to matching nodes and relationships.
+
+def relationships(types, rel_where=()):
+    queryset = GraphRelationship.objects.all()
+    queryset = queryset.filter(type__in=types) if types else queryset
+    return apply_filter(queryset, rel_where)
+
+# Up to `count` distinct neighbours of the chunk through one direction's
+# column, with node filters applied in SQL, so a hub's edges are never all
+# read when the result only has room for a few more nodes
+def neighbours(chunk, column, other, count, types=(), where=(), rel_where=()):
+    queryset = relationships(types, rel_where).filter(**{f'{column}__in': chunk})
+    if where:
+        queryset = queryset.filter(**{f'{other}__in': apply_filter(GraphNode.objects.all(), where).values('id')})
+    return queryset.order_by().values_list(other, flat=True).distinct()[:count]
+
+# Breadth-first walk over SQLite. Returns ({node id: hop}, truncated).
+def expand_sqlite(start_id, hops, limit, types=(), direction='both', where=(), rel_where=()):
+    columns = {'out': [('source_id', 'target_id')], 'in': [('target_id', 'source_id')]}.get(
+        direction, [('source_id', 'target_id'), ('target_id', 'source_id')])
+    hop_of = {start_id: 0}
+    frontier = [start_id]
+    for hop in range(1, hops + 1):
+        following = []
+        for chunk in chunks(frontier):
+            for column, other in columns:
+                # Only the nodes already visited can be repeated, so this many
+                # is enough to fill the result and see whether it was cut short
+                for node_id in neighbours(chunk, column, other, limit + 1, types, where, rel_where):
+                    if node_id in hop_of:
+                        continue
+                    if len(hop_of) >= limit:
+                        return hop_of, True
+                    hop_of[node_id] = hop
+                    following.append(node_id)
+        frontier = following
+        if not frontier:
+            break
+    return hop_of, False
+
+# Keys of the nodes within `hops` of the start node according to Neo4j,
+# nearest first, at most limit + 1 of them so the caller can tell the result
+# was cut short. Property filters apply to every node and relationship along
+# the path.
+def expand_neo4j(conn, start_key, hops, limit, types=(), direction='both', where=(), rel_where=()):
+    rel_types = '|'.join(quote_identifier(t) for t in types)
+    pattern = f"[{':' + rel_types if rel_types else ''}*1..{int(hops)}]"
+    left, right = {'out': ('-', '->'), 'in': ('<-', '-')}.get(direction, ('-', '-'))
+    parameters = {'key': str(start_key), 'limit': limit + 1}
+    conditions = ["m <> s"]
+    if where:
+        clause, values = cypher_where(where, 'n', 'node')
+        conditions.append(f"all(n IN nodes(p)[1..] WHERE {clause})")
+        parameters.update(values)
+    if rel_where:
+        clause, values = cypher_where(rel_where, 'r', 'rel')
+        conditions.append(f"all(r IN relationships(p) WHERE {clause})")
+        parameters.update(values)
+    query = (
+        f"MATCH p = (s:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $key}}){left}{pattern}{right}(m:{NODE_KEY_LABEL}) "
+        f"WHERE {' AND '.join(conditions)} "
+        # Nearest first, like the SQLite walk, so the cap drops the farthest nodes
+        f"WITH m, min(length(p)) AS hop "
+        f"RETURN m.{KEY_PROPERTY} AS key, hop ORDER BY hop, key LIMIT $limit"
+    )
+    return [record['key'] for record in conn.run_query(query, parameters)]
+
+# Relationships between the given nodes, as dicts for the JSON response
+def induced_edges(node_ids, types=(), rel_where=()):
+    edges = []
+    for chunk in chunks(node_ids):
+        rows = relationships(types, rel_where).filter(source_id__in=chunk).values(
+            'id', 'source_id', 'target_id', 'type', 'properties')
+        edges += [{'id': row['id'], 'source': row['source_id'], 'target': row['target_id'],
+                   'type': row['type'], 'properties': row['properties']}
+                  for row in rows if row['target_id'] in node_ids]
+    return edges
+
+# Hop distances within an already selected set of nodes
+def hop_distances(start_id, edges, direction):
+    adjacent = {}
+    for edge in edges:
+        if direction in ('out', 'both'):
+            adjacent.setdefault(edge['source'], []).append(edge['target'])
+        if direction in ('in', 'both'):
+            adjacent.setdefault(edge['target'], []).append(edge['source'])
+    hop_of = {start_id: 0}
+    frontier = [start_id]
+    while frontier:
+        following = []
+        for node_id in frontier:
+            for other in adjacent.get(node_id, ()):
+                if other not in hop_of:
+                    hop_of[other] = hop_of[node_id] + 1
+                    following.append(other)
+        frontier = following
+    return hop_of
+
+def ego_graph(node, hops=1, limit=None, types=(), direction='both', conn=None, where=(), rel_where=()):
+    hops = max(1, min(hops, getattr(settings, 'GRAPH_NEIGHBOURHOOD_MAX_HOPS', 3)))
+    max_nodes = getattr(settings, 'GRAPH_NEIGHBOURHOOD_MAX_NODES', 500)
+    limit = max(1, min(limit or max_nodes, max_nodes))
+
+    backend = 'sqlite'
+    node_ids = None
+    if conn is not None and conn.connected:
+        try:
+            keys = expand_neo4j(conn, node.uuid, hops, limit - 1, types, direction, where, rel_where)
+            truncated = len(keys) >= limit
+            # Neo4j picks the nodes; their data still comes from SQLite
+            node_ids = {node.id}
+            for chunk in chunks(keys[:limit - 1]):
+                node_ids.update(GraphNode.objects.filter(uuid__in=chunk).values_list('id', flat=True))
+            backend = 'neo4j'
+        except Exception as e:
+            print(f"Warning: Could not expand node {node.id} in Neo4j, using SQLite: {e}")
+            node_ids = None
+    if node_ids is None:
+        hop_of, truncated = expand_sqlite(node.id, hops, limit, types, direction, where, rel_where)
+        node_ids = set(hop_of)
+
+    edges = induced_edges(node_ids, types, rel_where)
+    hop_of = hop_distances(node.id, edges, direction)
+    nodes = []
+    for chunk in chunks(node_ids):
+        for row in GraphNode.objects.filter(id__in=chunk).values('id', 'uuid', 'label', 'name', 'properties'):
+            nodes.append(dict(row, uuid=str(row['uuid']), hop=hop_of.get(row['id'])))
+    nodes.sort(key=lambda n: (n['hop'] is None, n['hop'], n['id']))
+    return {
+        'center': node.id,
+        'hops': hops,
+        'nodes': nodes,
+        'edges': edges,
+        'truncated': truncated,
+        'backend': backend,
+    }
@@ -0,0 +1,219 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
+from .models import (GraphNode, GraphRelationship, Neo4jOutbox, SyncCheckpoint, KEY_PROPERTY, NODE_KEY_LABEL,
+                     quote_identifier)
+
+class OutboxRetry(Exception):
+    # Raised when an entry can't be applied yet, e.g. its endpoints aren't mirrored
+    pass
+
+def get_batch_size(batch_size=None):
+    return int(batch_size or getattr(settings, 'NEO4J_OUTBOX_BATCH_SIZE', 500))
+
+# SyncCheckpoint counting the times queued entries were dropped from under
+# the worker, e.g. because the whole graph was replaced
+REPLACEMENTS = 'outbox_replacements'
+
+def replacement_count():
+    return SyncCheckpoint.get(REPLACEMENTS).position
+
+def count_replacement():
+    SyncCheckpoint.get(REPLACEMENTS)
+    SyncCheckpoint.objects.filter(name=REPLACEMENTS).update(position=F('position') + 1)
+
+# Replace whatever was queued with a wipe of Neo4j followed by a create for
+# every current row. Run inside the transaction that changed the rows.
+# Returns the (first, last) ids of the new entries, which are contiguous.
+def queue_full_mirror(batch_size=None):
+    Neo4jOutbox.objects.all().delete()
+    GraphNode.objects.exclude(node_id=None).update(node_id=None)
+    GraphRelationship.objects.exclude(relationship_id=None).update(relationship_id=None)
+    # Outbox entries run in id order, so Neo4j is emptied before the creates
+    Neo4jOutbox.objects.bulk_create(
+        [Neo4jOutbox(operation=Neo4jOutbox.CLEAR_GRAPH, object_id=0)] +
+        [Neo4jOutbox(operation=Neo4jOutbox.CREATE_NODE, object_id=pk)
+         for pk in GraphNode.objects.order_by('id').values_list('id', flat=True).iterator()] +
+        [Neo4jOutbox(operation=Neo4jOutbox.CREATE_RELATIONSHIP, object_id=pk)
+         for pk in GraphRelationship.objects.order_by('id').values_list('id', flat=True).iterator()],
+        batch_size=get_batch_size(batch_size)
+    )
+    count_replacement()
+    ids = Neo4jOutbox.objects.aggregate(first=Min('id'), last=Max('id'))
+    return ids['first'], ids['last']
+
+def pending_entries():
+    return Neo4jOutbox.objects.filter(failed=False)
+
+def backlog_stats():
+    return {
+        'pending': pending_entries().count(),
+        'failed': Neo4jOutbox.objects.filter(failed=True).count(),
+    }
+
+# Cypher pattern for one end of a relationship, found through the key
+# constraint whether it was mirrored long ago or earlier in the same batch
+def match_node(alias, node, params):
+    params[f'{alias}_key'] = str(node.uuid)
+    return f"MATCH ({alias}:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: ${alias}_key}}) "
+
+# Idempotent Cypher statements, as (query, params), for each kind of change.
+# Async views run the same statements directly while the SQLite write happens.
+def node_statement(node):
+    props = dict(node.properties, name=node.name)
+    query = (
+        f"MERGE (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $key}}) "
+        f"ON CREATE SET n:{quote_identifier(node.label)}, n += $props "
+        f"RETURN id(n) AS id"
+    )
+    return query, {'key': str(node.uuid), 'props': props}
+
+def relationship_statement(rel):
+    params = {'key': str(rel.uuid), 'props': rel.properties}
+    query = (
+        match_node('a', rel.source, params) +
+        match_node('b', rel.target, params) +
+        f"MERGE (a)-[r:{quote_identifier(rel.type)} {{{KEY_PROPERTY}: $key}}]->(b) "
+        f"ON CREATE SET r += $props "
+        f"RETURN id(r) AS id"
+    )
+    return query, params
+
+# Payloads queued before stable keys existed only carry the Neo4j id
+def delete_node_statement(payload):
+    if payload.get('key'):
+        query = f"MATCH (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $key}}) DETACH DELETE n"
+        return query, {'key': payload['key']}
+    if payload.get('node_id'):
+        return "MATCH (n) WHERE id(n) = $id DETACH DELETE n", {'id': int(payload['node_id'])}
+    return None
+
+def delete_relationship_statement(payload):
+    if payload.get('key'):
+        query = (
+            f"MATCH (:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $source_key}})"
+            f"-[r:{quote_identifier(payload['type'])} {{{KEY_PROPERTY}: $key}}]->() DELETE r"
+        )
+        return query, {'key': payload['key'], 'source_key': payload['source_key']}
+    if payload.get('relationship_id'):
+        return "MATCH ()-[r]->() WHERE id(r) = $id DELETE r", {'id': int(payload['relationship_id'])}
+    return None
+
+# Outbox payloads for deletes, captured before the rows are gone
+def delete_node_payload(node):
+    return {'key': str(node.uuid), 'label': node.label, 'node_id': node.node_id}
+
+def delete_relationship_payload(rel):
+    return {'key': str(rel.uuid), 'type': rel.type, 'source_key': str(rel.source.uuid),
+            'relationship_id': rel.relationship_id}
+
+# Build the statement for one entry, or None when there's nothing left to do
+# (object already mirrored or gone)
+def build_statement(entry, nodes, relationships):
+    if entry.operation == Neo4jOutbox.CREATE_NODE:
+        node = nodes.get(entry.object_id)
+        if node is None or node.node_id:
+            return None
+        return node_statement(node)
+
+    if entry.operation == Neo4jOutbox.CREATE_RELATIONSHIP:
+        rel = relationships.get(entry.object_id)
+        if rel is None or rel.relationship_id:
+            return None
+        return relationship_statement(rel)
+
+    if entry.operation == Neo4jOutbox.DELETE_NODE:
+        return delete_node_statement(entry.payload)
+
+    if entry.operation == Neo4jOutbox.DELETE_RELATIONSHIP:
+        return delete_relationship_statement(entry.payload)
+
+    if entry.operation == Neo4jOutbox.CLEAR_GRAPH:
+        return "MATCH (n) DETACH DELETE n", {}
+
+    raise ValueError(f"Unknown outbox operation: {entry.operation}")
+
+# Apply a list of entries in one Neo4j transaction and back-fill the new ids.
+# replacements is replacement_count() from before the entries were read.
+def apply_entries(conn, entries, replacements=None):
+    node_pks = [e.object_id for e in entries if e.operation == Neo4jOutbox.CREATE_NODE]
+    rel_pks = [e.object_id for e in entries if e.operation == Neo4jOutbox.CREATE_RELATIONSHIP]
+    nodes = GraphNode.objects.in_bulk(node_pks)
+    relationships = GraphRelationship.objects.select_related('source', 'target').in_bulk(rel_pks)
+
+    statements = []
+    for entry in entries:
+        statement = build_statement(entry, nodes, relationships)
+        if statement is not None:
+            statements.append((entry, statement))
+
+    results = conn.run_transaction([statement for _, statement in statements]) if statements else []
+    if results is None:
+        raise OutboxRetry("Neo4j not connected")
+
+    created_nodes = []
+    created_relationships = []
+    for (entry, _), records in zip(statements, results):
+        if entry.operation == Neo4jOutbox.CREATE_NODE:
+            node = nodes[entry.object_id]
+            node.node_id = str(records[0]['id'])
+            created_nodes.append(node)
+        elif entry.operation == Neo4jOutbox.CREATE_RELATIONSHIP:
+            if not records:
+                raise OutboxRetry(f"Endpoints of relationship #{entry.object_id} are not in Neo4j yet")
+            rel = relationships[entry.object_id]
+            rel.relationship_id = str(records[0]['id'])
+            created_relationships.append(rel)
+
+    # Re-running a batch after a crash here is harmless: every statement MERGEs on the stable key
+    with transaction.atomic():
+        # The graph was replaced while this batch ran, possibly after its Neo4j wipe,
+        # so Neo4j may now hold rows of the old graph
+        if statements and replacements is not None and replacement_count() != replacements:
+            print("Warning: Graph replaced while outbox entries were applied; queueing a full Neo4j mirror")
+            queue_full_mirror()
+            return
+        GraphNode.objects.bulk_update(created_nodes, ['node_id'])
+        GraphRelationship.objects.bulk_update(created_relationships, ['relationship_id'])
+        Neo4jOutbox.objects.filter(id__in=[e.id for e in entries]).delete()
+
+def record_attempt_failure(entry, error):
+    max_attempts = getattr(settings, 'NEO4J_OUTBOX_MAX_ATTEMPTS', 10)
+    retry_delay = getattr(settings, 'NEO4J_OUTBOX_RETRY_DELAY', 5)
+    entry.attempts += 1
+    entry.last_error = str(error)
+    entry.failed = entry.attempts >= max_attempts
+    # Exponential backoff, capped at an hour
+    entry.next_attempt_at = timezone.now() + timedelta(seconds=min(retry_delay * 2 ** (entry.attempts - 1), 3600))
+    entry.save(update_fields=['attempts', 'last_error', 'failed', 'next_attempt_at'])
+
+# Drain one batch of due entries. Returns the number of entries applied.
+def process_batch(conn, batch_size=None):
+    replacements = replacement_count()
+    entries = list(pending_entries().filter(next_attempt_at__lte=timezone.now())[:get_batch_size(batch_size)])
+    if not entries:
+        return 0
+
+    # Connectivity errors leave the whole batch queued without using up attempts
+    try:
+        apply_entries(conn, entries, replacements)
+        return len(entries)
+    except (ServiceUnavailable, SessionExpired):
+        raise
+    except Exception as e:
+        print(f"Warning: Outbox batch failed, retrying entries one by one: {e}")
+
+    # Isolate the entries that fail so the rest of the batch still goes through
+    applied = 0
+    for entry in entries:
+        try:
+            apply_entries(conn, [entry], replacements)
+            applied += 1
+        except (ServiceUnavailable, SessionExpired):
+            raise
+        except Exception as e:
+            record_attempt_failure(entry, e)
+    return applied
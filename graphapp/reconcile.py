@@ -0,0 +1,357 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.db import transaction
+from .models import (GraphChange, GraphNode, GraphRelationship, SyncCheckpoint, KEY_PROPERTY, NODE_KEY_LABEL,
+                     quote_identifier)
+
+# Name of the SyncCheckpoint row tracking how far the change log was replayed
+CHECKPOINT = 'neo4j'
+
+def get_batch_size(batch_size=None):
+    return int(batch_size or getattr(settings, 'NEO4J_RECONCILE_BATCH_SIZE', 1000))
+
+class ReconcileStats:
+    def __init__(self):
+        self.changes = 0
+        self.nodes_upserted = 0
+        self.nodes_deleted = 0
+        self.relationships_upserted = 0
+        self.relationships_deleted = 0
+        self.ids_backfilled = 0
+        self.started = time.monotonic()
+
+    @property
+    def repairs(self):
+        return (self.nodes_upserted + self.nodes_deleted + self.relationships_upserted +
+                self.relationships_deleted + self.ids_backfilled)
+
+    def __str__(self):
+        return (f"{self.changes} changes read; {self.nodes_upserted} nodes and "
+                f"{self.relationships_upserted} relationships written, {self.nodes_deleted} nodes and "
+                f"{self.relationships_deleted} relationships deleted, {self.ids_backfilled} Neo4j ids "
+                f"back-filled in {time.monotonic() - self.started:.2f}s")
+
+class Repairs:
+    """
+    Neo4j fixes collected for one batch. Upserts overwrite the whole entity
+    from SQLite, so applying the same repair twice is harmless.
+    """
+    def __init__(self):
+        self.node_upserts = []
+        self.node_deletes = []
+        self.relationship_upserts = []
+        # (key, source node key or None)
+        self.relationship_deletes = []
+        # Entities already identical in Neo4j whose id SQLite is missing
+        self.node_ids = {}
+        self.relationship_ids = {}
+
+    def __len__(self):
+        return (len(self.node_upserts) + len(self.node_deletes) + len(self.relationship_upserts) +
+                len(self.relationship_deletes) + len(self.node_ids) + len(self.relationship_ids))
+
+    def count(self, stats):
+        stats.nodes_upserted += len(self.node_upserts)
+        stats.nodes_deleted += len(self.node_deletes)
+        stats.relationships_upserted += len(self.relationship_upserts)
+        stats.relationships_deleted += len(self.relationship_deletes)
+        stats.ids_backfilled += len(self.node_ids) + len(self.relationship_ids)
+
+def group_by(items, key):
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
+
+# Statements for one set of repairs, plus which model each statement's
+# (key, id) records belong to. Deletes go first and node upserts before
+# relationship upserts, so new relationships always find their endpoints.
+def repair_statements(repairs):
+    statements = []
+    targets = []
+    anchored = [{'key': key, 'source_key': source} for key, source in repairs.relationship_deletes if source]
+    unanchored = [key for key, source in repairs.relationship_deletes if not source]
+    if anchored:
+        statements.append((
+            f"UNWIND $rows AS row "
+            f"MATCH (:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: row.source_key}})-[r {{{KEY_PROPERTY}: row.key}}]->() DELETE r",
+            {'rows': anchored}
+        ))
+        targets.append(None)
+    if unanchored:
+        statements.append((f"UNWIND $keys AS key MATCH ()-[r {{{KEY_PROPERTY}: key}}]->() DELETE r", {'keys': unanchored}))
+        targets.append(None)
+    if repairs.node_deletes:
+        statements.append((
+            f"UNWIND $keys AS key MATCH (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: key}}) DETACH DELETE n",
+            {'keys': repairs.node_deletes}
+        ))
+        targets.append(None)
+
+    for label, nodes in group_by(repairs.node_upserts, lambda node: node.label).items():
+        rows = [{'key': str(node.uuid), 'props': node_properties(node)} for node in nodes]
+        statements.append((
+            f"UNWIND $rows AS row "
+            f"MERGE (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: row.key}}) "
+            f"SET n = row.props, n:{quote_identifier(label)} "
+            f"RETURN row.key AS key, id(n) AS id",
+            {'rows': rows}
+        ))
+        targets.append(GraphNode)
+
+    for rel_type, rels in group_by(repairs.relationship_upserts, lambda rel: rel.type).items():
+        rows = [{
+            'key': str(rel.uuid),
+            'start_key': str(rel.source.uuid),
+            'end_key': str(rel.target.uuid),
+            'props': relationship_properties(rel),
+        } for rel in rels]
+        statements.append((
+            f"UNWIND $rows AS row "
+            f"MATCH (a:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: row.start_key}}) "
+            f"MATCH (b:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: row.end_key}}) "
+            f"MERGE (a)-[r:{quote_identifier(rel_type)} {{{KEY_PROPERTY}: row.key}}]->(b) "
+            f"SET r = row.props "
+            f"RETURN row.key AS key, id(r) AS id",
+            {'rows': rows}
+        ))
+        targets.append(GraphRelationship)
+    return statements, targets
+
+# Run the repairs in one Neo4j transaction, then store the Neo4j ids in SQLite
+def apply_repairs(conn, repairs):
+    if not len(repairs):
+        return
+    statements, targets = repair_statements(repairs)
+    neo4j_ids = {GraphNode: dict(repairs.node_ids), GraphRelationship: dict(repairs.relationship_ids)}
+    if statements:
+        results = conn.run_transaction(statements)
+        if results is None:
+            raise ConnectionError("Neo4j not connected")
+        for model, records in zip(targets, results):
+            if model is not None:
+                neo4j_ids[model].update((record['key'], str(record['id'])) for record in records)
+
+    # Only updates the id columns, which the change log triggers ignore
+    with transaction.atomic():
+        for model, id_field in ((GraphNode, 'node_id'), (GraphRelationship, 'relationship_id')):
+            ids = neo4j_ids[model]
+            if not ids:
+                continue
+            rows = list(model.objects.filter(uuid__in=list(ids)).only('id', 'uuid', id_field))
+            for row in rows:
+                setattr(row, id_field, ids[str(row.uuid)])
+            model.objects.bulk_update(rows, [id_field])
+
+# The properties a mirrored entity should have in Neo4j
+def node_properties(node):
+    return dict(node.properties, name=node.name, **{KEY_PROPERTY: str(node.uuid)})
+
+def relationship_properties(rel):
+    return dict(rel.properties, **{KEY_PROPERTY: str(rel.uuid)})
+
+# Compare the current SQLite state of every entity named in a batch of
+# changes; whatever exists is upserted, whatever is gone is deleted
+def repairs_for_changes(changes):
+    node_keys = {change.key for change in changes if change.kind == GraphChange.NODE}
+    relationship_sources = {}
+    for change in changes:
+        if change.kind == GraphChange.RELATIONSHIP:
+            relationship_sources[change.key] = change.source_key or relationship_sources.get(change.key)
+
+    repairs = Repairs()
+    nodes = GraphNode.objects.in_bulk(list(node_keys), field_name='uuid')
+    for key in node_keys:
+        if key in nodes:
+            repairs.node_upserts.append(nodes[key])
+        else:
+            repairs.node_deletes.append(str(key))
+
+    rels = GraphRelationship.objects.select_related('source', 'target').in_bulk(
+        list(relationship_sources), field_name='uuid')
+    for key, source_key in relationship_sources.items():
+        if key in rels:
+            repairs.relationship_upserts.append(rels[key])
+        else:
+            repairs.relationship_deletes.append((str(key), str(source_key) if source_key else None))
+    return repairs
+
+# Replay the change log from the checkpoint, one batch per Neo4j transaction.
+# The checkpoint only moves after a batch has been applied.
+def replay_changes(conn, batch_size=None, dry_run=False, progress=None, from_start=False):
+    batch_size = get_batch_size(batch_size)
+    checkpoint = SyncCheckpoint.get(CHECKPOINT)
+    position = 0 if from_start else checkpoint.position
+    stats = ReconcileStats()
+    while True:
+        changes = list(GraphChange.objects.filter(id__gt=position).order_by('id')[:batch_size])
+        if not changes:
+            return stats
+        repairs = repairs_for_changes(changes)
+        if not dry_run:
+            apply_repairs(conn, repairs)
+            checkpoint.position = changes[-1].id
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        position = changes[-1].id
+        stats.changes += len(changes)
+        repairs.count(stats)
+        if progress:
+            progress(stats)
+
+def digest(*parts):
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+# Keyset scans yielding (key, digest, neo4j id, source key) in key order.
+# Both sides are read in chunks through an index on the key, never as one
+# big result; the source key lets extra relationships be deleted by anchor.
+def sqlite_node_rows(batch_size):
+    queryset = GraphNode.objects.order_by('uuid').values_list('uuid', 'label', 'name', 'properties', 'node_id')
+    after = None
+    while True:
+        rows = list((queryset.filter(uuid__gt=after) if after else queryset)[:batch_size])
+        for key, label, name, props, node_id in rows:
+            yield str(key), digest([label], dict(props, name=name)), node_id, None
+        if len(rows) < batch_size:
+            return
+        after = rows[-1][0]
+
+def neo4j_node_rows(conn, batch_size):
+    query = (
+        f"MATCH (n:{NODE_KEY_LABEL}) WHERE n.{KEY_PROPERTY} > $after "
+        f"RETURN n.{KEY_PROPERTY} AS key, [l IN labels(n) WHERE l <> $key_label] AS labels, "
+        f"properties(n) AS props, id(n) AS id "
+        f"ORDER BY key LIMIT $limit"
+    )
+    after = ''
+    while True:
+        records = conn.run_query(query, {'after': after, 'key_label': NODE_KEY_LABEL, 'limit': batch_size})
+        for record in records:
+            props = dict(record['props'])
+            props.pop(KEY_PROPERTY, None)
+            yield record['key'], digest(sorted(record['labels']), props), str(record['id']), None
+        if len(records) < batch_size:
+            return
+        after = records[-1]['key']
+
+def sqlite_relationship_rows(rel_type, batch_size):
+    queryset = GraphRelationship.objects.filter(type=rel_type).order_by('uuid').values_list(
+        'uuid', 'source__uuid', 'target__uuid', 'properties', 'relationship_id')
+    after = None
+    while True:
+        rows = list((queryset.filter(uuid__gt=after) if after else queryset)[:batch_size])
+        for key, source, target, props, rel_id in rows:
+            yield str(key), digest(str(source), str(target), props), rel_id, str(source)
+        if len(rows) < batch_size:
+            return
+        after = rows[-1][0]
+
+def neo4j_relationship_rows(conn, rel_type, batch_size):
+    query = (
+        f"MATCH (a)-[r:{quote_identifier(rel_type)}]->(b) WHERE r.{KEY_PROPERTY} > $after "
+        f"RETURN r.{KEY_PROPERTY} AS key, a.{KEY_PROPERTY} AS source, b.{KEY_PROPERTY} AS target, "
+        f"properties(r) AS props, id(r) AS id "
+        f"ORDER BY key LIMIT $limit"
+    )
+    after = ''
+    while True:
+        records = conn.run_query(query, {'after': after, 'limit': batch_size})
+        for record in records:
+            props = dict(record['props'])
+            props.pop(KEY_PROPERTY, None)
+            yield (record['key'], digest(record['source'], record['target'], props), str(record['id']),
+                   record['source'])
+        if len(records) < batch_size:
+            return
+        after = records[-1]['key']
+
+# Merge-join two key-ordered scans. Yields (key, sqlite row, neo4j row) for
+# every key missing on one side or whose digests differ, and for matching
+# rows whose Neo4j id SQLite doesn't have.
+def diff_rows(sqlite_rows, neo4j_rows):
+    sentinel = (None,) * 4
+    left = next(sqlite_rows, sentinel)
+    right = next(neo4j_rows, sentinel)
+    while left[0] is not None or right[0] is not None:
+        if right[0] is None or (left[0] is not None and left[0] < right[0]):
+            yield left[0], left, None
+            left = next(sqlite_rows, sentinel)
+        elif left[0] is None or right[0] < left[0]:
+            yield right[0], None, right
+            right = next(neo4j_rows, sentinel)
+        else:
+            if left[1] != right[1] or left[2] != right[2]:
+                yield left[0], left, right
+            left = next(sqlite_rows, sentinel)
+            right = next(neo4j_rows, sentinel)
+
+# Turn diff_rows output into repairs, flushing them every batch_size keys
+def repair_differences(conn, differences, kind, batch_size, dry_run, stats):
+    model = GraphNode if kind == GraphChange.NODE else GraphRelationship
+    repairs = Repairs()
+    upserts = []
+
+    def flush():
+        nonlocal repairs, upserts
+        queryset = model.objects.all() if model is GraphNode else model.objects.select_related('source', 'target')
+        rows = queryset.in_bulk(upserts, field_name='uuid')
+        if model is GraphNode:
+            repairs.node_upserts = list(rows.values())
+        else:
+            repairs.relationship_upserts = list(rows.values())
+        repairs.count(stats)
+        if not dry_run:
+            apply_repairs(conn, repairs)
+        repairs = Repairs()
+        upserts = []
+
+    for key, local, remote in differences:
+        if local is None:
+            if model is GraphNode:
+                repairs.node_deletes.append(key)
+            else:
+                repairs.relationship_deletes.append((key, remote[3]))
+        elif remote is None or local[1] != remote[1]:
+            upserts.append(key)
+        elif model is GraphNode:
+            repairs.node_ids[key] = remote[2]
+        else:
+            repairs.relationship_ids[key] = remote[2]
+        if len(repairs) + len(upserts) >= batch_size:
+            flush()
+    flush()
+
+# Compare both stores entity by entity and repair every difference from
+# SQLite. Afterwards the change log is settled up to where the diff started.
+def full_diff(conn, batch_size=None, dry_run=False):
+    batch_size = get_batch_size(batch_size)
+    stats = ReconcileStats()
+    position = GraphChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    repair_differences(conn, diff_rows(sqlite_node_rows(batch_size), neo4j_node_rows(conn, batch_size)),
+                       GraphChange.NODE, batch_size, dry_run, stats)
+
+    rel_types = set(GraphRelationship.objects.values_list('type', flat=True).distinct())
+    rel_types.update(record['type'] for record in conn.run_query(
+        "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType AS type"))
+    for rel_type in sorted(rel_types):
+        differences = diff_rows(sqlite_relationship_rows(rel_type, batch_size),
+                                neo4j_relationship_rows(conn, rel_type, batch_size))
+        repair_differences(conn, differences, GraphChange.RELATIONSHIP, batch_size, dry_run, stats)
+
+    if not dry_run:
+        checkpoint = SyncCheckpoint.get(CHECKPOINT)
+        checkpoint.position = max(checkpoint.position, position)
+        checkpoint.save(update_fields=['position', 'updated_at'])
+    return stats
+
+# Entities Neo4j holds without a key; the diff can't match these to SQLite
+def unkeyed_counts(conn):
+    nodes = conn.run_query(f"MATCH (n) WHERE n.{KEY_PROPERTY} IS NULL RETURN count(n) AS count")
+    rels = conn.run_query(f"MATCH ()-[r]->() WHERE r.{KEY_PROPERTY} IS NULL RETURN count(r) AS count")
+    return nodes[0]['count'], rels[0]['count']
+
+def prune_changes():
+    position = SyncCheckpoint.get(CHECKPOINT).position
+    return GraphChange.objects.filter(id__lte=position).delete()[0]
@@ -0,0 +1,79 @@
+import re
+import uuid
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+# Full-text search over nodes through the FTS5 table created in migration
+# 0011. Queries go straight to SQLite: the ORM has no MATCH lookup, and
+# ranking and snippets are FTS5 functions.
+
+SEARCH_TABLE = 'graphapp_nodesearch'
+# bm25 weights for the name, label and properties columns
+RANK = 'bm25(10.0, 5.0, 1.0)'
+# Highlight markers that can't appear in user text, swapped for <mark> after escaping
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+TERM = re.compile(r'\w+')
+
+# Turn free text into an FTS5 expression: every word must match, and the
+# last one may be a prefix. Words are quoted, so operators typed by the
+# user (AND, NEAR, column:, ...) are searched for rather than interpreted.
+def match_expression(query, prefix=False, column=None):
+    terms = [f'"{term}"' for term in TERM.findall(query)]
+    if not terms:
+        return None
+    if prefix:
+        terms[-1] += '*'
+    expression = ' '.join(terms)
+    return f"{column} : ({expression})" if column else expression
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+# One page of nodes matching `query`, best first. Returns (results, has_next).
+def search_nodes(query, page=1, page_size=None, label=None, prefix=False):
+    match = match_expression(query, prefix)
+    if match is None:
+        return [], False
+    page_size = page_size or getattr(settings, 'GRAPH_SEARCH_PAGE_SIZE', 20)
+
+    sql = (
+        f"SELECT n.id, n.uuid, n.label, n.name, "
+        f"snippet({SEARCH_TABLE}, -1, %s, %s, '…', 12) "
+        f"FROM {SEARCH_TABLE} JOIN graphapp_graphnode n ON n.id = {SEARCH_TABLE}.rowid "
+        f"WHERE {SEARCH_TABLE} MATCH %s AND rank MATCH %s"
+    )
+    params = [HIGHLIGHT_START, HIGHLIGHT_END, match, RANK]
+    if label:
+        sql += " AND n.label = %s"
+        params.append(label)
+    # One extra row tells whether there is a next page without counting
+    sql += " ORDER BY rank LIMIT %s OFFSET %s"
+    params += [page_size + 1, (page - 1) * page_size]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    results = [{
+        'id': node_id,
+        'uuid': str(uuid.UUID(key)),
+        'label': node_label,
+        'name': name,
+        'highlight': highlight(snippet),
+    } for node_id, key, node_label, name, snippet in rows[:page_size]]
+    return results, len(rows) > page_size
+
+# Nodes whose name starts with the typed words, for autocomplete
+def autocomplete(prefix, limit=None):
+    match = match_expression(prefix, prefix=True, column='name')
+    if match is None:
+        return []
+    limit = limit or getattr(settings, 'GRAPH_SEARCH_AUTOCOMPLETE_SIZE', 10)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, name, label FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND rank MATCH %s ORDER BY rank LIMIT %s",
+            [match, RANK, limit]
+        )
+        return [{'id': node_id, 'name': name, 'label': label} for node_id, name, label in cursor.fetchall()]
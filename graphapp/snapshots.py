@@ -0,0 +1,145 @@
+import uuid
+from itertools import islice
+from django.db import transaction
+from .bulk_import import get_batch_size, group_positions
+from .models import GraphNode, GraphRelationship, GraphSnapshot, GraphVersion, Neo4jConnection, Neo4jOutbox, KEY_PROPERTY
+from .outbox import count_replacement, queue_full_mirror, replacement_count
+
+# Demo dataset, in the same shape as snapshot rows but with names instead of keys
+DEMO_NODES = [
+    ("Person", "Alice", {"age": 32, "occupation": "Software Engineer"}),
+    ("Person", "Bob", {"age": 28, "occupation": "Data Scientist"}),
+    ("Person", "Charlie", {"age": 35, "occupation": "Project Manager"}),
+    ("Company", "TechCorp", {"industry": "Technology", "founded": 2010}),
+    ("Company", "DataInc", {"industry": "Data Analytics", "founded": 2015}),
+    ("Skill", "Python", {"category": "Programming Language", "difficulty": "Intermediate"}),
+    ("Skill", "Machine Learning", {"category": "AI", "difficulty": "Advanced"}),
+    ("Skill", "Management", {"category": "Soft Skill", "difficulty": "Advanced"}),
+]
+DEMO_RELATIONSHIPS = [
+    ("Alice", "TechCorp", "WORKS_AT", {"position": "Senior Developer", "since": 2018}),
+    ("Bob", "DataInc", "WORKS_AT", {"position": "Data Analyst", "since": 2019}),
+    ("Charlie", "TechCorp", "WORKS_AT", {"position": "Team Lead", "since": 2015}),
+    ("Alice", "Python", "HAS_SKILL", {"level": "Expert", "years": 5}),
+    ("Bob", "Python", "HAS_SKILL", {"level": "Proficient", "years": 3}),
+    ("Bob", "Machine Learning", "HAS_SKILL", {"level": "Advanced", "years": 2}),
+    ("Charlie", "Management", "HAS_SKILL", {"level": "Expert", "years": 8}),
+    ("Alice", "Bob", "KNOWS", {"since": 2017, "relationship": "Colleague"}),
+    ("Bob", "Charlie", "KNOWS", {"since": 2019, "relationship": "Manager"}),
+]
+
+# The demo dataset as (nodes, relationships) snapshot rows with fresh keys
+def demo_graph():
+    keys = {name: str(uuid.uuid4()) for _, name, _ in DEMO_NODES}
+    nodes = [[keys[name], label, name, props] for label, name, props in DEMO_NODES]
+    relationships = [[str(uuid.uuid4()), keys[source], keys[target], rel_type, props]
+                     for source, target, rel_type, props in DEMO_RELATIONSHIPS]
+    return nodes, relationships
+
+def save_snapshot(name):
+    nodes = GraphNode.objects.order_by('id').values_list('uuid', 'label', 'name', 'properties')
+    relationships = GraphRelationship.objects.order_by('id').values_list(
+        'uuid', 'source__uuid', 'target__uuid', 'type', 'properties')
+    snapshot, _ = GraphSnapshot.objects.update_or_create(name=name, defaults={
+        'nodes': [[str(key), label, node_name, props] for key, label, node_name, props in nodes.iterator()],
+        'relationships': [[str(key), str(source), str(target), rel_type, props]
+                          for key, source, target, rel_type, props in relationships.iterator()],
+    })
+    return snapshot
+
+def chunked(positions, size):
+    positions = iter(positions)
+    while chunk := list(islice(positions, size)):
+        yield chunk
+
+# Statements replacing the whole Neo4j graph in one transaction, plus the
+# snapshot rows each statement's "i" column refers to
+def mirror_statements(nodes, relationships, batch_size):
+    statements = [("MATCH (n) DETACH DELETE n", {})]
+    targets = [None]
+    for label, positions in group_positions(nodes, 1).items():
+        for chunk in chunked(positions, batch_size):
+            rows = [dict(nodes[p][3], name=nodes[p][2], **{KEY_PROPERTY: nodes[p][0]}) for p in chunk]
+            statements.append(Neo4jConnection.nodes_batch_statement(label, rows))
+            targets.append((GraphNode, [nodes[p][0] for p in chunk]))
+    for rel_type, positions in group_positions(relationships, 3).items():
+        for chunk in chunked(positions, batch_size):
+            rows = [{
+                'start_key': relationships[p][1],
+                'end_key': relationships[p][2],
+                'props': dict(relationships[p][4], **{KEY_PROPERTY: relationships[p][0]}),
+            } for p in chunk]
+            statements.append(Neo4jConnection.relationships_batch_statement(rel_type, rows))
+            targets.append((GraphRelationship, [relationships[p][0] for p in chunk]))
+    return statements, targets
+
+# Store each record's Neo4j id on the row with the given key
+def backfill_ids(model, field, pks, neo4j_ids, batch_size):
+    model.objects.bulk_update([model(pk=pks[key], **{field: value}) for key, value in neo4j_ids.items()],
+                              [field], batch_size=batch_size)
+
+# Replace the graph in both stores with the given snapshot rows. SQLite is
+# written first, together with outbox entries that wipe and rebuild Neo4j;
+# the rebuild is then tried directly, in one Neo4j transaction, and the
+# entries are only dropped once it has gone through.
+# Returns whether Neo4j was updated.
+def load_graph(nodes, relationships, conn=None, batch_size=None):
+    batch_size = get_batch_size(batch_size)
+    with transaction.atomic():
+        GraphRelationship.objects.all().delete()
+        GraphNode.objects.all().delete()
+
+        GraphNode.objects.bulk_create([
+            GraphNode(uuid=key, label=label, name=name, properties=props)
+            for key, label, name, props in nodes
+        ], batch_size=batch_size)
+
+        # Remap the snapshot's keys to the primary keys the rows just got
+        node_pks = {str(key): pk for key, pk in GraphNode.objects.values_list('uuid', 'id').iterator()}
+        missing = {key for _, source, target, _, _ in relationships for key in (source, target)} - node_pks.keys()
+        if missing:
+            raise ValueError(f"Relationships refer to {len(missing)} node(s) missing from the snapshot")
+        GraphRelationship.objects.bulk_create([
+            GraphRelationship(uuid=key, source_id=node_pks[source], target_id=node_pks[target], type=rel_type,
+                              properties=props)
+            for key, source, target, rel_type, props in relationships
+        ], batch_size=batch_size)
+        rel_pks = {str(key): pk for key, pk in GraphRelationship.objects.values_list('uuid', 'id').iterator()}
+
+        # Queued changes were made to the graph being replaced
+        first, last = queue_full_mirror(batch_size)
+        replacements = replacement_count()
+        GraphVersion.bump()
+
+    if conn is None or not conn.connected:
+        return False
+    neo4j_ids = {GraphNode: {}, GraphRelationship: {}}
+    try:
+        statements, targets = mirror_statements(nodes, relationships, batch_size)
+        results = conn.run_transaction(statements)
+    except Exception as e:
+        print(f"Warning: Could not load graph into Neo4j, leaving it to the outbox: {e}")
+        return False
+    if results is None:
+        return False
+    for (model, keys), records in zip(targets[1:], results[1:]):
+        for record in records:
+            neo4j_ids[model][keys[record['i']]] = str(record['id'])
+
+    with transaction.atomic():
+        entries = Neo4jOutbox.objects.filter(id__range=(first, last))
+        # A newer load, or a worker that had already started on these entries,
+        # may have written Neo4j after us; rebuilding it again is the safe option
+        if replacement_count() != replacements or entries.count() != last - first + 1:
+            print("Warning: Graph changed while it was loaded into Neo4j; queueing a full Neo4j mirror")
+            queue_full_mirror(batch_size)
+            return False
+        backfill_ids(GraphNode, 'node_id', node_pks, neo4j_ids[GraphNode], batch_size)
+        backfill_ids(GraphRelationship, 'relationship_id', rel_pks, neo4j_ids[GraphRelationship], batch_size)
+        entries.delete()
+        # A worker may be holding some of the entries just dropped
+        count_replacement()
+    return True
+
+def restore_snapshot(snapshot, conn=None, batch_size=None):
+    return load_graph(snapshot.nodes, snapshot.relationships, conn, batch_size)
@@ -0,0 +1,142 @@
+import math
+import networkx as nx
+import plotly.graph_objects as go
+from django.conf import settings
+from django.db.models import CharField, Count, F
+from django.db.models.fields.json import KT, KeyTextTransform, KeyTransform
+from django.db.models.functions import Cast
+from .models import GraphNode, GraphRelationship
+
+OTHER_GROUP = 'Other'
+
+def property_text(path):
+    return Cast(KT(path), CharField())
+
+# Like property_text, for the JSON field at the end of a relation path. KT()
+# treats everything after the first name as JSON keys, so it can't follow
+# source__/target__ to the node's properties.
+def field_property_text(field, key):
+    *parents, last = key.split('__')
+    expression = F(field)
+    for part in parents:
+        expression = KeyTransform(part, expression)
+    return Cast(KeyTextTransform(last, expression), CharField())
+
+# SQL expression for the group key of a node, reached through `prefix`
+# ('' for GraphNode itself, 'source__'/'target__' from a relationship).
+# Property values are compared as text so 5 and "5" land in the same group.
+def group_expression(group_by, property_key, prefix=''):
+    if group_by == 'property':
+        return field_property_text(f'{prefix}properties', property_key)
+    return F(f'{prefix}label')
+
+# Count nodes per group with one GROUP BY query. Only the largest groups are
+# kept as supernodes; the rest are folded into a single "Other" group.
+def summarize_nodes(group_by='label', property_key=None):
+    max_groups = getattr(settings, 'GRAPH_SUMMARY_MAX_GROUPS', 50)
+    rows = (GraphNode.objects
+            .annotate(group=group_expression(group_by, property_key))
+            .values('group')
+            .annotate(count=Count('id'))
+            .order_by('-count'))
+    
+    groups = {}
+    for row in rows:
+        key = row['group']
+        if len(groups) >= max_groups:
+            key = OTHER_GROUP
+        groups[key] = groups.get(key, 0) + row['count']
+    return groups
+
+# Count relationships per (source group, target group, type) with one GROUP BY query
+def summarize_relationships(groups, group_by='label', property_key=None, rel_type=None):
+    relationships = GraphRelationship.objects.all()
+    if rel_type:
+        relationships = relationships.filter(type=rel_type)
+    rows = (relationships
+            .annotate(source_group=group_expression(group_by, property_key, 'source__'),
+                      target_group=group_expression(group_by, property_key, 'target__'))
+            .values('source_group', 'target_group', 'type')
+            .annotate(weight=Count('id')))
+    
+    edges = {}
+    for row in rows:
+        source = row['source_group'] if row['source_group'] in groups else OTHER_GROUP
+        target = row['target_group'] if row['target_group'] in groups else OTHER_GROUP
+        types = edges.setdefault((source, target), {})
+        types[row['type']] = types.get(row['type'], 0) + row['weight']
+    return edges
+
+def group_name(key):
+    return '(none)' if key is None else str(key)
+
+def build_summary_figure(groups, edges, colors, drill_urls):
+    G = nx.DiGraph()
+    G.add_nodes_from(groups)
+    G.add_edges_from((source, target) for source, target in edges if source != target)
+    pos = nx.circular_layout(G) if len(G) > 2 else nx.spring_layout(G, seed=1)
+    largest = max(groups.values()) if groups else 1
+    
+    traces = []
+    # One trace per group pair so the line width can follow the relationship count
+    for (source, target), types in edges.items():
+        if source == target:
+            continue
+        (x0, y0), (x1, y1) = pos[source], pos[target]
+        weight = sum(types.values())
+        hover = f"<b>{group_name(source)} → {group_name(target)}</b><br>" + "<br>".join(
+            f"{rel_type}: {count}" for rel_type, count in sorted(types.items()))
+        traces.append(go.Scatter(
+            x=[x0, x1], y=[y0, y1],
+            mode='lines',
+            line=dict(width=1 + 2 * math.log10(weight + 1), color='#888'),
+            hoverinfo='text', text=[hover, hover],
+            hovertemplate='%{text}<extra></extra>',
+            showlegend=False
+        ))
+    
+    nodes = list(G.nodes())
+    hover_text = []
+    for key in nodes:
+        text = f"<b>{group_name(key)}</b><br><b>Nodes:</b> {groups[key]}"
+        internal = edges.get((key, key))
+        if internal:
+            text += "<br><b>Internal relationships:</b><br>" + "<br>".join(
+                f"{rel_type}: {count}" for rel_type, count in sorted(internal.items()))
+        hover_text.append(text)
+    
+    # Supernode area grows with the number of nodes it stands for
+    traces.append(go.Scatter(
+        x=[pos[key][0] for key in nodes],
+        y=[pos[key][1] for key in nodes],
+        mode='markers+text',
+        text=[f"{group_name(key)} ({groups[key]})" for key in nodes],
+        textposition='bottom center',
+        marker=dict(
+            size=[20 + 60 * math.sqrt(groups[key] / largest) for key in nodes],
+            color=[colors.get(key, '#cccccc') for key in nodes],
+            line=dict(width=2, color='white')
+        ),
+        customdata=[drill_urls.get(key) or '' for key in nodes],
+        hoverinfo='text', hovertext=hover_text,
+        hovertemplate='%{hovertext}<extra></extra>',
+        showlegend=False
+    ))
+    
+    fig = go.Figure(
+        data=traces,
+        layout=go.Layout(
+            showlegend=False,
+            hovermode='closest',
+            margin=dict(b=0, l=0, r=0, t=0),
+            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+            height=700,
+            plot_bgcolor='white',
+            autosize=True,
+            dragmode='pan'
+        )
+    )
+    fig.update_xaxes(range=[-1.4, 1.4], scaleanchor="y", scaleratio=1)
+    fig.update_yaxes(range=[-1.4, 1.4])
+    return fig
@@ -0,0 +1,1130 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import warnings
+import networkx as nx
+import numpy as np
+import plotly.graph_objects as go
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import IntegrityError, connection, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from neo4j.exceptions import ServiceUnavailable
+from .analytics import cached_result, enqueue, parse_params, run_pending_jobs
+from .bulk_import import get_batch_size, import_nodes, import_relationships
+from .export import encode_stream
+from .filters import (FilterError, add_property_index, apply_filter, cypher_where, generated_columns,
+                      indexed_column, parse_filter)
+from .graph_index import build_index, graph_index_cache, refresh_index
+from .layout import compute_layout, get_layout
+from .models import (AnalyticsResult, AsyncNeo4jDriverRegistry, GraphChange, GraphLayout, GraphNode,
+                     GraphRelationship, GraphVersion, Neo4jConnection, Neo4jDriverRegistry, Neo4jHealthMonitor,
+                     Neo4jOutbox, SyncCheckpoint, KEY_PROPERTY, NODE_KEY_LABEL)
+from .middleware import NEO4J_LOG_COOKIE, Neo4jLoggerMiddleware
+from .neighbourhood import ego_graph, expand_sqlite
+from .outbox import (delete_node_payload, delete_node_statement, delete_relationship_payload,
+                     delete_relationship_statement, node_statement, process_batch, relationship_statement)
+from .reconcile import CHECKPOINT, diff_rows, replay_changes
+from .search import autocomplete, match_expression, search_nodes
+from .snapshots import DEMO_NODES, DEMO_RELATIONSHIPS, demo_graph, load_graph
+from .summary import OTHER_GROUP, summarize_nodes, summarize_relationships
+from .views import build_edge_traces
+
+class PropertyFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Forms and CSV imports store numbers as strings
+        for name, properties in [('str30', {'age': '30', 'flag': True}), ('int31', {'age': 31, 'n': None}),
+                                 ('str4.5', {'age': '4.5'}), ('text', {'age': 'unknown'}),
+                                 ('nested', {'a': {'b': 2}, 'a__b': 1})]:
+            GraphNode.objects.create(label='Person', name=name, properties=properties)
+
+    def names(self, text):
+        return sorted(apply_filter(GraphNode.objects.all(), parse_filter(text)).values_list('name', flat=True))
+
+    def check_operators(self):
+        self.assertEqual(self.names('age = 30'), ['str30'])
+        self.assertEqual(self.names('age = 31'), ['int31'])
+        self.assertEqual(self.names('age != 30'), ['int31', 'str4.5', 'text'])
+        self.assertEqual(self.names('age > 5'), ['int31', 'str30'])
+        self.assertEqual(self.names('age >= 31'), ['int31'])
+        self.assertEqual(self.names('age < 10'), ['str4.5'])
+        self.assertEqual(self.names('age <= 30'), ['str30', 'str4.5'])
+        self.assertEqual(self.names('age in (30, 31)'), ['int31', 'str30'])
+        self.assertEqual(self.names('age in (unknown, 4.5)'), ['str4.5', 'text'])
+        self.assertEqual(self.names('age = unknown'), ['text'])
+        self.assertEqual(self.names('age exists'), ['int31', 'str30', 'str4.5', 'text'])
+        self.assertEqual(self.names('age missing'), ['nested'])
+        self.assertEqual(self.names('flag = true'), ['str30'])
+        self.assertEqual(self.names('n = null'), ['int31'])
+        self.assertEqual(self.names('a.b = 2'), ['nested'])
+        self.assertEqual(self.names('a__b = 1'), ['nested'])
+        self.assertEqual(self.names('age > 5 and age < 31'), ['str30'])
+
+    def test_operators(self):
+        self.check_operators()
+
+    def test_operators_on_generated_columns(self):
+        for path in ['age', 'flag', 'n', 'a__b', ('a', 'b')]:
+            add_property_index(GraphNode, path if isinstance(path, tuple) else (path,))
+        self.assertEqual(len(generated_columns(GraphNode._meta.db_table)), 5)
+        self.check_operators()
+
+    def test_indexed_columns_do_not_collide(self):
+        self.assertNotEqual(indexed_column(('a__b',)), indexed_column(('a', 'b')))
+        with self.assertRaises(FilterError):
+            add_property_index(GraphNode, ('a.b',))
+
+    def test_invalid_filters(self):
+        for text in ['age', 'age ~ 3', '= 3', 'age in (1', 'age > null']:
+            with self.assertRaises(FilterError):
+                parse_filter(text)
+
+    def test_cypher_compares_numbers_numerically(self):
+        clause, parameters = cypher_where(parse_filter('age >= 30; level in (1, Expert)'), 'n')
+        self.assertEqual(clause, "(toFloatOrNull(n.`age`) >= $filter0n) AND "
+                                 "(toFloatOrNull(n.`level`) IN $filter1n OR n.`level` IN $filter1)")
+        self.assertEqual(parameters, {'filter0n': 30, 'filter1n': [1], 'filter1': ['Expert']})
+
+class LayoutCacheTests(TestCase):
+    def setUp(self):
+        self.graph = nx.path_graph(10)
+
+    def layout(self, graph, version, **options):
+        return get_layout(graph, version, 'all', 'all', 'spring', **options)
+
+    def test_layout_is_reused_for_the_same_version_and_filters(self):
+        pos = self.layout(self.graph, 1)
+        with mock.patch('graphapp.layout.compute_layout') as compute:
+            self.assertEqual(self.layout(self.graph, 1), {node: tuple(xy) for node, xy in pos.items()})
+        compute.assert_not_called()
+        self.assertEqual(GraphLayout.objects.count(), 1)
+        # Other filters get their own entry
+        get_layout(self.graph, 1, 'Person', 'all', 'spring')
+        self.assertEqual(GraphLayout.objects.count(), 2)
+
+    @override_settings(GRAPH_LAYOUT_CACHE_SIZE=2)
+    def test_least_recently_used_layouts_are_evicted(self):
+        for version in (1, 2, 3):
+            self.layout(self.graph, version, refresh=True)
+        self.assertEqual(sorted(GraphLayout.objects.values_list('graph_version', flat=True)), [2, 3])
+
+# Neo4j health is read from the background monitor; keep it out of the counts
+@override_settings(ALLOWED_HOSTS=['*'])
+@mock.patch('graphapp.views.check_neo4j_connection', lambda request: None)
+class GraphListQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        nodes = GraphNode.objects.bulk_create(
+            GraphNode(label=f"Label{i % 3}", name=f"node{i}", properties={'i': i}) for i in range(120))
+        cls.relationships = GraphRelationship.objects.bulk_create(
+            GraphRelationship(source=nodes[i], target=nodes[i + 1], type=f"TYPE{i % 2}") for i in range(119))
+        cls.nodes = nodes
+
+    def get(self, **params):
+        response = self.client.get(reverse('graph_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    # Graph version, one keyset page per table and the two filter dropdowns,
+    # whatever the page size or position
+    def test_first_page_query_count(self):
+        self.get()
+        for page_size in (10, 100):
+            with self.assertNumQueries(5):
+                response = self.get(page_size=page_size)
+                # Relationship endpoints come from the same query
+                names = [(rel.source.name, rel.target.name) for rel in response.context['relationships']]
+            self.assertEqual(len(response.context['nodes']), page_size)
+            self.assertEqual(len(names), page_size)
+
+    def test_cursor_page_query_count(self):
+        self.get()
+        with self.assertNumQueries(5):
+            response = self.get(page_size=25, nodes_after=self.nodes[50].id, rels_before=self.relationships[80].id)
+            names = [(rel.source.name, rel.target.name) for rel in response.context['relationships']]
+        self.assertEqual(response.context['nodes'][0].id, self.nodes[51].id)
+        self.assertEqual(names[-1], ('node79', 'node80'))
+
+class QueryPlanTests(TestCase):
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' | '.join(row[3] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, index):
+        plan = self.plan(queryset)
+        self.assertIn(f"USING INDEX {index}", plan.replace('COVERING INDEX', 'INDEX'))
+        self.assertNotRegex(plan, r'\bSCAN graphapp_graph(node|relationship)\b(?! USING)')
+
+    def test_label_filter(self):
+        self.assertUsesIndex(GraphNode.objects.filter(label='Person'), 'graphnode_label_idx')
+
+    def test_relationship_type_filter(self):
+        self.assertUsesIndex(GraphRelationship.objects.filter(type='KNOWS'), 'graphrel_type_idx')
+
+    def test_neo4j_id_lookups(self):
+        self.assertUsesIndex(GraphNode.objects.filter(node_id=42), 'graphnode_node_id_idx')
+        self.assertUsesIndex(GraphRelationship.objects.filter(relationship_id=42), 'graphrel_relationship_id_idx')
+
+    def test_neighbourhood_lookups(self):
+        self.assertUsesIndex(GraphRelationship.objects.filter(source_id__in=[1, 2], type='KNOWS'),
+                             'graphrel_source_type_idx')
+        self.assertUsesIndex(GraphRelationship.objects.filter(target_id=1), 'graphrel_target_type_idx')
+
+    # The filter dropdowns read only the index, never the table
+    def test_dropdown_values(self):
+        self.assertIn('COVERING INDEX graphnode_label_idx',
+                      self.plan(GraphNode.objects.values_list('label', flat=True).distinct()))
+        self.assertIn('COVERING INDEX graphrel_type_idx',
+                      self.plan(GraphRelationship.objects.values_list('type', flat=True).distinct()))
+
+class DriverRegistryTests(TestCase):
+    credentials = ('bolt://localhost:7687', 'neo4j', 'password')
+
+    def test_get_driver_does_no_connectivity_check(self):
+        registry = Neo4jDriverRegistry()
+        with mock.patch('graphapp.models.GraphDatabase.driver') as make_driver:
+            driver = registry.get_driver(*self.credentials)
+            self.assertIs(registry.get_driver(*self.credentials), driver)
+        make_driver.assert_called_once()
+        driver.verify_connectivity.assert_not_called()
+
+    def test_monitor_probe_checks_connectivity_without_the_registry_lock(self):
+        registry = Neo4jDriverRegistry()
+        driver = mock.Mock()
+        # A probe that held the registry lock would block other requests on this round trip
+        driver.verify_connectivity.side_effect = lambda: self.assertFalse(registry._lock.locked())
+        registry._drivers[self.credentials] = driver
+        monitor = Neo4jHealthMonitor()
+        monitor._credentials = self.credentials
+        with mock.patch('graphapp.models.driver_registry', registry):
+            self.assertTrue(monitor.probe())
+        driver.verify_connectivity.assert_called_once()
+        self.assertTrue(monitor.healthy)
+
+class AsyncDriverRegistryTests(TestCase):
+    # Under WSGI each async view runs on its own short-lived loop
+    def test_requests_on_different_loops_share_one_driver(self):
+        registry = AsyncNeo4jDriverRegistry()
+        self.addCleanup(registry.close_all)
+
+        async def request():
+            driver = registry.get_driver('bolt://localhost:7687', 'neo4j', 'password')
+            # Work handed to the registry runs on the drivers' own loop
+            return driver, await registry.run(asyncio.sleep(0, result='done'))
+
+        first, second = async_to_sync(request)(), async_to_sync(request)()
+        self.assertIs(first[0], second[0])
+        self.assertEqual(first[1], 'done')
+        self.assertEqual(len(registry._drivers), 1)
+
+@override_settings(GRAPH_API_CHUNK_SIZE=2)
+class GraphApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.nodes = GraphNode.objects.bulk_create(GraphNode(label='Person', name=f"n{i}") for i in range(5))
+
+    def names(self, lines):
+        return [json.loads(line)['name'] for line in b''.join(lines).decode().splitlines()]
+
+    def test_cursor_pages(self):
+        response = self.client.get(reverse('api_nodes'), {'limit': 3, 'fields': 'name'})
+        self.assertEqual(response.json(), {'results': [{'name': 'n0'}, {'name': 'n1'}, {'name': 'n2'}],
+                                           'next_cursor': self.nodes[2].id})
+        response = self.client.get(reverse('api_nodes'), {'limit': 3, 'cursor': self.nodes[2].id})
+        self.assertEqual([row['name'] for row in response.json()['results']], ['n3', 'n4'])
+        self.assertIsNone(response.json()['next_cursor'])
+
+    def test_invalid_parameters(self):
+        for params in ({'limit': 0}, {'limit': -1}, {'limit': 'ten'}, {'cursor': -5}, {'fields': 'name,colour'}):
+            response = self.client.get(reverse('api_nodes'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_filters_and_field_selection(self):
+        GraphNode.objects.filter(id=self.nodes[3].id).update(label='Company', properties={'size': 10})
+        rel = GraphRelationship.objects.create(source=self.nodes[0], target=self.nodes[1], type='KNOWS')
+        GraphRelationship.objects.create(source=self.nodes[1], target=self.nodes[2], type='LIKES')
+
+        response = self.client.get(reverse('api_nodes'), {'label': 'Company', 'fields': 'name,uuid'})
+        self.assertEqual(response.json()['results'], [{'name': 'n3', 'uuid': str(self.nodes[3].uuid)}])
+        response = self.client.get(reverse('api_nodes'), {'property': 'size', 'value': '10', 'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': self.nodes[3].id}])
+        response = self.client.get(reverse('api_relationships'), {'type': 'KNOWS'})
+        self.assertEqual(response.json()['results'], [{
+            'id': rel.id, 'uuid': str(rel.uuid), 'source': self.nodes[0].id, 'target': self.nodes[1].id,
+            'type': 'KNOWS', 'properties': {}, 'relationship_id': None,
+        }])
+
+    def post(self, name, body):
+        return self.client.post(reverse(name), json.dumps(body), content_type='application/json')
+
+    @mock.patch('graphapp.async_views.get_async_connection', return_value=mock.Mock(connected=False))
+    def test_create_validates_the_body(self, _):
+        for body in ({'label': 'A', 'name': 'b', 'properties': [1]},
+                     {'label': 'A', 'name': 'b', 'properties': {'address': {'city': 'Oslo'}}},
+                     {'label': 'A', 'name': 'b', 'properties': {'tags': [['x']]}},
+                     {'label': ['A'], 'name': 'b'}, {'label': 'A', 'name': 3}):
+            self.assertEqual(self.post('api_nodes', body).status_code, 400, body)
+        for body in ({'source': self.nodes[0].id, 'target': self.nodes[1].id, 'type': {'x': 1}},
+                     {'source': self.nodes[0].id, 'target': self.nodes[1].id, 'type': 'KNOWS', 'properties': 'x'}):
+            self.assertEqual(self.post('api_relationships', body).status_code, 400, body)
+        self.assertFalse(Neo4jOutbox.objects.exists())
+
+        response = self.post('api_nodes', {'label': 'A', 'name': 'b', 'properties': {'age': 3, 'tags': ['x', 'y']}})
+        self.assertEqual(response.status_code, 201)
+        response = self.post('api_relationships', {'source': self.nodes[0].id, 'target': self.nodes[1].id,
+                                                   'type': 'KNOWS', 'properties': None})
+        self.assertEqual(response.json()['properties'], {})
+        # Neo4j is down, so both writes wait on the outbox
+        self.assertEqual(Neo4jOutbox.objects.count(), 2)
+
+    # Under WSGI the stream must be a sync iterator, or Django buffers all of it first
+    def test_ndjson_streams_chunks_under_wsgi(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            response = self.client.get(reverse('api_nodes'), {'format': 'ndjson', 'fields': 'name',
+                                                              'cursor': self.nodes[0].id})
+            self.assertFalse(response.is_async)
+            self.assertEqual(self.names(response.streaming_content), ['n1', 'n2', 'n3', 'n4'])
+
+    async def test_ndjson_streams_chunks_under_asgi(self):
+        response = await self.async_client.get(reverse('api_nodes'), {'format': 'ndjson', 'fields': 'name'})
+        self.assertTrue(response.is_async)
+        self.assertEqual(self.names([line async for line in response.streaming_content]),
+                         ['n0', 'n1', 'n2', 'n3', 'n4'])
+
+class LoggerMiddlewareTests(TestCase):
+    def request(self, pending):
+        request = RequestFactory().get('/')
+        request.neo4j_log_pending = pending
+        return request
+
+    def test_async_chain_is_not_adapted(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = Neo4jLoggerMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(self.request(True))
+        self.assertEqual(response.cookies[NEO4J_LOG_COOKIE].value, '1')
+        self.assertNotIn(NEO4J_LOG_COOKIE, async_to_sync(middleware)(self.request(False)).cookies)
+
+    def test_sync_chain(self):
+        middleware = Neo4jLoggerMiddleware(lambda request: HttpResponse())
+        self.assertFalse(iscoroutinefunction(middleware))
+        self.assertEqual(middleware(self.request(True)).cookies[NEO4J_LOG_COOKIE].value, '1')
+
+    # Django logs each sync-only middleware it has to wrap for an async handler
+    @override_settings(DEBUG=True)
+    async def test_api_requests_are_not_adapted(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            response = await self.async_client.get(reverse('api_nodes'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([line for line in logs.output if 'Neo4jLoggerMiddleware' in line])
+
+# Stands in for Neo4jConnection, recording the statements it is given
+class RecordingConnection:
+    connected = True
+
+    def __init__(self):
+        self.queries = []
+
+    def run_transaction(self, statements):
+        self.queries += [query for query, _ in statements]
+        return [[{'i': i, 'id': i} for i in range(len(params.get('rows', [None])))] for _, params in statements]
+
+    def create_nodes_batch(self, label, rows):
+        self.queries.append(f"nodes {label}")
+        return {i: 1000 + i for i in range(len(rows))}
+
+    def create_relationships_batch(self, rel_type, rows):
+        self.queries.append(f"relationships {rel_type}")
+        return {i: 2000 + i for i in range(len(rows))}
+
+@override_settings(NEO4J_OUTBOX_MAX_ATTEMPTS=2, NEO4J_OUTBOX_RETRY_DELAY=5)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.nodes = [GraphNode.objects.create(label='Person', name=name) for name in ('a', 'b', 'c')]
+        for node in self.nodes:
+            Neo4jOutbox.enqueue(Neo4jOutbox.CREATE_NODE, node)
+
+    # Fails every transaction that includes the given node
+    def failing_connection(self, node, error=ValueError("bad property")):
+        conn = RecordingConnection()
+        run_transaction = conn.run_transaction
+
+        def fail(statements):
+            if any(params.get('key') == str(node.uuid) for _, params in statements):
+                raise error
+            return run_transaction(statements)
+
+        conn.run_transaction = fail
+        return conn
+
+    @mock.patch('graphapp.views.check_neo4j_connection')
+    def test_views_queue_writes_instead_of_calling_neo4j(self, _):
+        self.client.post(reverse('add_node'), {'label': 'Person', 'name': 'd', 'prop_key_1': 'age',
+                                               'prop_value_1': '3'})
+        node = GraphNode.objects.get(name='d')
+        self.assertEqual(node.properties, {'age': '3'})
+        self.assertTrue(Neo4jOutbox.objects.filter(operation=Neo4jOutbox.CREATE_NODE, object_id=node.id).exists())
+
+    def test_failing_entry_is_retried_alone_with_backoff(self):
+        conn = self.failing_connection(self.nodes[1])
+        self.assertEqual(process_batch(conn), 2)
+        entry = Neo4jOutbox.objects.get()
+        self.assertEqual((entry.object_id, entry.attempts, entry.failed), (self.nodes[1].id, 1, False))
+        self.assertEqual(entry.last_error, "bad property")
+        self.assertGreater(entry.next_attempt_at, timezone.now() + timedelta(seconds=4))
+        self.assertIsNotNone(GraphNode.objects.get(id=self.nodes[0].id).node_id)
+
+        # Not due yet; once it is, the delay doubles and the attempts run out
+        self.assertEqual(process_batch(conn), 0)
+        Neo4jOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_batch(conn), 0)
+        entry.refresh_from_db()
+        self.assertEqual((entry.attempts, entry.failed), (2, True))
+        self.assertGreater(entry.next_attempt_at, timezone.now() + timedelta(seconds=9))
+
+    # Losing the connection keeps the batch without using up attempts
+    def test_connection_errors_leave_the_batch_queued(self):
+        conn = self.failing_connection(self.nodes[1], ServiceUnavailable("gone"))
+        with self.assertRaises(ServiceUnavailable):
+            process_batch(conn)
+        self.assertEqual(Neo4jOutbox.objects.count(), 3)
+        self.assertFalse(Neo4jOutbox.objects.exclude(attempts=0).exists())
+
+    def test_relationship_waits_for_its_endpoints(self):
+        Neo4jOutbox.objects.all().delete()
+        rel = GraphRelationship.objects.create(source=self.nodes[0], target=self.nodes[1], type='KNOWS')
+        Neo4jOutbox.enqueue(Neo4jOutbox.CREATE_RELATIONSHIP, rel)
+        conn = RecordingConnection()
+        conn.run_transaction = lambda statements: [[] for _ in statements]
+        self.assertEqual(process_batch(conn), 0)
+        entry = Neo4jOutbox.objects.get()
+        self.assertEqual(entry.attempts, 1)
+        self.assertIn("not in Neo4j yet", entry.last_error)
+
+class LoadGraphTests(TestCase):
+    def test_offline_load_queues_a_wipe_before_the_creates(self):
+        Neo4jOutbox.objects.create(operation=Neo4jOutbox.DELETE_NODE, object_id=1, payload={'key': 'old'})
+        nodes, relationships = demo_graph()
+        self.assertFalse(load_graph(nodes, relationships, conn=None))
+
+        operations = list(Neo4jOutbox.objects.values_list('operation', flat=True))
+        self.assertEqual(operations[0], Neo4jOutbox.CLEAR_GRAPH)
+        self.assertEqual(operations.count(Neo4jOutbox.CREATE_NODE), len(nodes))
+        self.assertEqual(operations.count(Neo4jOutbox.CREATE_RELATIONSHIP), len(relationships))
+        # Entries queued against the replaced graph are dropped
+        self.assertNotIn(Neo4jOutbox.DELETE_NODE, operations)
+
+        conn = RecordingConnection()
+        self.assertEqual(process_batch(conn, batch_size=100), len(operations))
+        self.assertEqual(conn.queries[0], "MATCH (n) DETACH DELETE n")
+        self.assertFalse(GraphNode.objects.filter(node_id__isnull=True).exists())
+
+    def test_online_load_mirrors_after_sqlite(self):
+        nodes, relationships = demo_graph()
+        conn = RecordingConnection()
+        self.assertTrue(load_graph(nodes, relationships, conn))
+        self.assertEqual(conn.queries[0], "MATCH (n) DETACH DELETE n")
+        self.assertFalse(Neo4jOutbox.objects.exists())
+        self.assertFalse(GraphNode.objects.filter(node_id__isnull=True).exists())
+        self.assertFalse(GraphRelationship.objects.filter(relationship_id__isnull=True).exists())
+
+    # Neo4j is left alone when the SQLite part fails
+    def test_invalid_snapshot_changes_neither_store(self):
+        old = GraphNode.objects.create(label='Person', name='old')
+        nodes, relationships = demo_graph()
+        relationships[0][2] = 'missing'
+        conn = RecordingConnection()
+        with self.assertRaises(ValueError):
+            load_graph(nodes, relationships, conn)
+        self.assertEqual(conn.queries, [])
+        self.assertEqual(list(GraphNode.objects.all()), [old])
+
+    # A worker that applied old entries may have written Neo4j after the load's wipe
+    def test_worker_racing_a_load_queues_a_full_mirror(self):
+        node = GraphNode.objects.create(label='Person', name='old')
+        Neo4jOutbox.enqueue(Neo4jOutbox.CREATE_NODE, node)
+        conn = RecordingConnection()
+        run_transaction = conn.run_transaction
+
+        def load_meanwhile(statements):
+            results = run_transaction(statements)
+            if len(conn.queries) == 1:
+                load_graph(*demo_graph(), conn)
+            return results
+
+        with mock.patch.object(conn, 'run_transaction', side_effect=load_meanwhile):
+            process_batch(conn)
+        operations = list(Neo4jOutbox.objects.values_list('operation', flat=True))
+        self.assertEqual(operations[0], Neo4jOutbox.CLEAR_GRAPH)
+        self.assertEqual(len(operations), 1 + len(DEMO_NODES) + len(DEMO_RELATIONSHIPS))
+        self.assertFalse(GraphNode.objects.exclude(node_id=None).exists())
+
+class BulkImportTests(TestCase):
+    NODES = b'{"label": "Person", "name": "a"}\n{"label": "Person", "name": "b"}\n{"label": "", "name": "c"}\n'
+
+    def test_mirrored_rows_leave_no_outbox_entries(self):
+        stats = import_nodes(io.BytesIO(self.NODES), 'jsonl', RecordingConnection())
+        self.assertEqual((stats.imported, stats.skipped, stats.mirrored), (2, 1, 2))
+        self.assertFalse(GraphNode.objects.filter(node_id__isnull=True).exists())
+        self.assertFalse(Neo4jOutbox.objects.exists())
+
+    def test_rows_are_queued_when_neo4j_is_down(self):
+        conn = RecordingConnection()
+        conn.connected = False
+        import_nodes(io.BytesIO(self.NODES), 'jsonl', conn)
+        self.assertEqual(Neo4jOutbox.objects.filter(operation=Neo4jOutbox.CREATE_NODE).count(), 2)
+        self.assertEqual(conn.queries, [])
+
+    def test_relationships_to_unmirrored_nodes_stay_queued(self):
+        import_nodes(io.BytesIO(self.NODES), 'jsonl', None)
+        conn = RecordingConnection()
+        stats = import_relationships(io.BytesIO(b'source,target,type\na,b,KNOWS\na,x,KNOWS\n'), 'csv', conn,
+                                     match_on='name')
+        self.assertEqual((stats.imported, stats.skipped, stats.mirrored), (1, 1, 0))
+        self.assertTrue(Neo4jOutbox.objects.filter(operation=Neo4jOutbox.CREATE_RELATIONSHIP).exists())
+
+    # A row the outbox worker mirrored first must not be created twice
+    def test_batch_statements_merge_on_the_key(self):
+        query, _ = Neo4jConnection.nodes_batch_statement('Person', [{'uuid': 'k'}])
+        self.assertIn(f"MERGE (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: props.{KEY_PROPERTY}}}) ON CREATE SET", query)
+        query, _ = Neo4jConnection.relationships_batch_statement('KNOWS', [])
+        self.assertIn(f"MERGE (a)-[r:`KNOWS` {{{KEY_PROPERTY}: row.props.{KEY_PROPERTY}}}]->(b) ON CREATE SET", query)
+        self.assertNotIn('CREATE (', query)
+
+    @mock.patch('graphapp.views.check_neo4j_connection')
+    @mock.patch('graphapp.views.get_db_connection', return_value=mock.Mock(connected=False))
+    def test_malformed_upload_is_a_form_error(self, *_):
+        upload = SimpleUploadedFile('nodes.csv', b'label,name\nPerson,"' + b'x' * 200000 + b'"\n')
+        response = self.client.post(reverse('import_graph'), {'file': upload, 'kind': 'nodes'}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Import failed: Malformed CSV', [str(m) for m in response.context['messages']][0])
+        self.assertFalse(GraphNode.objects.exists())
+
+    # Neo4j is only written once the SQLite rows are committed
+    def test_sqlite_failure_writes_nothing_to_neo4j(self):
+        conn = RecordingConnection()
+        with mock.patch.object(GraphNode.objects, 'bulk_create', side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                import_nodes(io.BytesIO(self.NODES), 'jsonl', conn)
+        self.assertEqual(conn.queries, [])
+        self.assertFalse(Neo4jOutbox.objects.exists())
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            import_nodes(io.BytesIO(b'[1, 2]\n'), 'jsonl')
+        # Fields over the csv module's size limit raise csv.Error
+        with self.assertRaises(ValueError):
+            import_nodes(io.BytesIO(b'label,name\nPerson,"' + b'x' * 200000 + b'"\n'), 'csv')
+        for batch_size in (0, -5, 'ten'):
+            with self.assertRaises(ValueError):
+                get_batch_size(batch_size)
+        self.assertEqual(get_batch_size(''), get_batch_size(None))
+
+class NeighbourhoodTests(TestCase):
+    # Neo4j returns the nodes nearest first, so the cap keeps the closest hops
+    def test_neo4j_expansion_is_capped_by_hop_distance(self):
+        chain = [GraphNode.objects.create(label='Person', name=f"n{i}") for i in range(4)]
+        for source, target in zip(chain, chain[1:]):
+            GraphRelationship.objects.create(source=source, target=target, type='KNOWS')
+
+        conn = mock.Mock(connected=True)
+        conn.run_query.return_value = [{'key': str(node.uuid), 'hop': hop} for hop, node in enumerate(chain[1:], 1)]
+        result = ego_graph(chain[0], hops=3, limit=3, conn=conn)
+
+        query = conn.run_query.call_args[0][0]
+        self.assertRegex(query, r'min\(length\(p\)\) AS hop .*ORDER BY hop.* LIMIT \$limit')
+        self.assertEqual([node['name'] for node in result['nodes']], ['n0', 'n1', 'n2'])
+        self.assertTrue(result['truncated'])
+
+    # Each hop reads at most limit + 1 neighbours, however many edges a hub has
+    def test_sqlite_expansion_reads_at_most_the_cap(self):
+        hub = GraphNode.objects.create(label='Hub', name='hub')
+        leaves = GraphNode.objects.bulk_create(
+            GraphNode(label='Leaf', name=f"leaf{i}", properties={'even': i % 2 == 0}) for i in range(40))
+        GraphRelationship.objects.bulk_create(GraphRelationship(source=hub, target=leaf, type='HAS') for leaf in leaves)
+        GraphRelationship.objects.bulk_create(GraphRelationship(source=leaf, target=hub, type='BACK') for leaf in leaves)
+
+        with CaptureQueriesContext(connection) as queries:
+            hop_of, truncated = expand_sqlite(hub.id, 2, 5)
+        self.assertEqual((len(hop_of), truncated), (5, True))
+        self.assertTrue(all('LIMIT 6' in query['sql'] for query in queries.captured_queries))
+
+        hop_of, truncated = expand_sqlite(hub.id, 2, 41)
+        self.assertEqual((len(hop_of), truncated), (41, False))
+        hop_of, truncated = expand_sqlite(hub.id, 1, 41, direction='out', where=parse_filter('even = true'))
+        self.assertEqual((len(hop_of), truncated), (21, False))
+
+class AnalyticsJobTests(TestCase):
+    def setUp(self):
+        graph_index_cache.clear()
+        self.addCleanup(graph_index_cache.clear)
+        a, b = GraphNode.objects.create(label='Person', name='a'), GraphNode.objects.create(label='Person', name='b')
+        GraphRelationship.objects.create(source=a, target=b, type='KNOWS')
+        self.params = parse_params('degrees', {})
+
+    # Writes between queueing and running don't fail the job
+    def test_job_runs_on_the_current_version(self):
+        job = enqueue('degrees', self.params, GraphVersion.current())
+        GraphVersion.bump()
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalyticsResult.DONE)
+        self.assertEqual(job.graph_version, GraphVersion.current())
+        self.assertEqual(cached_result('degrees', self.params, GraphVersion.current()).pk, job.pk)
+
+    def test_jobs_left_running_are_requeued(self):
+        job = enqueue('degrees', self.params, GraphVersion.current())
+        AnalyticsResult.objects.filter(pk=job.pk).update(
+            status=AnalyticsResult.RUNNING, started_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(cached_result('degrees', self.params, job.graph_version).status, AnalyticsResult.PENDING)
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalyticsResult.DONE)
+
+    def test_recent_running_jobs_are_left_alone(self):
+        job = enqueue('degrees', self.params, GraphVersion.current())
+        AnalyticsResult.objects.filter(pk=job.pk).update(status=AnalyticsResult.RUNNING, started_at=timezone.now())
+        self.assertEqual(cached_result('degrees', self.params, job.graph_version).status, AnalyticsResult.RUNNING)
+        self.assertEqual(run_pending_jobs(), 0)
+
+class IncrementalLayoutTests(TestCase):
+    def layout(self, graph, version, **options):
+        return get_layout(graph, version, 'all', 'all', 'spring', **options)
+
+    # A small change keeps everything away from the new node where it was
+    def test_small_change_reuses_the_previous_layout(self):
+        graph = nx.path_graph(20)
+        previous = self.layout(graph, 1)
+        graph.add_edge(19, 20)
+        with mock.patch('graphapp.layout.compute_layout') as compute:
+            pos = self.layout(graph, 2)
+        compute.assert_not_called()
+        self.assertEqual(set(pos), set(graph))
+        for node in range(18):
+            self.assertTrue(np.allclose(pos[node], previous[node]))
+
+    @override_settings(GRAPH_LAYOUT_INCREMENTAL_MAX_CHANGE=0.2)
+    def test_large_change_is_laid_out_again(self):
+        self.layout(nx.path_graph(10), 1)
+        with mock.patch('graphapp.layout.compute_layout', wraps=compute_layout) as compute:
+            self.layout(nx.path_graph(15), 2)
+            self.layout(nx.path_graph(10), 3, refresh=True)
+        self.assertEqual(compute.call_count, 2)
+
+    def test_circular_layout_is_always_recomputed(self):
+        get_layout(nx.path_graph(10), 1, 'all', 'all', 'circular')
+        with mock.patch('graphapp.layout.incremental_layout') as incremental:
+            get_layout(nx.path_graph(11), 2, 'all', 'all', 'circular')
+        incremental.assert_not_called()
+
+class EdgeTraceTests(TestCase):
+    def setUp(self):
+        self.graph = nx.DiGraph()
+        for source, target, rel_type in [(1, 2, 'A'), (2, 3, 'B'), (3, 1, 'A')]:
+            self.graph.add_edge(source, target, type=rel_type, hover_text=f"{source}-{target}")
+        self.pos = {1: (0.0, 0.0), 2: (1.0, 0.0), 3: (1.0, 1.0)}
+
+    # Three traces whatever the edge count, each edge separated by a None gap
+    def test_all_edges_share_three_traces(self):
+        traces, rel_types = build_edge_traces(self.graph, self.pos)
+        lines, labels, arrows = traces
+        self.assertEqual(rel_types, {'A', 'B'})
+        self.assertEqual(list(lines.x), [0.0, 1.0, None, 1.0, 1.0, None, 1.0, 0.0, None])
+        self.assertEqual(list(lines.text), ['1-2', '1-2', None, '2-3', '2-3', None, '3-1', '3-1', None])
+        self.assertEqual(list(labels.x), [0.5, 1.0, 0.5])
+        self.assertEqual(list(labels.text), ['A', 'B', 'A'])
+        self.assertEqual(len(arrows.x), 5 * 3)
+        # Each arrowhead starts 80% of the way along its edge
+        self.assertAlmostEqual(arrows.x[0], 0.8)
+        self.assertAlmostEqual(arrows.y[5], 0.8)
+
+@mock.patch('graphapp.views.check_neo4j_connection', lambda request: None)
+class VisualizeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        nodes = GraphNode.objects.bulk_create(GraphNode(label='Person', name=f"n{i}") for i in range(4))
+        GraphRelationship.objects.bulk_create(
+            GraphRelationship(source=a, target=b, type='KNOWS') for a, b in zip(nodes, nodes[1:]))
+
+    # The traces of the figure the view drew
+    def traces(self, **params):
+        with mock.patch.object(go, 'Figure', wraps=go.Figure) as figure:
+            response = self.client.get(reverse('visualize'), dict(layout='circular', **params))
+        self.assertEqual(response.status_code, 200)
+        return response, figure.call_args.kwargs['data']
+
+    def trace_types(self, **params):
+        return {type(trace).__name__ for trace in self.traces(**params)[1]}
+
+    def test_renderer_choice(self):
+        self.assertEqual(self.trace_types(), {'Scatter'})
+        self.assertEqual(self.trace_types(renderer='webgl'), {'Scattergl'})
+        with override_settings(GRAPH_WEBGL_THRESHOLD=5):
+            self.assertEqual(self.trace_types(), {'Scattergl'})
+            self.assertEqual(self.trace_types(renderer='svg'), {'Scatter'})
+
+    def test_large_graphs_lose_labels_and_arrowheads(self):
+        response, traces = self.traces()
+        self.assertFalse(response.context['reduced_detail'])
+        self.assertEqual(len(traces), 4)
+        self.assertEqual(traces[-1].mode, 'markers+text')
+        with override_settings(GRAPH_LOD_EDGE_DETAIL_LIMIT=2, GRAPH_LOD_NODE_LABEL_LIMIT=3):
+            response, traces = self.traces()
+        self.assertTrue(response.context['reduced_detail'])
+        # Only the edge lines and the nodes are left, and names move to hover text
+        self.assertEqual(len(traces), 2)
+        self.assertEqual(traces[-1].mode, 'markers')
+
+class SummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        people = GraphNode.objects.bulk_create(
+            GraphNode(label='Person', name=f"p{i}", properties={'age': 30 if i % 2 else '30'}) for i in range(4))
+        company = GraphNode.objects.create(label='Company', name='c', properties={'age': 5})
+        skill = GraphNode.objects.create(label='Skill', name='s')
+        GraphRelationship.objects.bulk_create(
+            [GraphRelationship(source=person, target=company, type='WORKS_AT') for person in people] +
+            [GraphRelationship(source=people[0], target=people[1], type='KNOWS'),
+             GraphRelationship(source=people[0], target=skill, type='HAS_SKILL')])
+
+    def test_nodes_and_relationships_are_grouped_by_label(self):
+        groups = summarize_nodes()
+        self.assertEqual(groups, {'Person': 4, 'Company': 1, 'Skill': 1})
+        self.assertEqual(summarize_relationships(groups), {
+            ('Person', 'Company'): {'WORKS_AT': 4},
+            ('Person', 'Person'): {'KNOWS': 1},
+            ('Person', 'Skill'): {'HAS_SKILL': 1},
+        })
+        self.assertEqual(summarize_relationships(groups, rel_type='KNOWS'), {('Person', 'Person'): {'KNOWS': 1}})
+
+    # Numbers and numeric strings share a group; small groups fold into "Other"
+    @override_settings(GRAPH_SUMMARY_MAX_GROUPS=1)
+    def test_property_groups(self):
+        groups = summarize_nodes('property', 'age')
+        self.assertEqual(groups, {'30': 4, OTHER_GROUP: 2})
+        self.assertEqual(summarize_relationships(groups, 'property', 'age')[('30', OTHER_GROUP)],
+                         {'WORKS_AT': 4, 'HAS_SKILL': 1})
+
+    @mock.patch('graphapp.views.check_neo4j_connection', lambda request: None)
+    def test_large_unfiltered_graphs_open_on_the_summary(self):
+        with override_settings(GRAPH_SUMMARY_THRESHOLD=5):
+            self.assertRedirects(self.client.get(reverse('visualize')), reverse('summarize_graph'))
+            # Filters and an explicit full view still draw every node
+            for params in ({'view': 'full'}, {'node_type': 'Person'}):
+                self.assertEqual(self.client.get(reverse('visualize'), dict(layout='circular', **params)).status_code,
+                                 200)
+        self.assertEqual(self.client.get(reverse('visualize'), {'layout': 'circular'}).status_code, 200)
+
+        response = self.client.get(reverse('summarize_graph'))
+        self.assertEqual(response.context['total_nodes'], 6)
+        self.assertEqual(response.context['total_relationships'], 6)
+        person = next(node for node in response.context['supernodes'] if node['name'] == 'Person')
+        self.assertEqual(person['url'], reverse('visualize') + '?node_type=Person&relationship=all')
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a = GraphNode.objects.create(label='Person', name='a & b', properties={'age': 3})
+        cls.b = GraphNode.objects.create(label='Person', name='c', properties={'note': 'x,"y"'})
+        GraphRelationship.objects.create(source=cls.a, target=cls.b, type='KNOWS', properties={'since': 2020})
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_data'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_gzip_jsonl_round_trip(self):
+        response, body = self.export(format='jsonl', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('mrgraphy-all.jsonl.gz', response['Content-Disposition'])
+        rows = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual([(row['kind'], row['id']) for row in rows],
+                         [('node', self.a.id), ('node', self.b.id), ('relationship', rows[2]['id'])])
+        self.assertEqual(rows[1]['properties'], {'note': 'x,"y"'})
+        self.assertEqual(rows[2]['source_id'], self.a.id)
+
+    # Output larger than one block is compressed across several
+    def test_gzip_spans_blocks(self):
+        pieces = [f"{i:08d}\n" for i in range(20000)]
+        blocks = list(encode_stream(iter(pieces), compress=True, block_size=1024))
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual(gzip.decompress(b''.join(blocks)).decode(), ''.join(pieces))
+
+    def test_csv_and_graphml(self):
+        _, body = self.export(format='csv', kind='nodes')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(json.loads(rows[1]['properties']), {'note': 'x,"y"'})
+
+        _, body = self.export(format='graphml')
+        graph = nx.read_graphml(io.BytesIO(body))
+        self.assertEqual(graph.nodes[f"n{self.a.id}"]['name'], 'a & b')
+        self.assertEqual(graph.edges[f"n{self.a.id}", f"n{self.b.id}"]['type'], 'KNOWS')
+
+    def test_invalid_requests(self):
+        for params in ({'format': 'xml'}, {'kind': 'edges'}, {'format': 'csv', 'kind': 'all'}):
+            self.assertEqual(self.client.get(reverse('export_data'), params).status_code, 400, params)
+
+class StreamQueryTests(TestCase):
+    def connection(self, records):
+        conn = Neo4jConnection.__new__(Neo4jConnection)
+        conn.connected, conn._session = True, None
+        conn.driver = mock.Mock()
+        self.session = conn.driver.session.return_value
+        self.session.run.side_effect = lambda query, parameters: iter(records)
+        return conn
+
+    def test_records_are_pulled_lazily_on_a_dedicated_session(self):
+        conn = self.connection([{'n': i} for i in range(5)])
+        stream = conn.stream_query("MATCH (n) RETURN n", fetch_size=2)
+        conn.driver.session.assert_not_called()
+        self.assertEqual(next(stream), {'n': 0})
+        conn.driver.session.assert_called_once_with(fetch_size=2)
+        self.session.close.assert_not_called()
+        # Stopping early still hands the session back
+        stream.close()
+        self.session.close.assert_called_once()
+
+    @override_settings(NEO4J_FETCH_SIZE=7)
+    def test_projections_return_plain_tuples(self):
+        conn = self.connection([{'id': 1, 'label': 'Person', 'values': ['a', 3]}])
+        self.assertEqual(list(conn.stream_node_properties(('name', 'age'), label='Per`son')), [(1, 'Person', 'a', 3)])
+        query, parameters = self.session.run.call_args[0]
+        self.assertTrue(query.startswith("MATCH (n:`Per``son`)"))
+        self.assertEqual(parameters, {'keys': ['name', 'age']})
+        conn.driver.session.assert_called_once_with(fetch_size=7)
+
+        conn = self.connection([{'id': 5, 'start_id': 1, 'end_id': 2, 'type': 'KNOWS', 'values': [2020]}])
+        self.assertEqual(list(conn.stream_relationship_properties(('since',), 'KNOWS')), [(5, 1, 2, 'KNOWS', 2020)])
+
+    def test_connection_errors_reach_the_health_monitor(self):
+        conn = self.connection([])
+        self.session.run.side_effect = ServiceUnavailable("gone")
+        with mock.patch('graphapp.models.health_monitor') as monitor:
+            with self.assertRaises(ServiceUnavailable):
+                list(conn.stream_query("RETURN 1"))
+        monitor.record_failure.assert_called_once()
+        self.session.close.assert_called_once()
+
+        conn.connected = False
+        self.assertEqual(list(conn.stream_query("RETURN 1")), [])
+
+class StableKeyTests(TestCase):
+    def setUp(self):
+        self.source = GraphNode.objects.create(label='Per`son', name='a', properties={'age': 3})
+        self.target = GraphNode.objects.create(label='Person', name='b')
+        self.rel = GraphRelationship.objects.create(source=self.source, target=self.target, type='KNOWS')
+
+    def test_rows_get_distinct_keys(self):
+        self.assertNotEqual(self.source.uuid, self.target.uuid)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            GraphNode.objects.create(label='Person', name='c', uuid=self.source.uuid)
+
+    # Creates MERGE on the key, so replaying an entry never duplicates it
+    def test_create_statements_merge_on_the_key(self):
+        query, params = node_statement(self.source)
+        self.assertTrue(query.startswith(f"MERGE (n:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $key}}) "
+                                         f"ON CREATE SET n:`Per``son`"))
+        self.assertEqual(params, {'key': str(self.source.uuid), 'props': {'age': 3, 'name': 'a'}})
+
+        query, params = relationship_statement(self.rel)
+        self.assertIn(f"MATCH (a:{NODE_KEY_LABEL} {{{KEY_PROPERTY}: $a_key}})", query)
+        self.assertIn(f"MERGE (a)-[r:`KNOWS` {{{KEY_PROPERTY}: $key}}]->(b)", query)
+        self.assertEqual((params['a_key'], params['b_key'], params['key']),
+                         (str(self.source.uuid), str(self.target.uuid), str(self.rel.uuid)))
+
+    def test_deletes_use_the_key_and_fall_back_to_the_neo4j_id(self):
+        query, params = delete_node_statement(delete_node_payload(self.source))
+        self.assertIn(f"{{{KEY_PROPERTY}: $key}}) DETACH DELETE n", query)
+        self.assertEqual(params, {'key': str(self.source.uuid)})
+        query, params = delete_relationship_statement(delete_relationship_payload(self.rel))
+        self.assertEqual(params, {'key': str(self.rel.uuid), 'source_key': str(self.source.uuid)})
+
+        # Entries queued before keys existed only have the Neo4j id
+        self.assertEqual(delete_node_statement({'node_id': '7'}),
+                         ("MATCH (n) WHERE id(n) = $id DETACH DELETE n", {'id': 7}))
+        self.assertEqual(delete_relationship_statement({'relationship_id': '8'})[1], {'id': 8})
+        self.assertIsNone(delete_node_statement({}))
+
+    def test_schema_bootstrap_creates_the_key_constraint(self):
+        conn = Neo4jConnection.__new__(Neo4jConnection)
+        conn.connected = True
+        conn.run_query = mock.Mock()
+        self.assertTrue(conn.ensure_schema(['KNOWS']))
+        constraint, index = [call.args[0] for call in conn.run_query.call_args_list]
+        self.assertIn(f"FOR (n:{NODE_KEY_LABEL}) REQUIRE n.{KEY_PROPERTY} IS UNIQUE", constraint)
+        self.assertIn(f"FOR ()-[r:`KNOWS`]-() ON (r.{KEY_PROPERTY})", index)
+
+@mock.patch('graphapp.views.check_neo4j_connection', lambda request: None)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        GraphNode.objects.create(label='Person', name='a')
+        GraphVersion.bump()
+
+    def test_unchanged_page_is_a_304(self):
+        response = self.client.get(reverse('graph_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        # Only the version row is read; no graph query runs
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('graph_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Other query parameters and other pages have their own tags
+        self.assertNotEqual(self.client.get(reverse('graph_list'), {'page_size': 10})['ETag'], etag)
+        self.assertEqual(self.client.get(reverse('summarize_graph'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_writes_and_session_state_change_the_tag(self):
+        etag = self.client.get(reverse('graph_list'))['ETag']
+        GraphVersion.bump()
+        response = self.client.get(reverse('graph_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        session = self.client.session
+        session['demo_mode'] = True
+        session.save()
+        self.assertEqual(self.client.get(reverse('graph_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    # Flash messages are rendered once, so a page carrying them is never a 304
+    def test_pending_messages_skip_the_validators(self):
+        etag = self.client.get(reverse('graph_list'))['ETag']
+        with mock.patch('graphapp.views.messages.get_messages', return_value=['queued']):
+            response = self.client.get(reverse('graph_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+class Neo4jLogTests(TestCase):
+    def test_operations_are_queued_in_the_session_and_flagged(self):
+        conn = Neo4jConnection.__new__(Neo4jConnection)
+        conn.connected = True
+        request = RequestFactory().get('/')
+        request.session = {'neo4j_log': [{'operation': 'old'}] * 50}
+        self.assertTrue(conn.log_operation(request, "Created node"))
+        self.assertTrue(request.neo4j_log_pending)
+        self.assertEqual(len(request.session['neo4j_log']), 50)
+        self.assertEqual(request.session['neo4j_log'][-1]['operation'], "Created node")
+
+        # Streamed bodies pass through untouched; only the cookie is added
+        response = Neo4jLoggerMiddleware(lambda request: StreamingHttpResponse(iter([b'a', b'b'])))(request)
+        self.assertEqual(b''.join(response.streaming_content), b'ab')
+        self.assertEqual(response.cookies[NEO4J_LOG_COOKIE].value, '1')
+
+    def test_poll_endpoint_drains_the_log(self):
+        session = self.client.session
+        session['neo4j_log'] = [{'operation': 'Created node', 'timestamp': 't'}]
+        session.save()
+        self.client.cookies[NEO4J_LOG_COOKIE] = '1'
+
+        response = self.client.get(reverse('neo4j_log'))
+        self.assertEqual(response.json(), {'operations': [{'operation': 'Created node', 'timestamp': 't'}]})
+        self.assertEqual(response.cookies[NEO4J_LOG_COOKIE]['max-age'], 0)
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('neo4j_log')).json(), {'operations': []})
+
+    # Sessions written before the log became a list hold one JSON string
+    def test_legacy_single_entry(self):
+        session = self.client.session
+        session['neo4j_log'] = json.dumps({'operation': 'Query executed'})
+        session.save()
+        self.assertEqual(self.client.get(reverse('neo4j_log')).json(), {'operations': [{'operation': 'Query executed'}]})
+
+# Answers MERGE statements with (key, id) records, like the repair statements return
+class KeyedConnection:
+    connected = True
+
+    def __init__(self):
+        self.statements = []
+
+    def run_transaction(self, statements):
+        self.statements += statements
+        return [[{'key': row['key'], 'id': 500 + i} for i, row in enumerate(params.get('rows', []))
+                 if 'props' in row] for _, params in statements]
+
+class ReconcileTests(TestCase):
+    def test_diff_rows(self):
+        sqlite_rows = [('a', 'x', '1', None), ('b', 'x', '2', None), ('c', 'x', None, None), ('d', 'x', '4', None)]
+        neo4j_rows = [('b', 'y', '2', None), ('c', 'x', '3', None), ('d', 'x', '4', None), ('e', 'x', '5', None)]
+        differences = [(key, left is not None, right is not None)
+                       for key, left, right in diff_rows(iter(sqlite_rows), iter(neo4j_rows))]
+        # a only in SQLite, b differs, c lacks its Neo4j id, d matches, e only in Neo4j
+        self.assertEqual(differences, [('a', True, False), ('b', True, True), ('c', True, True), ('e', False, True)])
+        self.assertEqual(list(diff_rows(iter([]), iter([]))), [])
+
+    def test_triggers_log_every_change(self):
+        source = GraphNode.objects.create(label='Person', name='a')
+        target = GraphNode.objects.create(label='Person', name='b')
+        rel = GraphRelationship.objects.create(source=source, target=target, type='KNOWS')
+        GraphNode.objects.filter(pk=target.pk).update(name='c')
+        GraphNode.objects.filter(pk=target.pk).update(node_id='9')
+        rel_key = rel.uuid
+        rel.delete()
+
+        changes = list(GraphChange.objects.order_by('id').values_list('kind', 'operation', 'key', 'source_key'))
+        self.assertEqual(changes, [
+            (GraphChange.NODE, GraphChange.UPSERT, source.uuid, None),
+            (GraphChange.NODE, GraphChange.UPSERT, target.uuid, None),
+            (GraphChange.RELATIONSHIP, GraphChange.UPSERT, rel_key, None),
+            (GraphChange.NODE, GraphChange.UPSERT, target.uuid, None),
+            (GraphChange.RELATIONSHIP, GraphChange.DELETE, rel_key, source.uuid),
+        ])
+
+    def test_replay_moves_the_checkpoint_after_each_batch(self):
+        source = GraphNode.objects.create(label='Person', name='a')
+        target = GraphNode.objects.create(label='Person', name='b')
+        rel = GraphRelationship.objects.create(source=source, target=target, type='KNOWS')
+        gone = GraphNode.objects.create(label='Person', name='gone')
+        gone_key = str(gone.uuid)
+        gone.delete()
+        last = GraphChange.objects.latest('id').id
+
+        conn = KeyedConnection()
+        stats = replay_changes(conn, batch_size=2)
+        self.assertEqual(stats.changes, 5)
+        self.assertEqual(SyncCheckpoint.get(CHECKPOINT).position, last)
+        self.assertEqual(set(GraphNode.objects.values_list('node_id', flat=True)), {'500', '501'})
+        self.assertTrue(GraphRelationship.objects.get(pk=rel.pk).relationship_id)
+        # The node's insert and delete land in different batches; both replay as its current state
+        deletes = [params['keys'] for query, params in conn.statements if 'DETACH DELETE' in query]
+        self.assertEqual(deletes, [[gone_key], [gone_key]])
+
+        # Nothing new to replay, and storing Neo4j ids logged no changes
+        conn = KeyedConnection()
+        self.assertEqual(replay_changes(conn).changes, 0)
+        self.assertEqual(conn.statements, [])
+
+    def test_failed_and_dry_runs_keep_the_checkpoint(self):
+        GraphNode.objects.create(label='Person', name='a')
+        conn = KeyedConnection()
+        conn.run_transaction = mock.Mock(side_effect=ServiceUnavailable('down'))
+        with self.assertRaises(ServiceUnavailable):
+            replay_changes(conn)
+        self.assertEqual(SyncCheckpoint.get(CHECKPOINT).position, 0)
+
+        conn = KeyedConnection()
+        self.assertEqual(replay_changes(conn, dry_run=True).nodes_upserted, 1)
+        self.assertEqual(conn.statements, [])
+        self.assertEqual(SyncCheckpoint.get(CHECKPOINT).position, 0)
+
+class GraphIndexRefreshTests(TestCase):
+    def setUp(self):
+        self.nodes = [GraphNode.objects.create(label='Person', name=str(i)) for i in range(5)]
+        self.rels = [GraphRelationship.objects.create(source=self.nodes[i], target=self.nodes[i + 1], type='KNOWS')
+                     for i in range(4)]
+
+    # Edges as (id, source pk, target pk, type name), independent of type codes
+    def edge_set(self, index):
+        sources, targets, codes, edge_ids = index.edges()
+        return set(zip(edge_ids.tolist(), index.node_ids[sources].tolist(), index.node_ids[targets].tolist(),
+                       [index.types[code] for code in codes]))
+
+    def assertSameIndex(self, refreshed, built):
+        self.assertEqual(refreshed.version, built.version)
+        self.assertEqual(refreshed.change_position, built.change_position)
+        self.assertEqual(refreshed.node_ids.tolist(), built.node_ids.tolist())
+        self.assertEqual(self.edge_set(refreshed), self.edge_set(built))
+        self.assertEqual(refreshed.out_degrees().tolist(), built.out_degrees().tolist())
+        self.assertEqual(refreshed.in_degrees().tolist(), built.in_degrees().tolist())
+        for position in range(built.num_nodes):
+            self.assertEqual(sorted(refreshed.neighbors([position]).tolist()),
+                             sorted(built.neighbors([position]).tolist()))
+
+    def test_refresh_matches_a_rebuild_after_edits(self):
+        index = build_index()
+        added = GraphNode.objects.create(label='Person', name='new')
+        GraphRelationship.objects.create(source=added, target=self.nodes[0], type='LIKES')
+        GraphRelationship.objects.filter(pk=self.rels[0].pk).update(type='LIKES', target=added)
+        self.nodes[2].delete()
+        GraphNode.objects.filter(pk=self.nodes[4].pk).update(name='renamed')
+        GraphVersion.bump()
+
+        refreshed = refresh_index(index)
+        self.assertIsNotNone(refreshed)
+        self.assertSameIndex(refreshed, build_index())
+        self.assertEqual(refreshed.neighbors([refreshed.position(added.pk)], ['LIKES'], 'out').tolist(),
+                         [refreshed.position(self.nodes[0].pk)])
+
+    def test_version_bump_without_changes_keeps_the_arrays(self):
+        index = build_index()
+        GraphVersion.bump()
+        refreshed = refresh_index(index)
+        self.assertIs(refreshed.out_indices, index.out_indices)
+        self.assertEqual(refreshed.version, GraphVersion.current())
+
+    def test_pruned_log_needs_a_rebuild(self):
+        index = build_index()
+        GraphNode.objects.create(label='Person', name='new')
+        GraphNode.objects.create(label='Person', name='newer')
+        GraphChange.objects.filter(id=index.change_position + 1).delete()
+        self.assertIsNone(refresh_index(index))
+
+    @override_settings(GRAPH_INDEX_MAX_CHANGE_RATIO=0)
+    def test_large_change_sets_need_a_rebuild(self):
+        index = build_index()
+        GraphNode.objects.bulk_create([GraphNode(label='Person', name=str(i)) for i in range(1001)])
+        self.assertIsNone(refresh_index(index))
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.ada = GraphNode.objects.create(label='Person', name='Ada Lovelace', properties={'field': 'mathematics'})
+        self.alan = GraphNode.objects.create(label='Person', name='Alan Turing', properties={'field': 'computing'})
+        self.engine = GraphNode.objects.create(label='Machine', name='Analytical Engine')
+
+    def names(self, query, **kwargs):
+        return [result['name'] for result in search_nodes(query, **kwargs)[0]]
+
+    def test_names_labels_and_properties_are_indexed(self):
+        self.assertEqual(self.names('lovelace'), ['Ada Lovelace'])
+        self.assertEqual(self.names('machine'), ['Analytical Engine'])
+        self.assertEqual(self.names('computing'), ['Alan Turing'])
+        self.assertEqual(self.names('an', prefix=True, label='Machine'), ['Analytical Engine'])
+        self.assertEqual([result['name'] for result in autocomplete('al')], ['Alan Turing'])
+
+    # The 0011 triggers keep the index current through updates and deletes
+    def test_renames_and_deletes_update_the_index(self):
+        GraphNode.objects.filter(pk=self.ada.pk).update(name='Augusta King', properties={'field': 'poetry'})
+        self.assertEqual(self.names('lovelace'), [])
+        self.assertEqual(self.names('mathematics'), [])
+        self.assertEqual(self.names('augusta'), ['Augusta King'])
+        self.assertEqual(self.names('poetry'), ['Augusta King'])
+
+        self.alan.delete()
+        self.assertEqual(self.names('turing'), [])
+        GraphNode.objects.filter(label='Machine').delete()
+        self.assertEqual(self.names('engine'), [])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT rowid FROM graphapp_nodesearch")
+            self.assertEqual([row[0] for row in cursor.fetchall()], [self.ada.pk])
+
+    def test_user_operators_are_searched_for(self):
+        self.assertEqual(match_expression('name: ada OR "x'), '"name" "ada" "OR" "x"')
+        self.assertEqual(self.names('ada NEAR lovelace'), [])
+        self.assertEqual(search_nodes('!!'), ([], False))
+
+    def test_paging_and_highlights(self):
+        results, has_next = search_nodes('person', page_size=1)
+        self.assertTrue(has_next)
+        self.assertEqual(search_nodes('person', page=2, page_size=1)[1], False)
+        self.assertEqual(search_nodes('lovelace')[0][0]['highlight'], 'Ada <mark>Lovelace</mark>')
+
+        response = self.client.get(reverse('api_search'), {'q': 'ada', 'limit': 'x'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api_search'), {'q': 'ada', 'limit': 5})
+        self.assertEqual(response.json()['results'][0]['uuid'], str(self.ada.uuid))
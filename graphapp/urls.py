@@ -1,14 +1,28 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('add-node/', views.add_node, name='add_node'),
     path('add-relationship/', views.add_relationship, name='add_relationship'),
+    path('import/', views.import_graph, name='import_graph'),
+    path('export/', views.export_data, name='export_data'),
     path('graph-list/', views.graph_list, name='graph_list'),
     path('visualize/', views.visualize_graph, name='visualize'),
+    path('visualize/summary/', views.summarize_graph, name='summarize_graph'),
+    path('visualize/neighbourhood/', views.neighbourhood, name='neighbourhood'),
+    path('analytics/jobs/<int:job_id>/', views.analytics_job, name='analytics_job'),
+    path('analytics/<slug:algorithm>/', views.graph_analytics, name='graph_analytics'),
     path('delete-node/<int:node_id>/', views.delete_node, name='delete_node'),
     path('delete-relationship/<int:relationship_id>/', views.delete_relationship, name='delete_relationship'),
     path('toggle-demo-mode/', views.toggle_demo_mode, name='toggle_demo_mode'),
+    path('search/', views.search, name='search'),
+    path('api/search/', views.api_search, name='api_search'),
+    path('api/search/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
+    path('api/nodes/', async_views.api_nodes, name='api_nodes'),
+    path('api/nodes/<uuid:key>/', async_views.api_node_detail, name='api_node_detail'),
+    path('api/relationships/', async_views.api_relationships, name='api_relationships'),
+    path('api/relationships/<uuid:key>/', async_views.api_relationship_detail, name='api_relationship_detail'),
     path('reset-neo4j-status/', views.reset_neo4j_status, name='reset_neo4j_status'),
+    path('neo4j-log/', views.neo4j_log, name='neo4j_log'),
 ] 
\ No newline at end of file
@@ -1,18 +1,38 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_GET
+from django.utils.cache import patch_cache_control
 from django.contrib import messages
-from .models import Neo4jConnection, GraphNode, GraphRelationship
+from django.db import transaction
+from django.urls import reverse
+from urllib.parse import urlencode
+from functools import wraps
+from .models import (Neo4jConnection, AnalyticsResult, GraphNode, GraphRelationship, GraphSnapshot, GraphVersion,
+                     Neo4jOutbox, health_monitor)
+from .filters import FilterError, apply_filter, filter_key, parse_filter
+from .analytics import ALGORITHMS, AnalyticsError, cached_result, compute, enqueue, parse_params, runs_in_background
+from .layout import get_layout
+from .neighbourhood import ego_graph
+from .search import autocomplete, search_nodes
+from .export import CONTENT_TYPES, export_filename, export_graph
+from .summary import OTHER_GROUP, build_summary_figure, group_name, property_text, summarize_nodes, summarize_relationships
+from .outbox import backlog_stats, delete_node_payload, delete_relationship_payload
+from .middleware import NEO4J_LOG_COOKIE
+from .snapshots import demo_graph, load_graph, restore_snapshot, save_snapshot
+from .bulk_import import detect_format, get_batch_size, import_nodes, import_relationships
+import hashlib
 import json
 import networkx as nx
 import plotly.graph_objects as go
 import os
 import random
+import uuid
 import colorsys
 import numpy as np
 
-# Connect to Neo4j database
-def get_db_connection():
+# Resolve Neo4j connection settings
+def get_neo4j_credentials():
     uri = os.environ.get('NEO4J_URI', 'bolt://localhost:7687')
     user = os.environ.get('NEO4J_USER', 'neo4j')
     password = os.environ.get('NEO4J_PASSWORD', 'password')
@@ -24,18 +44,28 @@ def get_db_connection():
         user = settings.NEO4J_USER
     if hasattr(settings, 'NEO4J_PASSWORD'):
         password = settings.NEO4J_PASSWORD
-        
-    connection = Neo4jConnection(uri, user, password)
+    
+    return uri, user, password
+
+# Connect to Neo4j database (borrows a session from the shared, pooled driver)
+def get_db_connection():
+    connection = Neo4jConnection(*get_neo4j_credentials())
     return connection
 
 # Helper function to check Neo4j connection and set warning
 def check_neo4j_connection(request):
-    # Only check if we haven't already set the status
+    # Read the cached health state; the background monitor does the probing
+    health_monitor.start(*get_neo4j_credentials())
+    is_connected = health_monitor.status()
+    if is_connected is None:
+        # First probe has not finished yet, check again on the next request
+        return
+    
+    # Only update the session when the status actually changes
     if request.session.get('neo4j_connected') is None:
-        conn = get_db_connection()
-        if not conn.connected:
+        if not is_connected:
             # Set failure status in session
-            timestamp = conn.track_failure(
+            timestamp = Neo4jConnection.track_failure(
                 request, 
                 "Initial connection", 
                 "Neo4j database is not available. Data will only be stored locally."
@@ -45,7 +75,46 @@ def check_neo4j_connection(request):
             if 'neo4j_failure' in request.session:
                 del request.session['neo4j_failure']
             request.session['neo4j_connected'] = True
-        conn.close()
+
+# Conditional GET support for the read pages. The validators come from the
+# graph version plus everything else the page depends on, so an unchanged
+# page is answered with 304 before any graph query or layout work.
+def graph_page_state(request):
+    if not hasattr(request, '_graph_page_state'):
+        check_neo4j_connection(request)
+        # Flash messages are one-off content that must be rendered
+        pending = len(messages.get_messages(request))
+        request._graph_page_state = None if pending else GraphVersion.state()
+    return request._graph_page_state
+
+def graph_page_etag(request, *args, **kwargs):
+    state = graph_page_state(request)
+    if state is None:
+        return None
+    parts = [
+        request.path,
+        state.version,
+        sorted(request.GET.lists()),
+        request.session.get('demo_mode', False),
+        request.session.get('neo4j_connected'),
+        request.session.get('neo4j_failure'),
+    ]
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+def graph_page_last_modified(request, *args, **kwargs):
+    state = graph_page_state(request)
+    return state.updated_at if state is not None else None
+
+# Browsers keep the page but revalidate it on every load
+def graph_page_cache(view):
+    conditional_view = condition(etag_func=graph_page_etag, last_modified_func=graph_page_last_modified)(view)
+    
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
 
 def index(request):
     check_neo4j_connection(request)
@@ -67,32 +136,15 @@ def add_node(request):
                 if prop_key and prop_value:
                     properties[prop_key] = prop_value
         
-        # Create in Django model
-        node = GraphNode.objects.create(
-            label=label,
-            name=name,
-            properties=properties
-        )
-        
-        # Create in Neo4j
-        try:
-            conn = get_db_connection()
-            properties['name'] = name
-            result = conn.create_node(label, properties, request)
-            if result and result[0]['n'] is not None:
-                node_id = result[0]['n'].id
-                node.node_id = str(node_id)
-                node.save()
-            else:
-                conn.track_failure(request, f"Node creation failed: {label} {name}", 
-                               "Neo4j operation completed but node not created properly")
-            conn.close()
-        except Exception as e:
-            error_msg = f"Error creating Neo4j node: {e}"
-            print(error_msg)
-            conn = get_db_connection()
-            conn.track_failure(request, f"Node creation failed: {label} {name}", error_msg)
-            conn.close()
+        # Create in Django model and queue the Neo4j mirror in the same transaction
+        with transaction.atomic():
+            node = GraphNode.objects.create(
+                label=label,
+                name=name,
+                properties=properties
+            )
+            Neo4jOutbox.enqueue(Neo4jOutbox.CREATE_NODE, node)
+            GraphVersion.bump()
         
         return redirect('graph_list')
     
@@ -102,22 +154,12 @@ def delete_node(request, node_id):
     check_neo4j_connection(request)
     node = get_object_or_404(GraphNode, id=node_id)
     
-    # Delete from Neo4j
-    try:
-        if node.node_id:
-            conn = get_db_connection()
-            result = conn.delete_node(int(node.node_id), request)
-            conn.close()
-    except Exception as e:
-        error_msg = f"Error deleting Neo4j node: {e}"
-        print(error_msg)
-        conn = get_db_connection()
-        conn.track_failure(request, f"Node deletion failed: {node.label} {node.name}", error_msg)
-        conn.close()
-    
-    # Delete from Django
+    # Delete from Django and queue the Neo4j delete (relationships go with the node)
     node_name = node.name
-    node.delete()
+    with transaction.atomic():
+        Neo4jOutbox.enqueue(Neo4jOutbox.DELETE_NODE, node, **delete_node_payload(node))
+        node.delete()
+        GraphVersion.bump()
     
     messages.success(request, f"Node '{node_name}' was successfully deleted along with its relationships.")
     return redirect('graph_list')
@@ -126,22 +168,12 @@ def delete_relationship(request, relationship_id):
     check_neo4j_connection(request)
     rel = get_object_or_404(GraphRelationship, id=relationship_id)
     
-    # Delete from Neo4j
-    try:
-        if rel.relationship_id:
-            conn = get_db_connection()
-            result = conn.delete_relationship(int(rel.relationship_id), request)
-            conn.close()
-    except Exception as e:
-        error_msg = f"Error deleting Neo4j relationship: {e}"
-        print(error_msg)
-        conn = get_db_connection()
-        conn.track_failure(request, f"Relationship deletion failed: {rel.type}", error_msg)
-        conn.close()
-    
-    # Delete from Django
+    # Delete from Django and queue the Neo4j delete
     rel_info = str(rel)
-    rel.delete()
+    with transaction.atomic():
+        Neo4jOutbox.enqueue(Neo4jOutbox.DELETE_RELATIONSHIP, rel, **delete_relationship_payload(rel))
+        rel.delete()
+        GraphVersion.bump()
     
     messages.success(request, f"Relationship '{rel_info}' was successfully deleted.")
     return redirect('graph_list')
@@ -163,59 +195,114 @@ def add_relationship(request):
                 if prop_key and prop_value:
                     properties[prop_key] = prop_value
         
-        # Create in Django model
+        # Create in Django model and queue the Neo4j mirror in the same transaction
         source = GraphNode.objects.get(id=source_id)
         target = GraphNode.objects.get(id=target_id)
-        rel = GraphRelationship.objects.create(
-            source=source,
-            target=target,
-            type=rel_type,
-            properties=properties
-        )
+        with transaction.atomic():
+            rel = GraphRelationship.objects.create(
+                source=source,
+                target=target,
+                type=rel_type,
+                properties=properties
+            )
+            Neo4jOutbox.enqueue(Neo4jOutbox.CREATE_RELATIONSHIP, rel)
+            GraphVersion.bump()
+        
+        return redirect('graph_list')
+    
+    nodes = GraphNode.objects.all()
+    return render(request, 'graphapp/add_relationship.html', {'nodes': nodes})
+
+def import_graph(request):
+    check_neo4j_connection(request)
+    if request.method == 'POST' and request.FILES.get('file'):
+        upload = request.FILES['file']
+        kind = request.POST.get('kind', 'nodes')
+        batch_size = request.POST.get('batch_size') or None
+        file_format = detect_format(upload.name)
         
-        # Create in Neo4j
+        # Uploads are read straight from Django's upload file, chunk by chunk
+        conn = get_db_connection()
         try:
-            conn = get_db_connection()
-            if source.node_id and target.node_id:
-                result = conn.create_relationship(
-                    int(source.node_id), 
-                    int(target.node_id), 
-                    rel_type, 
-                    properties,
-                    request
-                )
-                if result and result[0]['r'] is not None:
-                    rel_id = result[0]['r'].id
-                    rel.relationship_id = str(rel_id)
-                    rel.save()
-                else:
-                    conn.track_failure(request, f"Relationship creation failed: {rel_type}", 
-                                   "Neo4j operation completed but relationship not created properly")
+            if kind == 'relationships':
+                stats = import_relationships(upload.file, file_format, conn, batch_size,
+                                             request.POST.get('match_on', 'id'))
             else:
-                conn.track_failure(request, f"Relationship creation failed: {rel_type}", 
-                               "Node IDs not available in Neo4j")
-            conn.close()
-        except Exception as e:
-            error_msg = f"Error creating Neo4j relationship: {e}"
-            print(error_msg)
-            conn = get_db_connection()
-            conn.track_failure(request, f"Relationship creation failed: {rel_type}", error_msg)
+                stats = import_nodes(upload.file, file_format, conn, batch_size)
+            if stats.mirrored:
+                conn.log_operation(request, f"Bulk imported {stats.mirrored} {kind}")
+            elif not conn.connected and stats.imported:
+                conn.track_failure(request, f"Bulk import of {kind}",
+                                   "Neo4j database not connected. Data imported locally and queued for Neo4j.")
+            messages.success(request, f"Import finished: {stats}")
+        except (ValueError, UnicodeDecodeError) as e:
+            messages.error(request, f"Import failed: {e}")
+        finally:
             conn.close()
         
-        return redirect('graph_list')
+        return redirect('import_graph')
     
-    nodes = GraphNode.objects.all()
-    return render(request, 'graphapp/add_relationship.html', {'nodes': nodes})
+    return render(request, 'graphapp/import.html', {'batch_size': get_batch_size()})
+
+# One keyset page of a queryset ordered by id. `after`/`before` are the id
+# cursors from the query string; returns (rows, previous cursor, next cursor).
+def keyset_page(queryset, after, before, size):
+    if before:
+        rows = list(queryset.filter(id__lt=before).order_by('-id')[:size + 1])
+        has_previous = len(rows) > size
+        rows = rows[:size][::-1]
+        has_next = True
+    else:
+        if after:
+            queryset = queryset.filter(id__gt=after)
+        rows = list(queryset.order_by('id')[:size + 1])
+        has_next = len(rows) > size
+        rows = rows[:size]
+        has_previous = bool(after)
+    previous_cursor = rows[0].id if rows and has_previous else None
+    next_cursor = rows[-1].id if rows and has_next else None
+    return rows, previous_cursor, next_cursor
+
+# Current query string with some parameters replaced (None removes them)
+def page_url(request, **params):
+    query = request.GET.copy()
+    for key, value in params.items():
+        query.pop(key, None)
+        if value is not None:
+            query[key] = value
+    return f"?{query.urlencode()}"
+
+def parse_cursor(value):
+    return int(value) if value and value.isdigit() else None
 
+# Property predicates from the `where` (nodes) and `rel_where` (relationships)
+# parameters. A filter that doesn't parse is reported and left out.
+def property_filters(request):
+    predicates = []
+    for param, kind in (('where', 'node'), ('rel_where', 'relationship')):
+        try:
+            predicates.append(parse_filter(request.GET.get(param, '')))
+        except FilterError as e:
+            messages.error(request, f"Invalid {kind} filter: {e}")
+            predicates.append([])
+    return predicates
+
+@graph_page_cache
 def graph_list(request):
     check_neo4j_connection(request)
     # Get filter values
     node_label_filter = request.GET.get('node_label', '')
     rel_type_filter = request.GET.get('rel_type', '')
+    node_where, rel_where = property_filters(request)
+    default_size = getattr(settings, 'GRAPH_LIST_PAGE_SIZE', 50)
+    page_size = parse_cursor(request.GET.get('page_size')) or default_size
+    page_size = min(page_size, getattr(settings, 'GRAPH_LIST_MAX_PAGE_SIZE', 500))
     
     # Apply filters
-    nodes = GraphNode.objects.all()
-    relationships = GraphRelationship.objects.all()
+    nodes = GraphNode.objects.only('id', 'label', 'name', 'properties')
+    relationships = GraphRelationship.objects.select_related('source', 'target').only(
+        'id', 'type', 'properties', 'source__name', 'target__name'
+    )
     
     if node_label_filter:
         nodes = nodes.filter(label=node_label_filter)
@@ -223,6 +310,18 @@ def graph_list(request):
     if rel_type_filter:
         relationships = relationships.filter(type=rel_type_filter)
     
+    nodes = apply_filter(nodes, node_where)
+    relationships = apply_filter(relationships, rel_where)
+    
+    # Each table is paged independently with an id cursor, so every page costs
+    # one query per table no matter how deep into the table it is
+    nodes, nodes_prev, nodes_next = keyset_page(
+        nodes, parse_cursor(request.GET.get('nodes_after')), parse_cursor(request.GET.get('nodes_before')), page_size
+    )
+    relationships, rels_prev, rels_next = keyset_page(
+        relationships, parse_cursor(request.GET.get('rels_after')), parse_cursor(request.GET.get('rels_before')), page_size
+    )
+    
     # Get unique node labels and relationship types for filter dropdowns
     all_node_labels = GraphNode.objects.values_list('label', flat=True).distinct()
     all_rel_types = GraphRelationship.objects.values_list('type', flat=True).distinct()
@@ -232,13 +331,42 @@ def graph_list(request):
         'relationships': relationships,
         'node_label_filter': node_label_filter,
         'rel_type_filter': rel_type_filter,
+        'node_where': request.GET.get('where', ''),
+        'rel_where': request.GET.get('rel_where', ''),
         'all_node_labels': all_node_labels,
         'all_rel_types': all_rel_types,
+        'page_size': page_size,
+        'page_sizes': sorted({25, 50, 100, 200, default_size, page_size}),
+        'nodes_prev_url': page_url(request, nodes_before=nodes_prev, nodes_after=None) if nodes_prev else None,
+        'nodes_next_url': page_url(request, nodes_after=nodes_next, nodes_before=None) if nodes_next else None,
+        'rels_prev_url': page_url(request, rels_before=rels_prev, rels_after=None) if rels_prev else None,
+        'rels_next_url': page_url(request, rels_after=rels_next, rels_before=None) if rels_next else None,
         'is_demo_mode': request.session.get('demo_mode', False)
     }
     
+    # Only needed for the hint shown when there are no relationships yet
+    if not relationships:
+        context['has_enough_nodes'] = len(GraphNode.objects.values_list('id', flat=True)[:2]) >= 2
+    
     return render(request, 'graphapp/graph_list.html', context)
 
+@require_GET
+def export_data(request):
+    file_format = request.GET.get('format', 'jsonl')
+    kind = request.GET.get('kind', 'all')
+    compress = request.GET.get('gzip') == '1'
+    try:
+        chunks = export_graph(file_format, kind, compress)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # Bytes start flowing as soon as the first block is ready
+    response = StreamingHttpResponse(
+        chunks, content_type='application/gzip' if compress else CONTENT_TYPES[file_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(file_format, kind, compress)}"'
+    return response
+
 def toggle_demo_mode(request):
     check_neo4j_connection(request)
     # Check the current state
@@ -250,122 +378,57 @@ def toggle_demo_mode(request):
     # Toggle the state
     request.session['demo_mode'] = not is_demo_mode
     
-    if not is_demo_mode:  # Turning demo mode ON
-        # Backup existing data to session
-        request.session['data_backup'] = {
-            'nodes': list(GraphNode.objects.values()),
-            'relationships': list(GraphRelationship.objects.values())
-        }
-        
-        # Clear existing data
-        GraphRelationship.objects.all().delete()
-        GraphNode.objects.all().delete()
-        
-        # Try to create demo data in Neo4j, but continue if it fails
-        try:
-            conn = get_db_connection()
-            conn.get_demo_data(request)
-            conn.close()
-        except Exception as e:
-            print(f"Warning: Could not create Neo4j demo data: {e}")
-            messages.warning(request, "Demo mode activated with local data only. Neo4j connection failed.")
-        
-        # Create corresponding Django models
-        # Persons
-        alice = GraphNode.objects.create(label="Person", name="Alice", 
-                                        properties={"age": 32, "occupation": "Software Engineer"})
-        bob = GraphNode.objects.create(label="Person", name="Bob", 
-                                      properties={"age": 28, "occupation": "Data Scientist"})
-        charlie = GraphNode.objects.create(label="Person", name="Charlie", 
-                                          properties={"age": 35, "occupation": "Project Manager"})
-        
-        # Companies
-        techcorp = GraphNode.objects.create(label="Company", name="TechCorp", 
-                                           properties={"industry": "Technology", "founded": 2010})
-        datainc = GraphNode.objects.create(label="Company", name="DataInc", 
-                                         properties={"industry": "Data Analytics", "founded": 2015})
-        
-        # Skills
-        python = GraphNode.objects.create(label="Skill", name="Python", 
-                                         properties={"category": "Programming Language", "difficulty": "Intermediate"})
-        ml = GraphNode.objects.create(label="Skill", name="Machine Learning", 
-                                     properties={"category": "AI", "difficulty": "Advanced"})
-        mgmt = GraphNode.objects.create(label="Skill", name="Management", 
-                                      properties={"category": "Soft Skill", "difficulty": "Advanced"})
-        
-        # Relationships
-        GraphRelationship.objects.create(source=alice, target=techcorp, type="WORKS_AT", 
-                                        properties={"position": "Senior Developer", "since": 2018})
-        GraphRelationship.objects.create(source=bob, target=datainc, type="WORKS_AT", 
-                                        properties={"position": "Data Analyst", "since": 2019})
-        GraphRelationship.objects.create(source=charlie, target=techcorp, type="WORKS_AT", 
-                                        properties={"position": "Team Lead", "since": 2015})
-        
-        GraphRelationship.objects.create(source=alice, target=python, type="HAS_SKILL", 
-                                        properties={"level": "Expert", "years": 5})
-        GraphRelationship.objects.create(source=bob, target=python, type="HAS_SKILL", 
-                                        properties={"level": "Proficient", "years": 3})
-        GraphRelationship.objects.create(source=bob, target=ml, type="HAS_SKILL", 
-                                        properties={"level": "Advanced", "years": 2})
-        GraphRelationship.objects.create(source=charlie, target=mgmt, type="HAS_SKILL", 
-                                        properties={"level": "Expert", "years": 8})
-        
-        GraphRelationship.objects.create(source=alice, target=bob, type="KNOWS", 
-                                        properties={"since": 2017, "relationship": "Colleague"})
-        GraphRelationship.objects.create(source=bob, target=charlie, type="KNOWS", 
-                                        properties={"since": 2019, "relationship": "Manager"})
-        
-        if not request.session.get('neo4j_error', False):
-            messages.success(request, "Demo mode activated. Showing sample data.")
-    else:  # Turning demo mode OFF
-        # Clear demo data
-        GraphRelationship.objects.all().delete()
-        GraphNode.objects.all().delete()
-        
-        # Try to reset Neo4j, but continue if it fails
-        try:
-            conn = get_db_connection()
-            conn.run_query("MATCH (n) DETACH DELETE n")
-            conn.close()
-        except Exception as e:
-            print(f"Warning: Could not reset Neo4j data: {e}")
-        
-        # Restore original data if it exists
-        if 'data_backup' in request.session:
-            # Restore nodes
-            for node_data in request.session['data_backup']['nodes']:
-                node = GraphNode.objects.create(
-                    label=node_data['label'],
-                    name=node_data['name'],
-                    properties=node_data['properties'],
-                    node_id=node_data['node_id']
-                )
+    conn = get_db_connection()
+    try:
+        if not is_demo_mode:  # Turning demo mode ON
+            # Keep the current graph in a snapshot table; the session only holds its name
+            backup_name = f"demo-backup-{uuid.uuid4().hex[:12]}"
+            save_snapshot(backup_name)
+            request.session['data_backup'] = backup_name
             
-            # Restore relationships
-            for rel_data in request.session['data_backup']['relationships']:
-                source = GraphNode.objects.get(id=rel_data['source_id'])
-                target = GraphNode.objects.get(id=rel_data['target_id'])
-                GraphRelationship.objects.create(
-                    source=source,
-                    target=target,
-                    type=rel_data['type'],
-                    properties=rel_data['properties'],
-                    relationship_id=rel_data['relationship_id']
-                )
+            # Replace the graph with the demo data in both stores
+            nodes, relationships = demo_graph()
+            if load_graph(nodes, relationships, conn):
+                conn.log_operation(request, f"Created complete demo dataset ({len(nodes)} nodes, {len(relationships)} relationships)")
+            else:
+                messages.warning(request, "Demo mode activated with local data only. Neo4j connection failed.")
             
-            # Clean up session storage
-            del request.session['data_backup']
-        
-        messages.success(request, "Demo mode deactivated. Restored original data.")
+            if not request.session.get('neo4j_error', False):
+                messages.success(request, "Demo mode activated. Showing sample data.")
+        else:  # Turning demo mode OFF
+            # Restore the original data if it was backed up, otherwise just clear the demo data
+            backup_name = request.session.pop('data_backup', None)
+            snapshot = GraphSnapshot.objects.filter(name=backup_name).first() if isinstance(backup_name, str) else None
+            if snapshot is not None:
+                restore_snapshot(snapshot, conn)
+                snapshot.delete()
+            else:
+                load_graph([], [], conn)
+            
+            messages.success(request, "Demo mode deactivated. Restored original data.")
+    finally:
+        conn.close()
     
     return redirect(next_page)
 
+@graph_page_cache
 def visualize_graph(request):
     check_neo4j_connection(request)
     # Get filter parameters from request
     node_type_filter = request.GET.get('node_type', 'all')
     relationship_filter = request.GET.get('relationship', 'all')
     layout_type = request.GET.get('layout', 'kamada_kawai')
+    property_filter = request.GET.get('property', '')
+    property_value = request.GET.get('value', '')
+    node_where, rel_where = property_filters(request)
+    graph_version = GraphVersion.current()
+    
+    # Start huge unfiltered graphs on the summary view instead of drawing every node
+    is_unfiltered = (node_type_filter in ('all', '') and relationship_filter in ('all', '') and not property_filter
+                     and not node_where and not rel_where)
+    if is_unfiltered and request.GET.get('view') != 'full':
+        if GraphNode.objects.count() > getattr(settings, 'GRAPH_SUMMARY_THRESHOLD', 5000):
+            return redirect('summarize_graph')
     
     # Create a NetworkX graph
     G = nx.DiGraph()
@@ -378,10 +441,18 @@ def visualize_graph(request):
     if node_type_filter != 'all' and node_type_filter:
         nodes = nodes.filter(label=node_type_filter)
     
+    # Apply property filter (drill-down from a property supernode)
+    if property_filter:
+        nodes = nodes.annotate(property_value=property_text(f'properties__{property_filter}')).filter(property_value=property_value)
+    
     # Apply relationship filter if specified
     if relationship_filter != 'all' and relationship_filter:
         relationships = relationships.filter(type=relationship_filter)
     
+    # Property predicates are evaluated by SQLite, not on loaded rows
+    nodes = apply_filter(nodes, node_where)
+    relationships = apply_filter(relationships, rel_where)
+    
     # Get all unique node labels for coloring
     node_labels = set(node.label for node in nodes)
     
@@ -409,11 +480,11 @@ def visualize_graph(request):
     # Get source and target node IDs from the filtered relationships
     related_node_ids = set()
     for rel in relationships:
-        related_node_ids.add(rel.source.id)
-        related_node_ids.add(rel.target.id)
+        related_node_ids.add(rel.source_id)
+        related_node_ids.add(rel.target_id)
     
     # If we're filtering relationships, make sure we include the connected nodes
-    if relationship_filter != 'all' and relationship_filter:
+    if (relationship_filter != 'all' and relationship_filter) or rel_where:
         # Keep only nodes that are in relationships
         nodes_to_remove = [node_id for node_id in G.nodes() if node_id not in related_node_ids]
         for node_id in nodes_to_remove:
@@ -422,7 +493,7 @@ def visualize_graph(request):
     # Add edges with more data
     for rel in relationships:
         # Only add the edge if both source and target nodes exist in the graph
-        if G.has_node(rel.source.id) and G.has_node(rel.target.id):
+        if G.has_node(rel.source_id) and G.has_node(rel.target_id):
             # Format properties for display
             formatted_props = "<br>".join([f"<b>{k}:</b> {v}" for k, v in rel.properties.items()])
             hover_text = f"<b>Type:</b> {rel.type}"
@@ -430,8 +501,8 @@ def visualize_graph(request):
                 hover_text += f"<br><b>Properties:</b><br>{formatted_props}"
                 
             G.add_edge(
-                rel.source.id, 
-                rel.target.id, 
+                rel.source_id, 
+                rel.target_id, 
                 type=rel.type, 
                 properties=rel.properties,
                 hover_text=hover_text
@@ -447,86 +518,33 @@ def visualize_graph(request):
             'selected_layout': layout_type,
             'selected_node_type': node_type_filter,
             'selected_relationship': relationship_filter,
+            'selected_renderer': request.GET.get('renderer', 'auto'),
+            'node_where': request.GET.get('where', ''),
+            'rel_where': request.GET.get('rel_where', ''),
             'all_node_labels': GraphNode.objects.values_list('label', flat=True).distinct(),
             'all_relationship_types': GraphRelationship.objects.values_list('type', flat=True).distinct(),
             'is_demo_mode': request.session.get('demo_mode', False)
         })
     
-    # Choose layout based on parameter
-    if layout_type == 'spring':
-        pos = nx.spring_layout(G, k=0.5, iterations=50)
-    elif layout_type == 'circular':
-        pos = nx.circular_layout(G)
-    else:  # Default to kamada_kawai
-        try:
-            pos = nx.kamada_kawai_layout(G)
-        except:
-            # Fallback to spring layout if kamada_kawai fails
-            pos = nx.spring_layout(G, k=0.5, iterations=50)
-    
-    # Create edges with labels and arrows
-    edge_traces = []
-    
-    # All relationship types for legend
-    rel_types = set()
-    
-    for edge in G.edges():
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_info = G.get_edge_data(edge[0], edge[1])
-        rel_type = edge_info.get('type')
-        rel_types.add(rel_type)
-        
-        # Calculate arrow position (80% along the line)
-        arrow_pos = 0.8
-        xa = x0 * (1 - arrow_pos) + x1 * arrow_pos
-        ya = y0 * (1 - arrow_pos) + y1 * arrow_pos
-        
-        # Edge line
-        edge_trace = go.Scatter(
-            x=[x0, x1, None],
-            y=[y0, y1, None],
-            mode='lines',
-            line=dict(width=2, color='#888'),
-            hoverinfo='text',
-            text=edge_info.get('hover_text'),
-            showlegend=False,
-            hovertemplate='%{text}<extra></extra>'
-        )
-        edge_traces.append(edge_trace)
-        
-        # Edge label (positioned in the middle)
-        label_trace = go.Scatter(
-            x=[(x0 + x1) / 2],
-            y=[(y0 + y1) / 2],
-            mode='text',
-            text=[rel_type],
-            textposition='middle center',
-            textfont=dict(size=10, color='#555'),
-            hoverinfo='none',
-            showlegend=False
-        )
-        edge_traces.append(label_trace)
-        
-        # Arrow head
-        angle = calculate_angle(x0, y0, x1, y1)
-        
-        arrow_trace = go.Scatter(
-            x=[xa, xa + 0.03 * np.cos(angle + np.pi/6), xa + 0.03 * np.cos(angle - np.pi/6), xa],
-            y=[ya, ya + 0.03 * np.sin(angle + np.pi/6), ya + 0.03 * np.sin(angle - np.pi/6), ya],
-            mode='lines',
-            line=dict(width=2, color='#888'),
-            fill='toself',
-            hoverinfo='none',
-            showlegend=False
-        )
-        edge_traces.append(arrow_trace)
+    # Reuse the stored layout when neither the graph nor the filters changed
+    pos = get_layout(G, graph_version, node_type_filter, relationship_filter, layout_type,
+                     refresh=request.GET.get('relayout') == '1',
+                     filter_key=layout_filter_key(property_filter, property_value, node_where, rel_where))
     
-    # Create nodes trace
-    node_trace = go.Scatter(
+    # Pick SVG or WebGL and drop detail that large graphs can't afford
+    renderer, show_edge_details, show_node_names = choose_render_detail(
+        request.GET.get('renderer', 'auto'), G.number_of_nodes(), G.number_of_edges()
+    )
+    scatter = go.Scattergl if renderer == 'webgl' else go.Scatter
+    
+    # Create edges with labels and arrows (three traces in total, whatever the edge count)
+    edge_traces, rel_types = build_edge_traces(G, pos, scatter, show_edge_details)
+    
+    # Create nodes trace (names only on hover once there are too many to read)
+    node_trace = scatter(
         x=[pos[node][0] for node in G.nodes()],
         y=[pos[node][1] for node in G.nodes()],
-        mode='markers+text',
+        mode='markers+text' if show_node_names else 'markers',
         text=[G.nodes[node]['name'] for node in G.nodes()],
         textposition='bottom center',
         marker=dict(
@@ -536,6 +554,8 @@ def visualize_graph(request):
         ),
         hoverinfo='text',
         hovertext=[G.nodes[node]['hover_text'] for node in G.nodes()],
+        # Node ids, so a click can ask for that node's neighbourhood
+        customdata=list(G.nodes()),
         showlegend=False,
         hovertemplate='%{hovertext}<extra></extra>'
     )
@@ -593,11 +613,253 @@ def visualize_graph(request):
         'selected_layout': layout_type,
         'selected_node_type': node_type_filter,
         'selected_relationship': relationship_filter,
+        'selected_renderer': request.GET.get('renderer', 'auto'),
+        'property_filter': property_filter,
+        'property_value': property_value,
+        'node_where': request.GET.get('where', ''),
+        'rel_where': request.GET.get('rel_where', ''),
+        'reduced_detail': not (show_edge_details and show_node_names),
         'all_node_labels': all_node_labels,
         'all_relationship_types': all_relationship_types,
         'is_demo_mode': request.session.get('demo_mode', False)
     })
 
+# Layout cache key for the filters beyond node type and relationship
+def layout_filter_key(property_filter, property_value, node_where, rel_where):
+    parts = [f"{property_filter}={property_value}"] if property_filter else []
+    if node_where:
+        parts.append(f"where {filter_key(node_where, max_length=None)}")
+    if rel_where:
+        parts.append(f"rel_where {filter_key(rel_where, max_length=None)}")
+    key = ' | '.join(parts)
+    return key if len(key) <= 255 else 'sha1:' + hashlib.sha1(key.encode()).hexdigest()
+
+# Build one line trace, one label trace and one arrowhead trace for all edges,
+# with the geometry computed on NumPy arrays instead of edge by edge
+def build_edge_traces(G, pos, scatter=go.Scatter, show_details=True):
+    edges = list(G.edges(data=True))
+    rel_types = set(data.get('type') for _, _, data in edges)
+    
+    start = np.array([pos[u] for u, _, _ in edges], dtype=float).reshape(-1, 2)
+    end = np.array([pos[v] for _, v, _ in edges], dtype=float).reshape(-1, 2)
+    x0, y0 = start[:, 0], start[:, 1]
+    x1, y1 = end[:, 0], end[:, 1]
+    gap = np.full(len(edges), None, dtype=object)
+    
+    # Edge lines: x0, x1, None per edge so a single trace draws them all
+    hover = np.array([data.get('hover_text') for _, _, data in edges], dtype=object)
+    edge_trace = scatter(
+        x=np.column_stack([x0, x1, gap]).ravel(),
+        y=np.column_stack([y0, y1, gap]).ravel(),
+        mode='lines',
+        line=dict(width=2, color='#888'),
+        hoverinfo='text',
+        text=np.column_stack([hover, hover, gap]).ravel(),
+        showlegend=False,
+        hovertemplate='%{text}<extra></extra>'
+    )
+    if not show_details:
+        return [edge_trace], rel_types
+    
+    # Edge labels (positioned in the middle)
+    label_trace = scatter(
+        x=(x0 + x1) / 2,
+        y=(y0 + y1) / 2,
+        mode='text',
+        text=[data.get('type') for _, _, data in edges],
+        textposition='middle center',
+        textfont=dict(size=10, color='#555'),
+        hoverinfo='none',
+        showlegend=False
+    )
+    
+    # Arrow heads 80% along each line; None gaps keep the filled triangles apart
+    arrow_pos = 0.8
+    xa = x0 * (1 - arrow_pos) + x1 * arrow_pos
+    ya = y0 * (1 - arrow_pos) + y1 * arrow_pos
+    angle = calculate_angle(x0, y0, x1, y1)
+    arrow_trace = scatter(
+        x=np.column_stack([xa, xa + 0.03 * np.cos(angle + np.pi/6), xa + 0.03 * np.cos(angle - np.pi/6), xa, gap]).ravel(),
+        y=np.column_stack([ya, ya + 0.03 * np.sin(angle + np.pi/6), ya + 0.03 * np.sin(angle - np.pi/6), ya, gap]).ravel(),
+        mode='lines',
+        line=dict(width=2, color='#888'),
+        fill='toself',
+        hoverinfo='none',
+        showlegend=False
+    )
+    
+    return [edge_trace, label_trace, arrow_trace], rel_types
+
+# Resolve the renderer ('svg', 'webgl' or 'auto') and the level of detail for a
+# graph of the given size. Returns (renderer, show_edge_details, show_node_names).
+def choose_render_detail(renderer, node_count, edge_count):
+    if renderer not in ('svg', 'webgl'):
+        webgl_threshold = getattr(settings, 'GRAPH_WEBGL_THRESHOLD', 2000)
+        renderer = 'webgl' if node_count + edge_count > webgl_threshold else 'svg'
+    show_edge_details = edge_count <= getattr(settings, 'GRAPH_LOD_EDGE_DETAIL_LIMIT', 500)
+    show_node_names = node_count <= getattr(settings, 'GRAPH_LOD_NODE_LABEL_LIMIT', 300)
+    return renderer, show_edge_details, show_node_names
+
+@graph_page_cache
+def summarize_graph(request):
+    check_neo4j_connection(request)
+    group_by = 'property' if request.GET.get('group_by') == 'property' and request.GET.get('property') else 'label'
+    property_key = request.GET.get('property', '') if group_by == 'property' else ''
+    relationship_filter = request.GET.get('relationship', 'all')
+    
+    # Both tables are aggregated in SQL; only one row per group (pair) reaches Python
+    groups = summarize_nodes(group_by, property_key)
+    edges = summarize_relationships(groups, group_by, property_key,
+                                    relationship_filter if relationship_filter != 'all' else None)
+    
+    # Clicking a supernode opens the full visualisation of just that group
+    drill_urls = {}
+    for key in groups:
+        if key is None or key == OTHER_GROUP:
+            continue
+        if group_by == 'property':
+            query = urlencode({'property': property_key, 'value': key, 'relationship': relationship_filter})
+        else:
+            query = urlencode({'node_type': key, 'relationship': relationship_filter})
+        drill_urls[key] = f"{reverse('visualize')}?{query}"
+    
+    colors = dict(zip(groups, generate_distinct_colors(len(groups))))
+    graph_html = None
+    if groups:
+        fig = build_summary_figure(groups, edges, colors, drill_urls)
+        graph_html = fig.to_html(
+            full_html=False,
+            include_plotlyjs='cdn',
+            div_id='summary-graph',
+            config={'displayModeBar': True, 'scrollZoom': True}
+        )
+    
+    supernodes = [{'name': group_name(key), 'count': count, 'color': colors[key], 'url': drill_urls.get(key)}
+                  for key, count in groups.items()]
+    
+    return render(request, 'graphapp/summary.html', {
+        'graph_html': graph_html,
+        'supernodes': supernodes,
+        'group_by': group_by,
+        'property_key': property_key,
+        'selected_relationship': relationship_filter,
+        'total_nodes': sum(groups.values()),
+        'total_relationships': sum(sum(types.values()) for types in edges.values()),
+        'all_relationship_types': GraphRelationship.objects.values_list('type', flat=True).distinct(),
+        'is_demo_mode': request.session.get('demo_mode', False)
+    })
+
+def search_page_params(request):
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    return request.GET.get('q', '').strip(), request.GET.get('label', ''), page
+
+# Ranked full-text search over node names, labels and properties
+@graph_page_cache
+def search(request):
+    check_neo4j_connection(request)
+    query, label, page = search_page_params(request)
+    # The last word may be incomplete, as in the navbar's autocomplete
+    results, has_next = search_nodes(query, page, label=label, prefix=True) if query else ([], False)
+    return render(request, 'graphapp/search.html', {
+        'query': query,
+        'label': label,
+        'results': results,
+        'page': page,
+        'prev_url': page_url(request, page=page - 1) if page > 1 else None,
+        'next_url': page_url(request, page=page + 1) if has_next else None,
+        'all_node_labels': GraphNode.objects.values_list('label', flat=True).distinct(),
+        'is_demo_mode': request.session.get('demo_mode', False)
+    })
+
+@require_GET
+def api_search(request):
+    query, label, page = search_page_params(request)
+    try:
+        max_size = getattr(settings, 'GRAPH_API_MAX_PAGE_SIZE', 1000)
+        page_size = min(int(request.GET.get('limit', getattr(settings, 'GRAPH_SEARCH_PAGE_SIZE', 20))), max_size)
+    except ValueError:
+        return JsonResponse({'error': "limit must be an integer"}, status=400)
+    results, has_next = search_nodes(query, page, page_size, label=label, prefix=request.GET.get('prefix') == '1')
+    return JsonResponse({'results': results, 'page': page, 'has_next': has_next})
+
+@require_GET
+def search_autocomplete(request):
+    return JsonResponse({'results': autocomplete(request.GET.get('q', ''))})
+
+# The k-hop neighbourhood of one node as JSON, for expanding nodes in the
+# visualizer without rendering the rest of the graph
+@require_GET
+def neighbourhood(request):
+    try:
+        node_id = int(request.GET['node'])
+        hops = int(request.GET.get('hops', 1))
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "node, hops and limit must be integers"}, status=400)
+    direction = request.GET.get('direction', 'both')
+    if direction not in ('both', 'out', 'in'):
+        return JsonResponse({'error': "direction must be one of both, out, in"}, status=400)
+    types = [t for t in request.GET.get('types', '').split(',') if t and t != 'all']
+    try:
+        where = parse_filter(request.GET.get('where', ''))
+        rel_where = parse_filter(request.GET.get('rel_where', ''))
+    except FilterError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    node = GraphNode.objects.filter(id=node_id).first()
+    if node is None:
+        return JsonResponse({'error': "Node not found"}, status=404)
+    
+    conn = get_db_connection()
+    try:
+        return JsonResponse(ego_graph(node, hops, limit, types, direction, conn, where, rel_where))
+    finally:
+        conn.close()
+
+# JSON analytics (PageRank, components, degrees, shortest paths) over the
+# stored graph, optionally restricted to some relationship types. Results
+# come from the per-version cache when possible; large graphs are handed to
+# the `run_analytics` worker and the response points at the job to poll.
+@require_GET
+def graph_analytics(request, algorithm):
+    if algorithm not in ALGORITHMS:
+        return JsonResponse({'error': f"Unknown algorithm: {algorithm}"}, status=404)
+    try:
+        params = parse_params(algorithm, request.GET)
+        version = GraphVersion.current()
+        entry = cached_result(algorithm, params, version)
+        if entry is None:
+            if runs_in_background(request.GET):
+                entry = enqueue(algorithm, params, version)
+            else:
+                entry = compute(algorithm, params)
+    except AnalyticsError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return analytics_response(entry)
+
+@require_GET
+def analytics_job(request, job_id):
+    return analytics_response(get_object_or_404(AnalyticsResult, pk=job_id))
+
+def analytics_response(entry):
+    pending = entry.status in (AnalyticsResult.PENDING, AnalyticsResult.RUNNING)
+    data = {
+        'id': entry.id,
+        'algorithm': entry.algorithm,
+        'params': entry.params,
+        'graph_version': entry.graph_version,
+        'status': entry.status,
+        'job_url': reverse('analytics_job', args=[entry.id]),
+    }
+    if entry.status == AnalyticsResult.DONE:
+        data.update(result=entry.result, duration=entry.duration, finished_at=entry.finished_at)
+    elif entry.status == AnalyticsResult.FAILED:
+        data['error'] = entry.error
+    return JsonResponse(data, status=202 if pending else 200)
+
 def generate_distinct_colors(n):
     colors = []
     for i in range(n):
@@ -619,10 +881,22 @@ def reset_neo4j_status(request):
             del request.session['neo4j_failure']
         request.session['neo4j_connected'] = None
         
-        # Try to connect to Neo4j
-        conn = get_db_connection()
-        is_connected = conn.connected
-        conn.close()
+        # Ask the health monitor to retry now instead of blocking on a connect
+        health_monitor.start(*get_neo4j_credentials())
+        health_monitor.request_probe()
+        is_connected = bool(health_monitor.status())
         
-        return JsonResponse({'success': True, 'connected': is_connected})
-    return JsonResponse({'success': False}, status=400) 
\ No newline at end of file
+        return JsonResponse({'success': True, 'connected': is_connected, 'outbox': backlog_stats()})
+    return JsonResponse({'success': False}, status=400)
+
+# Poll endpoint for neo4j-logger.js: hands over the queued operation log once
+@require_GET
+def neo4j_log(request):
+    operations = request.session.pop('neo4j_log', [])
+    if isinstance(operations, str):
+        # Single entry stored as JSON by older versions
+        operations = [json.loads(operations)]
+    response = JsonResponse({'operations': operations})
+    response.delete_cookie(NEO4J_LOG_COOKIE, samesite='Lax')
+    patch_cache_control(response, no_store=True)
+    return response
@@ -72,6 +72,84 @@ NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.environ.get("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "mrgraphyneo4j")
 
+# Neo4j driver pool (one shared driver per worker process)
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.environ.get("NEO4J_MAX_CONNECTION_POOL_SIZE", 50))
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.environ.get("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", 60))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.environ.get("NEO4J_MAX_CONNECTION_LIFETIME", 3600))
+NEO4J_CONNECTION_TIMEOUT = float(os.environ.get("NEO4J_CONNECTION_TIMEOUT", 30))
+# Records pulled per round trip by Neo4jConnection.stream_query
+NEO4J_FETCH_SIZE = int(os.environ.get("NEO4J_FETCH_SIZE", 1000))
+# Seconds an async API request keeps retrying a failed Neo4j write before
+# leaving it to the outbox worker
+NEO4J_ASYNC_TRANSACTION_RETRY_TIME = float(os.environ.get("NEO4J_ASYNC_TRANSACTION_RETRY_TIME", 1.0))
+
+# Neo4j health monitor and circuit breaker
+NEO4J_HEALTH_CHECK_INTERVAL = float(os.environ.get("NEO4J_HEALTH_CHECK_INTERVAL", 10))
+NEO4J_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("NEO4J_CIRCUIT_FAILURE_THRESHOLD", 3))
+NEO4J_CIRCUIT_RESET_TIMEOUT = float(os.environ.get("NEO4J_CIRCUIT_RESET_TIMEOUT", 30))
+
+# Write-behind outbox drained to Neo4j by `manage.py process_outbox`
+NEO4J_OUTBOX_BATCH_SIZE = int(os.environ.get("NEO4J_OUTBOX_BATCH_SIZE", 500))
+NEO4J_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("NEO4J_OUTBOX_MAX_ATTEMPTS", 10))
+NEO4J_OUTBOX_RETRY_DELAY = float(os.environ.get("NEO4J_OUTBOX_RETRY_DELAY", 5))
+
+# Changes (or diffed entities) per Neo4j transaction for `manage.py reconcile_neo4j`
+NEO4J_RECONCILE_BATCH_SIZE = int(os.environ.get("NEO4J_RECONCILE_BATCH_SIZE", 1000))
+
+# Rows per SQLite bulk_create chunk and Neo4j UNWIND batch for bulk imports
+GRAPH_IMPORT_BATCH_SIZE = int(os.environ.get("GRAPH_IMPORT_BATCH_SIZE", 1000))
+
+# In-memory CSR graph index: rows per SQLite read when building it, and the share of
+# changed nodes/edges above which a refresh rebuilds it instead of patching it
+GRAPH_INDEX_CHUNK_SIZE = int(os.environ.get("GRAPH_INDEX_CHUNK_SIZE", 10000))
+GRAPH_INDEX_MAX_CHANGE_RATIO = float(os.environ.get("GRAPH_INDEX_MAX_CHANGE_RATIO", 0.25))
+
+# Analytics endpoints: graphs with more relationships than this run on the `run_analytics`
+# worker, finished results kept, and the largest top-N a request may ask for
+GRAPH_ANALYTICS_BACKGROUND_EDGES = int(os.environ.get("GRAPH_ANALYTICS_BACKGROUND_EDGES", 1000000))
+GRAPH_ANALYTICS_CACHE_SIZE = int(os.environ.get("GRAPH_ANALYTICS_CACHE_SIZE", 200))
+GRAPH_ANALYTICS_MAX_LIMIT = int(os.environ.get("GRAPH_ANALYTICS_MAX_LIMIT", 1000))
+# Seconds after which a job still marked running is taken to belong to a crashed worker
+# and queued again; keep it above the longest expected run
+GRAPH_ANALYTICS_JOB_TIMEOUT = int(os.environ.get("GRAPH_ANALYTICS_JOB_TIMEOUT", 3600))
+
+# Neighbourhood (ego graph) endpoint used to expand nodes in the visualizer
+GRAPH_NEIGHBOURHOOD_MAX_HOPS = int(os.environ.get("GRAPH_NEIGHBOURHOOD_MAX_HOPS", 3))
+GRAPH_NEIGHBOURHOOD_MAX_NODES = int(os.environ.get("GRAPH_NEIGHBOURHOOD_MAX_NODES", 500))
+
+# Node search: results per page and suggestions per autocomplete request
+GRAPH_SEARCH_PAGE_SIZE = int(os.environ.get("GRAPH_SEARCH_PAGE_SIZE", 20))
+GRAPH_SEARCH_AUTOCOMPLETE_SIZE = int(os.environ.get("GRAPH_SEARCH_AUTOCOMPLETE_SIZE", 10))
+
+# Number of computed graph layouts kept for visualize_graph (least recently used are evicted)
+GRAPH_LAYOUT_CACHE_SIZE = int(os.environ.get("GRAPH_LAYOUT_CACHE_SIZE", 50))
+
+# Warm-start layouts from the previous version when only a few nodes were added
+GRAPH_LAYOUT_INCREMENTAL = os.environ.get("GRAPH_LAYOUT_INCREMENTAL", "1") == "1"
+GRAPH_LAYOUT_INCREMENTAL_ITERATIONS = int(os.environ.get("GRAPH_LAYOUT_INCREMENTAL_ITERATIONS", 15))
+GRAPH_LAYOUT_INCREMENTAL_MAX_CHANGE = float(os.environ.get("GRAPH_LAYOUT_INCREMENTAL_MAX_CHANGE", 0.2))
+
+# visualize_graph level of detail: WebGL above this many nodes + edges (renderer=auto),
+# no edge labels/arrows above the edge limit, node names on hover only above the node limit
+GRAPH_WEBGL_THRESHOLD = int(os.environ.get("GRAPH_WEBGL_THRESHOLD", 2000))
+GRAPH_LOD_EDGE_DETAIL_LIMIT = int(os.environ.get("GRAPH_LOD_EDGE_DETAIL_LIMIT", 500))
+GRAPH_LOD_NODE_LABEL_LIMIT = int(os.environ.get("GRAPH_LOD_NODE_LABEL_LIMIT", 300))
+
+# Graphs with more nodes than this open on the label summary view unless ?view=full is given
+GRAPH_SUMMARY_THRESHOLD = int(os.environ.get("GRAPH_SUMMARY_THRESHOLD", 5000))
+GRAPH_SUMMARY_MAX_GROUPS = int(os.environ.get("GRAPH_SUMMARY_MAX_GROUPS", 50))
+
+# Read API (/api/nodes/, /api/relationships/): largest JSON page and NDJSON fetch chunk
+GRAPH_API_MAX_PAGE_SIZE = int(os.environ.get("GRAPH_API_MAX_PAGE_SIZE", 1000))
+GRAPH_API_CHUNK_SIZE = int(os.environ.get("GRAPH_API_CHUNK_SIZE", 2000))
+
+# graph_list rows per page (overridable with ?page_size= up to the maximum)
+GRAPH_LIST_PAGE_SIZE = int(os.environ.get("GRAPH_LIST_PAGE_SIZE", 50))
+GRAPH_LIST_MAX_PAGE_SIZE = int(os.environ.get("GRAPH_LIST_MAX_PAGE_SIZE", 500))
+
+# Rows fetched per database round trip while streaming exports
+GRAPH_EXPORT_CHUNK_SIZE = int(os.environ.get("GRAPH_EXPORT_CHUNK_SIZE", 2000))
+
 # Password validationß
 AUTH_PASSWORD_VALIDATORS = [
     {
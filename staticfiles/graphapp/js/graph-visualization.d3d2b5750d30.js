@@ -0,0 +1,236 @@
+/**
+ * Enhanced Graph Visualization JS
+ * This file provides interactive features for the graph visualization
+ */
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Check if we have a graph to work with
+    const graphContainer = document.querySelector('.graph-container');
+    if (!graphContainer) return;
+    
+    // Make sure the overlay exists
+    let overlay = document.querySelector('.graph-overlay');
+    if (!overlay) {
+        overlay = document.createElement('div');
+        overlay.className = 'graph-overlay';
+        overlay.innerHTML = '<div class="spinner"></div>';
+        graphContainer.appendChild(overlay);
+    }
+    
+    // Function to show/hide loading overlay
+    function toggleLoading(show) {
+        overlay.classList.toggle('active', show);
+    }
+    
+    // Adjust the graph layout to match container size
+    function resizeGraph() {
+        const graphDiv = document.querySelector('.js-plotly-plot');
+        if (graphDiv) {
+            Plotly.relayout(graphDiv, {
+                width: graphContainer.offsetWidth,
+                height: 700
+            });
+        }
+    }
+    
+    // Call resize on window resize
+    window.addEventListener('resize', function() {
+        resizeGraph();
+    });
+    
+    // Initialize size on load
+    resizeGraph();
+    
+    // Handle form submission
+    const filterForm = document.getElementById('filterForm');
+    if (filterForm) {
+        filterForm.addEventListener('submit', function() {
+            toggleLoading(true);
+        });
+    }
+    
+    // Handle node interactions
+    const plotlyDiv = document.querySelector('.js-plotly-plot');
+    if (plotlyDiv) {
+        // Add highlighting for connected nodes on hover
+        plotlyDiv.on('plotly_hover', function(data) {
+            // Only process the first point (in case of multiple points)
+            const point = data.points[0];
+            
+            // Check if we're hovering on a node (not an edge or label)
+            if (point.marker && point.marker.size && point.customdata) {
+                // Highlight this node
+                point.marker.color = 'rgba(255, 207, 86, 1)'; // #FFCF56 with opacity
+            }
+        });
+        
+        // Clicking a node fetches its neighbourhood and adds the nodes and
+        // relationships that aren't drawn yet, so large graphs can be explored
+        // a piece at a time instead of rendered whole
+        plotlyDiv.on('plotly_click', function(data) {
+            const point = data.points[0];
+            if (point.curveNumber !== nodeTraceIndex() || point.customdata === undefined) return;
+            expandNode(point.customdata, {x: point.x, y: point.y});
+        });
+    }
+    
+    // The node trace is the last one and the only one carrying node ids
+    function nodeTraceIndex() {
+        return plotlyDiv.data.length - 1;
+    }
+    
+    // Colours of the labels in the legend, to match the server-side colouring
+    function labelColors() {
+        const colors = {};
+        document.querySelectorAll('.legend-item .legend-color').forEach(function(swatch) {
+            colors[swatch.nextElementSibling.textContent.trim()] = swatch.style.backgroundColor;
+        });
+        return colors;
+    }
+    
+    function nodeHoverText(node) {
+        let text = `<b>Label:</b> ${node.label}<br><b>Name:</b> ${node.name}`;
+        const props = Object.entries(node.properties || {}).map(([k, v]) => `<b>${k}:</b> ${v}`);
+        if (props.length) text += '<br><b>Properties:</b><br>' + props.join('<br>');
+        return text;
+    }
+    
+    // Relationships added by earlier expansions; the ones between nodes of
+    // the original render were drawn by the server already
+    const expandedEdges = new Set();
+    const expandedNodes = new Set();
+    
+    function expandNode(nodeId, origin) {
+        const url = graphContainer.dataset.neighbourhoodUrl;
+        if (!url) return;
+        const params = new URLSearchParams({node: nodeId, hops: 1});
+        const relationship = graphContainer.dataset.relationship;
+        if (relationship && relationship !== 'all') params.set('types', relationship);
+        
+        toggleLoading(true);
+        fetch(`${url}?${params}`, {headers: {'Accept': 'application/json'}})
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(result => addNeighbourhood(result, origin))
+            .catch(() => showTooltip('Could not load the neighbours of this node', origin))
+            .finally(() => toggleLoading(false));
+    }
+    
+    function addNeighbourhood(result, origin) {
+        const trace = plotlyDiv.data[nodeTraceIndex()];
+        const positions = {};
+        trace.customdata.forEach((id, i) => { positions[id] = {x: trace.x[i], y: trace.y[i]}; });
+        
+        // New nodes go on a small circle around the clicked node
+        const added = result.nodes.filter(node => !(node.id in positions));
+        const radius = 0.15 + 0.01 * added.length;
+        added.forEach((node, i) => {
+            const angle = 2 * Math.PI * i / added.length;
+            positions[node.id] = {x: origin.x + radius * Math.cos(angle), y: origin.y + radius * Math.sin(angle)};
+            expandedNodes.add(node.id);
+        });
+        
+        const edges = result.edges.filter(edge => !expandedEdges.has(edge.id) &&
+            (expandedNodes.has(edge.source) || expandedNodes.has(edge.target)));
+        edges.forEach(edge => expandedEdges.add(edge.id));
+        
+        if (edges.length) {
+            // Lines only: edge labels and arrows stay with the server render
+            const x = [], y = [], text = [];
+            edges.forEach(edge => {
+                const a = positions[edge.source], b = positions[edge.target];
+                const hover = `<b>Type:</b> ${edge.type}`;
+                x.push(a.x, b.x, null);
+                y.push(a.y, b.y, null);
+                text.push(hover, hover, null);
+            });
+            Plotly.extendTraces(plotlyDiv, {x: [x], y: [y], text: [text]}, [0]);
+        }
+        if (added.length) {
+            const colors = labelColors();
+            Plotly.extendTraces(plotlyDiv, {
+                x: [added.map(node => positions[node.id].x)],
+                y: [added.map(node => positions[node.id].y)],
+                text: [added.map(node => node.name)],
+                hovertext: [added.map(nodeHoverText)],
+                customdata: [added.map(node => node.id)],
+                'marker.color': [added.map(node => colors[node.label] || '#cccccc')]
+            }, [nodeTraceIndex()]);
+        }
+        
+        let message = added.length ? `Added ${added.length} neighbours` : 'No further neighbours';
+        if (result.truncated) message += ` (limited to ${result.nodes.length} nodes)`;
+        showTooltip(message, origin);
+    }
+    
+    // Simple tooltip function
+    function showTooltip(message, position) {
+        // Create or reuse tooltip element
+        let tooltip = document.getElementById('graph-tooltip');
+        if (!tooltip) {
+            tooltip = document.createElement('div');
+            tooltip.id = 'graph-tooltip';
+            tooltip.style.position = 'absolute';
+            tooltip.style.backgroundColor = 'rgba(0, 0, 0, 0.7)';
+            tooltip.style.color = 'white';
+            tooltip.style.padding = '5px 10px';
+            tooltip.style.borderRadius = '3px';
+            tooltip.style.pointerEvents = 'none';
+            tooltip.style.zIndex = '1000';
+            tooltip.style.fontSize = '12px';
+            document.body.appendChild(tooltip);
+        }
+        
+        // Position near the node
+        const container = document.querySelector('.graph-container');
+        const containerRect = container.getBoundingClientRect();
+        
+        // Convert from Plotly coordinates to screen coordinates
+        const plotlyDiv = document.querySelector('.js-plotly-plot');
+        const plotRect = plotlyDiv.getBoundingClientRect();
+        
+        // Very rough estimation - this would need to be adjusted based on actual scaling
+        const x = plotRect.left + (position.x * plotRect.width / 2) + (plotRect.width / 2);
+        const y = plotRect.top + (position.y * plotRect.height / 2) + (plotRect.height / 2);
+        
+        tooltip.style.left = x + 'px';
+        tooltip.style.top = (y - 30) + 'px';
+        tooltip.textContent = message;
+        tooltip.style.display = 'block';
+        
+        // Hide after a delay
+        setTimeout(function() {
+            tooltip.style.display = 'none';
+        }, 2000);
+    }
+    
+    // Enable legend item click to filter
+    const legendItems = document.querySelectorAll('.legend-item');
+    legendItems.forEach(function(item) {
+        item.style.cursor = 'pointer';
+        
+        item.addEventListener('click', function() {
+            // Get the node type from the text
+            const labelText = item.querySelector('span').textContent.trim();
+            
+            // Find if this is a node type or relationship
+            const isNodeType = item.parentElement.querySelector('h6').textContent.includes('Node');
+            
+            // Set the appropriate filter
+            if (isNodeType) {
+                const nodeTypeFilter = document.getElementById('nodeTypeFilter');
+                if (nodeTypeFilter) {
+                    nodeTypeFilter.value = labelText;
+                    // Submit the form
+                    document.getElementById('filterForm').submit();
+                }
+            } else {
+                const relationshipFilter = document.getElementById('relationshipFilter');
+                if (relationshipFilter) {
+                    relationshipFilter.value = labelText;
+                    // Submit the form
+                    document.getElementById('filterForm').submit();
+                }
+            }
+        });
+    });
+}); 
\ No newline at end of file
@@ -64,30 +64,107 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
         
-        // Handle click on nodes to show focused graph
+        // Clicking a node fetches its neighbourhood and adds the nodes and
+        // relationships that aren't drawn yet, so large graphs can be explored
+        // a piece at a time instead of rendered whole
         plotlyDiv.on('plotly_click', function(data) {
             const point = data.points[0];
-            
-            // Check if we're clicking on a node
-            if (point.marker && point.marker.size) {
-                // Get the node information from the DOM
-                const nodeLabel = point.data.customdata ? point.data.customdata.split('<br>')[0].split(':')[1].trim() : '';
-                
-                // If we have a node type filter control, we can set it
-                const nodeTypeFilter = document.getElementById('nodeTypeFilter');
-                if (nodeTypeFilter && nodeLabel) {
-                    // Show a tooltip indicating what filtering would do
-                    const nodePosition = {
-                        x: point.x,
-                        y: point.y
-                    };
-                    
-                    showTooltip(`Click to filter by ${nodeLabel} nodes`, nodePosition);
-                }
-            }
+            if (point.curveNumber !== nodeTraceIndex() || point.customdata === undefined) return;
+            expandNode(point.customdata, {x: point.x, y: point.y});
         });
     }
     
+    // The node trace is the last one and the only one carrying node ids
+    function nodeTraceIndex() {
+        return plotlyDiv.data.length - 1;
+    }
+    
+    // Colours of the labels in the legend, to match the server-side colouring
+    function labelColors() {
+        const colors = {};
+        document.querySelectorAll('.legend-item .legend-color').forEach(function(swatch) {
+            colors[swatch.nextElementSibling.textContent.trim()] = swatch.style.backgroundColor;
+        });
+        return colors;
+    }
+    
+    function nodeHoverText(node) {
+        let text = `<b>Label:</b> ${node.label}<br><b>Name:</b> ${node.name}`;
+        const props = Object.entries(node.properties || {}).map(([k, v]) => `<b>${k}:</b> ${v}`);
+        if (props.length) text += '<br><b>Properties:</b><br>' + props.join('<br>');
+        return text;
+    }
+    
+    // Relationships added by earlier expansions; the ones between nodes of
+    // the original render were drawn by the server already
+    const expandedEdges = new Set();
+    const expandedNodes = new Set();
+    
+    function expandNode(nodeId, origin) {
+        const url = graphContainer.dataset.neighbourhoodUrl;
+        if (!url) return;
+        const params = new URLSearchParams({node: nodeId, hops: 1});
+        const relationship = graphContainer.dataset.relationship;
+        if (relationship && relationship !== 'all') params.set('types', relationship);
+        // Expansion keeps to the property filters of the current view
+        if (graphContainer.dataset.where) params.set('where', graphContainer.dataset.where);
+        if (graphContainer.dataset.relWhere) params.set('rel_where', graphContainer.dataset.relWhere);
+        
+        toggleLoading(true);
+        fetch(`${url}?${params}`, {headers: {'Accept': 'application/json'}})
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(result => addNeighbourhood(result, origin))
+            .catch(() => showTooltip('Could not load the neighbours of this node', origin))
+            .finally(() => toggleLoading(false));
+    }
+    
+    function addNeighbourhood(result, origin) {
+        const trace = plotlyDiv.data[nodeTraceIndex()];
+        const positions = {};
+        trace.customdata.forEach((id, i) => { positions[id] = {x: trace.x[i], y: trace.y[i]}; });
+        
+        // New nodes go on a small circle around the clicked node
+        const added = result.nodes.filter(node => !(node.id in positions));
+        const radius = 0.15 + 0.01 * added.length;
+        added.forEach((node, i) => {
+            const angle = 2 * Math.PI * i / added.length;
+            positions[node.id] = {x: origin.x + radius * Math.cos(angle), y: origin.y + radius * Math.sin(angle)};
+            expandedNodes.add(node.id);
+        });
+        
+        const edges = result.edges.filter(edge => !expandedEdges.has(edge.id) &&
+            (expandedNodes.has(edge.source) || expandedNodes.has(edge.target)));
+        edges.forEach(edge => expandedEdges.add(edge.id));
+        
+        if (edges.length) {
+            // Lines only: edge labels and arrows stay with the server render
+            const x = [], y = [], text = [];
+            edges.forEach(edge => {
+                const a = positions[edge.source], b = positions[edge.target];
+                const hover = `<b>Type:</b> ${edge.type}`;
+                x.push(a.x, b.x, null);
+                y.push(a.y, b.y, null);
+                text.push(hover, hover, null);
+            });
+            Plotly.extendTraces(plotlyDiv, {x: [x], y: [y], text: [text]}, [0]);
+        }
+        if (added.length) {
+            const colors = labelColors();
+            Plotly.extendTraces(plotlyDiv, {
+                x: [added.map(node => positions[node.id].x)],
+                y: [added.map(node => positions[node.id].y)],
+                text: [added.map(node => node.name)],
+                hovertext: [added.map(nodeHoverText)],
+                customdata: [added.map(node => node.id)],
+                'marker.color': [added.map(node => colors[node.label] || '#cccccc')]
+            }, [nodeTraceIndex()]);
+        }
+        
+        let message = added.length ? `Added ${added.length} neighbours` : 'No further neighbours';
+        if (result.truncated) message += ` (limited to ${result.nodes.length} nodes)`;
+        showTooltip(message, origin);
+    }
+    
     // Simple tooltip function
     function showTooltip(message, position) {
         // Create or reuse tooltip element
@@ -0,0 +1,75 @@
+// Neo4j Operations Logger
+const Neo4jLogger = {
+    // Store operations for this session
+    operations: [],
+    
+    // Endpoint holding operations logged by the server (set in base.html)
+    logUrl: '/neo4j-log/',
+    cookieName: 'neo4j_log_pending',
+    
+    // Log successful operations
+    logOperation: function(operation, timestamp) {
+        const logMsg = `Neo4j Operation: ${operation} completed [${timestamp}]`;
+        console.log(`%c${logMsg}`, 'color: green; font-weight: bold;');
+        
+        // Store operation
+        this.operations.push({
+            operation: operation,
+            timestamp: timestamp,
+            time: new Date().toISOString()
+        });
+    },
+    
+    // Initialize event listeners for Neo4j logs
+    init: function() {
+        console.log('Neo4j logger initialized and waiting for operations...');
+        
+        // Listen for Neo4j operations
+        document.addEventListener('neo4j-operation', function(e) {
+            Neo4jLogger.logOperation(e.detail.operation, e.detail.timestamp);
+        });
+        
+        this.fetchPending();
+    },
+    
+    // The server sets a cookie when operations are waiting; only then ask for them
+    hasPending: function() {
+        return document.cookie.split('; ').some(cookie => cookie.startsWith(`${this.cookieName}=`));
+    },
+    
+    fetchPending: function() {
+        if (!this.hasPending()) {
+            return;
+        }
+        
+        fetch(this.logUrl, { credentials: 'same-origin', cache: 'no-store' })
+            .then(response => response.ok ? response.json() : { operations: [] })
+            .then(data => {
+                data.operations.forEach(op => {
+                    document.dispatchEvent(new CustomEvent('neo4j-operation', {
+                        detail: { operation: op.operation, timestamp: op.timestamp }
+                    }));
+                });
+            })
+            .catch(error => console.warn('Could not fetch Neo4j operations log:', error));
+    },
+    
+    // Show all operations this session
+    showAllOperations: function() {
+        if (this.operations.length === 0) {
+            console.log('No Neo4j operations recorded in this session');
+            return;
+        }
+        
+        console.group('Neo4j Operations History');
+        this.operations.forEach((op, index) => {
+            console.log(`${index + 1}. ${op.operation} [${op.timestamp}]`);
+        });
+        console.groupEnd();
+    }
+};
+
+// Initialize logger when DOM is loaded
+document.addEventListener('DOMContentLoaded', function() {
+    Neo4jLogger.init();
+}); 
\ No newline at end of file
@@ -3,6 +3,10 @@ const Neo4jLogger = {
     // Store operations for this session
     operations: [],
     
+    // Endpoint holding operations logged by the server (set in base.html)
+    logUrl: '/neo4j-log/',
+    cookieName: 'neo4j_log_pending',
+    
     // Log successful operations
     logOperation: function(operation, timestamp) {
         const logMsg = `Neo4j Operation: ${operation} completed [${timestamp}]`;
@@ -24,6 +28,30 @@ const Neo4jLogger = {
         document.addEventListener('neo4j-operation', function(e) {
             Neo4jLogger.logOperation(e.detail.operation, e.detail.timestamp);
         });
+        
+        this.fetchPending();
+    },
+    
+    // The server sets a cookie when operations are waiting; only then ask for them
+    hasPending: function() {
+        return document.cookie.split('; ').some(cookie => cookie.startsWith(`${this.cookieName}=`));
+    },
+    
+    fetchPending: function() {
+        if (!this.hasPending()) {
+            return;
+        }
+        
+        fetch(this.logUrl, { credentials: 'same-origin', cache: 'no-store' })
+            .then(response => response.ok ? response.json() : { operations: [] })
+            .then(data => {
+                data.operations.forEach(op => {
+                    document.dispatchEvent(new CustomEvent('neo4j-operation', {
+                        detail: { operation: op.operation, timestamp: op.timestamp }
+                    }));
+                });
+            })
+            .catch(error => console.warn('Could not fetch Neo4j operations log:', error));
     },
     
     // Show all operations this session